@@ -0,0 +1,519 @@
+# coding: utf-8
+
+from collections import OrderedDict, deque
+from typing import List, Dict, Tuple, Deque, Set, Any, Iterator
+
+import numpy as np
+import pandas as pd
+
+from baktlib.constants import SIDE_BUY, SIDE_SELL
+
+SIDES = [SIDE_BUY, SIDE_SELL]  # type: List[str]
+"""sideのコード（リストの位置）と値の対応"""
+
+ID_COLUMNS = ['buy_child_order_acceptance_id', 'sell_child_order_acceptance_id']  # type: List[str]
+"""子注文受付IDの列"""
+
+BAR_COLUMNS = OrderedDict([(('price', 'open'), 'f8'),
+                           (('price', 'high'), 'f8'),
+                           (('price', 'low'), 'f8'),
+                           (('price', 'close'), 'f8'),
+                           (('size', 'size'), 'f8'),
+                           (('buy_size', 'buy_size'), 'f8'),
+                           (('sell_size', 'sell_size'), 'f8'),
+                           (('buy_child_order_acceptance_id', 'buy_child_order_acceptance_id'), 'i8'),
+                           (('sell_child_order_acceptance_id', 'sell_child_order_acceptance_id'), 'i8'),
+                           (('delay', 'delay'), 'f8')])
+"""OHLCの列と型（bitflyer.conv_exec_to_ohlcと同じ列構成）"""
+
+BAR_NAN_COLUMNS = [('price', 'open'), ('price', 'high'), ('price', 'low'), ('price', 'close'), ('delay', 'delay')]
+"""約定が存在しない時間足で欠損となる列"""
+
+
+def hash_ids(ids: np.ndarray) -> np.ndarray:
+    """子注文受付IDをハッシュ値に変換します。
+    :param ids: 子注文受付ID
+    :return: uint64のハッシュ値の配列（欠損は0）
+    """
+    h = pd.util.hash_array(np.asarray(ids, dtype=object))
+    h[pd.isna(ids)] = 0
+    return h
+
+
+def frame_columns(t: pd.DataFrame) -> List[np.ndarray]:
+    """約定履歴のDataFrameを、時間足の集計に使用する列の配列に変換します。
+    :param t: exec_dateをインデックスとする約定履歴
+    :return: 約定日時（エポックナノ秒）、sideのコード、約定価格、約定サイズ、遅延時間、子注文受付IDのハッシュ値
+    """
+    return [t.index.values.astype('datetime64[ns]').view('i8'),
+            pd.Categorical(t['side'], categories=SIDES).codes,
+            t['price'].values, t['size'].values, t['delay'].values] + \
+           [t[c].values if t[c].dtype.kind in 'iu' else hash_ids(t[c].values) for c in ID_COLUMNS]
+
+
+def bars_frame(first: int, freq: int, bars: Dict[tuple, np.ndarray]) -> pd.DataFrame:
+    """列の配列からOHLCを作成します。約定が存在しない時間足の価格と遅延時間は、直前の時間足の値で補完します。
+    :param first: 最初の時間足の番号（エポックからの時間足の数）
+    :param freq: 時間足の長さ（ナノ秒）
+    :param bars: BAR_COLUMNSの列ごとの配列
+    :return: OHLC（bitflyer.conv_exec_to_ohlcと同じ形式）
+    """
+    index = pd.DatetimeIndex((first + np.arange(len(bars[('price', 'open')]), dtype='i8')) * freq,
+                             name='exec_date').tz_localize('UTC')
+    return pd.DataFrame(OrderedDict([(c, bars[c]) for c in BAR_COLUMNS]), index=index).fillna(method='ffill')
+
+
+def count_ids(b: np.ndarray, ids: np.ndarray, num: int) -> np.ndarray:
+    """時間足ごとの子注文受付IDの種類数を返します。
+    :param b: 約定ごとの時間足の位置（0以上num未満）
+    :param ids: 約定ごとの子注文受付IDのハッシュ値（欠損は0）
+    :param num: 時間足の数
+    :return: 時間足ごとの種類数
+    """
+    valid = ids != 0
+    order = np.lexsort((ids[valid], b[valid]))
+    kb, kid = b[valid][order], ids[valid][order]
+    distinct = np.ones(len(kb), dtype=bool)
+    distinct[1:] = (kb[1:] != kb[:-1]) | (kid[1:] != kid[:-1])
+    return np.bincount(kb[distinct], minlength=num)
+
+
+def aligned_slices(time: np.ndarray, freq: int, chunk_size: int) -> Iterator[slice]:
+    """約定履歴をおおよそ一定の件数ごとに、時間足の途中で切れないように区切ります。
+    :param time: 約定日時（エポックナノ秒、昇順）
+    :param freq: 時間足の長さ（ナノ秒）
+    :param chunk_size: 区切る件数の目安
+    :return: 行の範囲
+    """
+    head = 0
+    while head < len(time):
+        tail = min(head + chunk_size, len(time))
+        if tail < len(time):
+            b = int(time[tail]) // freq
+            tail = int(np.searchsorted(time, b * freq, side='left'))
+            if tail <= head:
+                tail = int(np.searchsorted(time, (b + 1) * freq, side='left'))
+        yield slice(head, tail)
+        head = tail
+
+
+class BarBuilder(object):
+    """約定履歴を時系列順に受け取りながら、OHLCを逐次作成します。
+
+    約定履歴は任意の位置で区切って渡すことができます。末尾の時間足は次の約定履歴と合わせて集計するために保留し、
+    確定した時間足のみを集計します。作成結果はbitflyer.conv_exec_to_ohlcと同じ形式です。
+    """
+
+    def __init__(self, rule: str):
+        """
+        :param rule: 時間足（1日を割り切れる長さ）
+        """
+        self.freq = pd.Timedelta(rule).value  # type: int
+        """時間足の長さ（ナノ秒）"""
+
+        self.__first = None  # type: int
+        """最初の時間足の番号（エポックからの時間足の数）"""
+
+        self.__next = None  # type: int
+        """次に集計する時間足の番号"""
+
+        self.__parts = []  # type: List[Dict[tuple, np.ndarray]]
+        """確定した時間足の集計結果"""
+
+        self.__pending = None  # type: List[np.ndarray]
+        """集計を保留している約定履歴の列"""
+
+        self.revision = 0  # type: int
+        """約定履歴を追加した回数（作成結果が変わったかどうかの判定に使用します）"""
+
+    def add(self, time: np.ndarray, side: np.ndarray, price: np.ndarray, size: np.ndarray, delay: np.ndarray,
+            buy_ids: np.ndarray, sell_ids: np.ndarray) -> None:
+        """約定履歴を追加します。
+        :param time: 約定日時（エポックナノ秒、昇順）
+        :param side: sideのコード
+        :param price: 約定価格
+        :param size: 約定サイズ
+        :param delay: 遅延時間（秒）
+        :param buy_ids: 買い注文の子注文受付IDのハッシュ値
+        :param sell_ids: 売り注文の子注文受付IDのハッシュ値
+        """
+        cols = [time, side, price, size, delay, buy_ids, sell_ids]
+        self.revision += 1
+        if self.__pending is not None:
+            cols = [np.concatenate((p, c)) for p, c in zip(self.__pending, cols)]
+        if not len(cols[0]):
+            return
+        split = int(np.searchsorted(cols[0], cols[0][-1] // self.freq * self.freq, side='left'))
+        if split:
+            part, self.__next = self.__aggregate([c[:split] for c in cols])
+            self.__parts.append(part)
+        self.__pending = [c[split:] for c in cols]
+
+    def add_frame(self, t: pd.DataFrame) -> None:
+        """約定履歴を追加します。
+        :param t: exec_dateをインデックスとする約定履歴
+        """
+        self.add(*frame_columns(t))
+
+    def to_frame(self) -> pd.DataFrame:
+        """これまでに追加された約定履歴のOHLCを返します。
+        保留中の時間足も含めて返しますが、保留状態は変更しません。
+        :return: OHLC
+        """
+        first, bars = self.to_columns()
+        return bars_frame(first, self.freq, bars)
+
+    def to_columns(self) -> Tuple[int, Dict[tuple, np.ndarray]]:
+        """これまでに追加された約定履歴のOHLCを、欠損値を補完する前の列の配列として返します。
+        :return: 最初の時間足の番号と、BAR_COLUMNSの列ごとの配列
+        """
+        parts = list(self.__parts)
+        if self.__pending is not None and len(self.__pending[0]):
+            parts.append(self.__aggregate(self.__pending)[0])
+        bars = OrderedDict([(c, np.concatenate([p[c] for p in parts]) if parts else np.empty(0, dtype=dtype))
+                            for c, dtype in BAR_COLUMNS.items()])
+        return self.__first or 0, bars
+
+    def __aggregate(self, cols: List[np.ndarray]) -> Tuple[Dict[tuple, np.ndarray], int]:
+        """確定した時間足の約定履歴を集計します。
+        前回集計した時間足から今回の先頭の時間足までに約定が存在しない時間足も含めて返します。
+        :param cols: 約定履歴の列
+        :return: 時間足ごとの集計結果と、次に集計する時間足の番号
+        """
+        time, side, price, size, delay, buy_ids, sell_ids = cols
+        b = time // self.freq  # type: np.ndarray
+        if self.__first is None:
+            self.__first = self.__next = int(b[0])
+        b = b - self.__next
+        num = int(b[-1]) + 1
+        bars = OrderedDict([(c, np.full(num, np.nan) if c in BAR_NAN_COLUMNS else np.zeros(num, dtype=dtype))
+                            for c, dtype in BAR_COLUMNS.items()])
+
+        pos, starts = np.unique(b, return_index=True)
+        ends = np.append(starts[1:], len(b))
+        bars[('price', 'open')][pos] = price[starts]
+        bars[('price', 'high')][pos] = np.maximum.reduceat(price, starts)
+        bars[('price', 'low')][pos] = np.minimum.reduceat(price, starts)
+        bars[('price', 'close')][pos] = price[ends - 1]
+        bars[('size', 'size')][pos] = np.add.reduceat(size, starts)
+        bars[('buy_size', 'buy_size')][pos] = np.add.reduceat(np.where(side == 0, size, 0), starts)
+        bars[('sell_size', 'sell_size')][pos] = np.add.reduceat(np.where(side == 1, size, 0), starts)
+        for name, ids in zip(ID_COLUMNS, [buy_ids, sell_ids]):
+            bars[(name, name)][:] = count_ids(b, ids, num)
+        has_delay = ~np.isnan(delay)
+        count = np.add.reduceat(has_delay.astype('i8'), starts)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            bars[('delay', 'delay')][pos] = np.add.reduceat(np.where(has_delay, delay, 0), starts) / count
+        return bars, self.__next + num
+
+
+class RollingBars(object):
+    """約定履歴を時系列順に受け取りながら、直近の一定数の時間足のOHLCを保持するバッファ
+
+    受け取った約定履歴は集計中の時間足に加算するだけのため、1回の更新は受け取った件数にのみ比例します。
+    frameで返すOHLCは、それまでに受け取った約定履歴全体をbitflyer.conv_exec_to_ohlcで集計した結果の末尾と同じです。
+    """
+
+    def __init__(self, rule: str, size: int):
+        """
+        :param rule: 時間足（1日を割り切れる長さ）
+        :param size: 保持する時間足の数（集計中の時間足を含む）
+        """
+        self.freq = pd.Timedelta(rule).value  # type: int
+        """時間足の長さ（ナノ秒）"""
+
+        self.size = size  # type: int
+        """保持する時間足の数"""
+
+        self.__bars = deque(maxlen=max(size - 1, 0))  # type: Deque[tuple]
+        """確定した時間足（時間足の番号とBAR_COLUMNSの順の値のタプル）"""
+
+        self.__bar = None  # type: int
+        """集計中の時間足の番号"""
+
+        self.__ohlc = None  # type: List[float]
+        """集計中の時間足の始値、高値、安値、終値"""
+
+        self.__sizes = None  # type: List[float]
+        """集計中の時間足のサイズ、買いサイズ、売りサイズ"""
+
+        self.__ids = None  # type: List[Set[int]]
+        """集計中の時間足の買い、売りの子注文受付IDのハッシュ値"""
+
+        self.__delay = None  # type: List[float]
+        """集計中の時間足の遅延時間の合計と件数"""
+
+        self.__last = None  # type: tuple
+        """最後に確定した時間足（保持数に関わらず、欠損値の補完に使用します）"""
+
+    def __len__(self) -> int:
+        return len(self.__bars) + (1 if self.__bar is not None else 0)
+
+    def add(self, time: np.ndarray, side: np.ndarray, price: np.ndarray, size: np.ndarray, delay: np.ndarray,
+            buy_ids: np.ndarray, sell_ids: np.ndarray) -> None:
+        """約定履歴を追加します。引数はBarBuilder.addと同じです。"""
+        if not len(time):
+            return
+        b = time // self.freq  # type: np.ndarray
+        bars, starts = np.unique(b, return_index=True)
+        ends = np.append(starts[1:], len(b))
+        for bar, head, tail in zip(bars.tolist(), starts.tolist(), ends.tolist()):
+            if bar != self.__bar:
+                self.__next_bar(bar)
+            p = price[head:tail]
+            if self.__ohlc is None:
+                self.__ohlc = [p[0], p.max(), p.min(), p[-1]]
+            else:
+                self.__ohlc[1:] = [max(self.__ohlc[1], p.max()), min(self.__ohlc[2], p.min()), p[-1]]
+            s, sd = size[head:tail], side[head:tail]
+            self.__sizes[0] += s.sum()
+            self.__sizes[1] += s[sd == 0].sum()
+            self.__sizes[2] += s[sd == 1].sum()
+            for ids, values in zip(self.__ids, [buy_ids[head:tail], sell_ids[head:tail]]):
+                ids.update(values[values != 0].tolist())
+            dl = delay[head:tail]
+            dl = dl[~np.isnan(dl)]
+            self.__delay[0] += dl.sum()
+            self.__delay[1] += len(dl)
+
+    def add_frame(self, t: pd.DataFrame) -> None:
+        """約定履歴を追加します。
+        :param t: exec_dateをインデックスとする約定履歴
+        """
+        self.add(*frame_columns(t))
+
+    def frame(self) -> pd.DataFrame:
+        """保持している時間足のOHLCを返します。
+        :return: 集計中の時間足を末尾に含むOHLC（bitflyer.conv_exec_to_ohlcと同じ形式）
+        """
+        rows = list(self.__bars)
+        if self.__bar is not None:
+            rows.append(self.__current())
+        rows = rows[-self.size:] if self.size else []
+        index = pd.DatetimeIndex(np.array([r[0] for r in rows], dtype='i8') * self.freq,
+                                 name='exec_date').tz_localize('UTC')
+        return pd.DataFrame(OrderedDict([(c, np.array([r[i] for r in rows], dtype=dtype))
+                                         for i, (c, dtype) in enumerate(BAR_COLUMNS.items(), start=1)]), index=index)
+
+    def __current(self) -> tuple:
+        """集計中の時間足を返します。遅延時間が存在しない場合は直前の時間足の値で補完します。"""
+        delay = self.__delay[0] / self.__delay[1] if self.__delay[1] else \
+            (self.__last[-1] if self.__last else np.nan)
+        return tuple([self.__bar] + [float(v) for v in self.__ohlc] + [float(v) for v in self.__sizes] +
+                     [len(ids) for ids in self.__ids] + [delay])
+
+    def __next_bar(self, bar: int) -> None:
+        """集計中の時間足を確定して、新しい時間足の集計を開始します。
+        間に約定が存在しない時間足がある場合は、価格と遅延時間を直前の時間足の値で補完して追加します。
+        :param bar: 新しい時間足の番号
+        """
+        if self.__bar is not None:
+            self.__last = self.__current()
+            self.__bars.append(self.__last)
+            empty = self.__last[1:5] + (0.0, 0.0, 0.0, 0, 0) + self.__last[-1:]
+            for b in range(max(self.__bar + 1, bar - self.__bars.maxlen), bar):
+                self.__bars.append((b,) + empty)
+        self.__bar = bar
+        self.__ohlc = None
+        self.__sizes = [0.0, 0.0, 0.0]
+        self.__ids = [set(), set()]
+        self.__delay = [0.0, 0]
+
+
+class BarCache(object):
+    """約定履歴と時間足の組み合わせごとに、OHLCを一度だけ作成して共有するキャッシュ
+
+    バックテストエンジンと全てのストラテジーで共有することで、同じ約定履歴を時間足ごとに何度も集計することを防ぎます。
+    作成済みの時間足の中に、長さが要求された時間足を割り切れるものがあれば、その時間足から集計し直して作成します。
+    子注文受付IDの種類数は時間足からは求められないため、約定履歴のIDのハッシュ値から集計します。
+    ストリームとして登録した約定履歴は、時間足ごとのBarBuilderでチャンクを読み込むたびに集計し、
+    getはそれまでに読み込んだ約定履歴のOHLCを返します。
+    """
+
+    def __init__(self, chunk_size: int = 10 ** 6):
+        """
+        :param chunk_size: 約定履歴を一度に集計する件数（メモリマップした約定履歴全体をメモリに読み込まないため）
+        """
+        self.chunk_size = chunk_size  # type: int
+        """約定履歴を一度に集計する件数"""
+
+        self.__sources = {}  # type: Dict[str, Any]
+        """約定履歴（exec_dateをインデックスとするDataFrameまたはdatautil.ExecutionStore）"""
+
+        self.__columns = {}  # type: Dict[str, List[np.ndarray]]
+        """集計に使用する約定履歴の列（frame_columnsと同じ構成）"""
+
+        self.__bars = {}  # type: Dict[Tuple[str, str], Tuple[int, Dict[tuple, np.ndarray], np.ndarray]]
+        """作成済みのOHLC（最初の時間足の番号、欠損値を補完する前の列、時間足ごとの遅延時間の件数）"""
+
+        self.__frames = {}  # type: Dict[Tuple[str, str], pd.DataFrame]
+        """作成済みのOHLC（欠損値を補完したもの）"""
+
+        self.__cache_dirs = {}  # type: Dict[str, str]
+        """約定履歴ごとのキャッシュディレクトリ"""
+
+        self.__streams = {}  # type: Dict[str, Any]
+        """チャンク単位で読み込む約定履歴（datautil.ExecutionStream）"""
+
+        self.__builders = {}  # type: Dict[Tuple[str, str], BarBuilder]
+        """ストリームの約定履歴から逐次作成しているOHLC"""
+
+    def add_source(self, source: str, executions, cache_dir: str = None) -> None:
+        """約定履歴を登録します。
+        :param source: 約定履歴の名前（ファイルパス等）
+        :param executions: exec_dateをインデックスとするDataFrameまたはdatautil.ExecutionStore
+        :param cache_dir: 約定履歴から計算したデータ（インジケーター等）を保存するディレクトリ
+        """
+        self.__sources[source] = executions
+        self.__cache_dirs[source] = cache_dir
+        self.__columns.pop(source, None)
+        for key in [k for k in self.__bars if k[0] == source]:
+            del self.__bars[key]
+            self.__frames.pop(key, None)
+
+    def add_stream(self, source: str, executions, cache_dir: str = None) -> None:
+        """チャンク単位で読み込む約定履歴を登録します。
+        OHLCは時間足ごとに、約定履歴のチャンクを読み込むたびに逐次作成します。
+        :param source: 約定履歴の名前（ファイルパス等）
+        :param executions: datautil.ExecutionStream（約定履歴を切り出す前のもの）
+        :param cache_dir: 約定履歴から計算したデータ（インジケーター等）を保存するディレクトリ
+        """
+        self.__streams[source] = executions
+        self.__cache_dirs[source] = cache_dir
+
+    def builder(self, rule: str, source: str = None) -> BarBuilder:
+        """ストリームの約定履歴からOHLCを逐次作成しているBarBuilderを返します。
+        :param rule: 時間足（1日を割り切れる長さ）
+        :param source: 約定履歴の名前（省略時は最初に登録した約定履歴）
+        :return: BarBuilder（ストリームではない場合や、作成済みのOHLCを登録した場合はNone）
+        :raise KeyError: 約定履歴の切り出しを始めた後に、新しい時間足を要求した場合
+        """
+        source = self.__default(source)
+        key = (source, rule)
+        if source not in self.__streams or key in self.__frames:
+            return None
+        if key not in self.__builders:
+            builder = BarBuilder(rule)
+            try:
+                self.__streams[source].subscribe(builder.add_frame)
+            except ValueError:
+                raise KeyError(f"OHLC of a stream must be requested before the backtest starts. "
+                               f"[source={source}, rule={rule}]")
+            self.__builders[key] = builder
+        return self.__builders[key]
+
+    def put(self, source: str, rule: str, ohlc: pd.DataFrame, cache_dir: str = None) -> None:
+        """作成済みのOHLCを登録します（約定履歴を保持しない場合に使用します）。
+        登録したOHLCは、他の時間足の作成には使用しません。
+        :param source: 約定履歴の名前
+        :param rule: 時間足
+        :param ohlc: OHLC（bitflyer.conv_exec_to_ohlcと同じ形式）
+        :param cache_dir: 約定履歴から計算したデータ（インジケーター等）を保存するディレクトリ
+        """
+        self.__frames[(source, rule)] = ohlc
+        self.__cache_dirs.setdefault(source, cache_dir)
+
+    def cache_dir(self, source: str = None) -> str:
+        """約定履歴から計算したデータを保存するディレクトリを返します。
+        :param source: 約定履歴の名前（省略時は最初に登録した約定履歴）
+        :return: ディレクトリ（保存しない場合はNone）
+        """
+        return self.__cache_dirs.get(self.__default(source))
+
+    def get(self, rule: str, source: str = None) -> pd.DataFrame:
+        """OHLCを返します。
+        返すOHLCは呼び出しごとの複製のため、列を追加する等の変更を行っても他の利用者には影響しません。
+        ストリームの約定履歴の場合は、呼び出し時点までに読み込んだ約定履歴のOHLCを返します（末尾の時間足は未確定です）。
+        :param rule: 時間足（1日を割り切れる長さ）
+        :param source: 約定履歴の名前（省略時は最初に登録した約定履歴）
+        :return: OHLC（bitflyer.conv_exec_to_ohlcと同じ形式）
+        """
+        source = self.__default(source)
+        key = (source, rule)
+        builder = self.builder(rule, source)
+        if builder is not None:
+            return builder.to_frame()
+        if key not in self.__frames:
+            if source not in self.__sources:
+                raise KeyError(f"No executions for OHLC. [source={source}, rule={rule}]")
+            freq = pd.Timedelta(rule).value
+            finer = [pd.Timedelta(r).value for s, r in self.__bars if s == source]
+            finer = [f for f in finer if f < freq and freq % f == 0]
+            self.__bars[key] = self.__derive(source, max(finer), freq) if finer else self.__build(source, rule)
+            self.__frames[key] = bars_frame(self.__bars[key][0], freq, self.__bars[key][1])
+        return self.__frames[key].copy()
+
+    def __default(self, source: str) -> str:
+        """約定履歴の名前を省略した場合は、最初に登録した約定履歴の名前を返します。"""
+        if source is None and self.__sources:
+            source = next(iter(self.__sources))
+        elif source is None and self.__streams:
+            source = next(iter(self.__streams))
+        elif source is None and self.__frames:
+            source = next(iter(self.__frames))[0]
+        return source
+
+    def __raw(self, source: str) -> List[np.ndarray]:
+        """集計に使用する約定履歴の列を返します。"""
+        if source not in self.__columns:
+            executions = self.__sources[source]
+            self.__columns[source] = frame_columns(executions) if isinstance(executions, pd.DataFrame) \
+                else executions.columns()
+        return self.__columns[source]
+
+    def __build(self, source: str, rule: str) -> Tuple[int, Dict[tuple, np.ndarray], np.ndarray]:
+        """約定履歴から時間足を集計します。"""
+        cols = self.__raw(source)
+        builder = BarBuilder(rule)
+        for head in range(0, len(cols[0]), self.chunk_size):
+            s = slice(head, head + self.chunk_size)
+            builder.add(*[np.asarray(c[s]) for c in cols])
+        first, bars = builder.to_columns()
+
+        count = np.zeros(len(bars[('price', 'open')]), dtype='i8')
+        for head in range(0, len(cols[0]), self.chunk_size):
+            s = slice(head, head + self.chunk_size)
+            time, delay = np.asarray(cols[0][s]), np.asarray(cols[4][s])
+            count += np.bincount(time[~np.isnan(delay)] // builder.freq - first, minlength=len(count))
+        return first, bars, count
+
+    def __derive(self, source: str, fine_freq: int, freq: int) -> Tuple[int, Dict[tuple, np.ndarray], np.ndarray]:
+        """作成済みの短い時間足から、長い時間足を集計します。"""
+        fine_first, fine, fine_count = [v for (s, r), v in self.__bars.items()
+                                        if s == source and pd.Timedelta(r).value == fine_freq][0]
+        k = freq // fine_freq
+        first = fine_first // k
+        g = (fine_first + np.arange(len(fine_count), dtype='i8')) // k - first  # type: np.ndarray
+        num = int(g[-1]) + 1 if len(g) else 0
+        bars = OrderedDict([(c, np.full(num, np.nan) if c in BAR_NAN_COLUMNS else np.zeros(num, dtype=dtype))
+                            for c, dtype in BAR_COLUMNS.items()])
+
+        # 約定が存在する時間足のみを対象に、価格を集計する
+        filled = ~np.isnan(fine[('price', 'open')])
+        if filled.any():
+            gf = g[filled]
+            pos, starts = np.unique(gf, return_index=True)
+            ends = np.append(starts[1:], len(gf))
+            bars[('price', 'open')][pos] = fine[('price', 'open')][filled][starts]
+            bars[('price', 'high')][pos] = np.maximum.reduceat(fine[('price', 'high')][filled], starts)
+            bars[('price', 'low')][pos] = np.minimum.reduceat(fine[('price', 'low')][filled], starts)
+            bars[('price', 'close')][pos] = fine[('price', 'close')][filled][ends - 1]
+        for c in [('size', 'size'), ('buy_size', 'buy_size'), ('sell_size', 'sell_size')]:
+            bars[c][:] = np.bincount(g, weights=fine[c], minlength=num)
+
+        # 遅延時間は件数で重み付けした平均
+        count = np.bincount(g, weights=fine_count, minlength=num).astype('i8')
+        delay_sum = np.bincount(g, weights=np.where(fine_count > 0, fine[('delay', 'delay')] * fine_count, 0),
+                                minlength=num)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            bars[('delay', 'delay')][:] = np.where(count > 0, delay_sum / count, np.nan)
+
+        # 子注文受付IDの種類数は約定履歴から集計する
+        cols = self.__raw(source)
+        for s in aligned_slices(cols[0], freq, self.chunk_size):
+            b = np.asarray(cols[0][s]) // freq - first
+            head = int(b[0])
+            for name, ids in zip(ID_COLUMNS, cols[5:]):
+                counts = count_ids(b - head, np.asarray(ids[s]), int(b[-1]) - head + 1)
+                bars[(name, name)][head:head + len(counts)] += counts
+        return first, bars, count
@@ -0,0 +1,131 @@
+# coding: utf-8
+
+import glob
+import os.path
+import re
+from logging import getLogger
+from typing import List, Dict, Any
+
+import numpy as np
+
+from baktlib.boardfile import is_board_file
+
+logger = getLogger(__name__)
+
+DAY_PATTERN = re.compile(r'(\d{4})-?(\d{2})-?(\d{2})')
+"""ファイル名から日付を抽出するパターン（YYYYMMDD、YYYY-MM-DD）"""
+
+SUM_KEYS = ['num_of_timeframes', 'volume',
+            'num_of_orders', 'num_of_buy_orders', 'num_of_sel_orders', 'num_of_lmt_orders', 'num_of_mkt_orders',
+            'num_of_completed_orders', 'num_of_canceled_orders', 'num_of_active_orders', 'num_of_exec',
+            'size_of_orders', 'size_of_limit_orders', 'size_of_market_orders', 'size_of_exec',
+            'num_of_trades', 'num_of_win', 'num_of_lose', 'num_of_even', 'profit', 'loss', 'total_pnl']
+"""日ごとの結果を合計して集計する項目"""
+
+
+class TapePair(object):
+    """1日分の約定履歴ファイルと板情報ファイルの組"""
+
+    def __init__(self, day: str, executions: str, boards: str):
+        self.day = day  # type: str
+        """日付（YYYY-MM-DD）"""
+
+        self.executions = executions  # type: str
+        """約定履歴ファイルのパス"""
+
+        self.boards = boards  # type: str
+        """板情報ファイルのパス"""
+
+    @property
+    def size(self) -> int:
+        """ファイルサイズの合計（バイト）"""
+        return os.path.getsize(self.executions) + os.path.getsize(self.boards)
+
+    def __repr__(self) -> str:
+        return f"TapePair(day={self.day}, executions={self.executions}, boards={self.boards})"
+
+
+def find_tapes(paths: List[str]) -> List[TapePair]:
+    """ディレクトリまたはglobパターンに一致するファイルを、ファイル名の日付ごとに約定履歴と板情報の組にします。
+    ファイル名に"board"を含むファイルを板情報、それ以外を約定履歴とみなします。
+    同じ日付の板情報のCSVとバイナリファイル（boardfile.SUFFIX）がある場合は、バイナリファイルを使用します。
+    ただし、バイナリファイルがCSVより古い場合は、CSVを再作成した後に変換していないものとみなしてCSVを使用します。
+    約定履歴と板情報が1件ずつ揃わない日付は除外します。
+    :param paths: ディレクトリまたはglobパターンのリスト
+    :return: 日付順の約定履歴と板情報の組のリスト
+    """
+    files = {}  # type: Dict[str, Dict[str, List[str]]]
+    for path in paths:
+        for file in sorted(glob.glob(os.path.join(path, '*') if os.path.isdir(path) else path)):
+            # キャッシュ等のディレクトリは対象外
+            m = DAY_PATTERN.search(os.path.basename(file))
+            if not os.path.isfile(file) or not m:
+                continue
+            kind = 'boards' if 'board' in os.path.basename(file).lower() else 'executions'
+            files.setdefault('-'.join(m.groups()), {'executions': [], 'boards': []})[kind].append(file)
+
+    pairs = []  # type: List[TapePair]
+    for day in sorted(files):
+        f = files[day]
+
+        # 板情報のCSVとバイナリファイルが両方ある場合は、CSVより古くなければバイナリファイルを使用する
+        binary = [b for b in f['boards'] if is_board_file(b)]
+        if len(binary) == 1:
+            text = [b for b in f['boards'] if b not in binary]
+            if text and os.path.getmtime(binary[0]) < max(os.path.getmtime(b) for b in text):
+                logger.warning(f"Use {text} instead of {binary[0]} because the board file is older than the CSV.")
+                f['boards'] = text
+            else:
+                f['boards'] = binary
+        if len(f['executions']) != 1 or len(f['boards']) != 1:
+            logger.warning(f"Skip {day} because executions and boards are not paired. {f}")
+            continue
+        pairs.append(TapePair(day, f['executions'][0], f['boards'][0]))
+    return pairs
+
+
+def max_drawdown(pnl: np.ndarray) -> float:
+    """損益の推移から最大ドローダウンを求めます（損益の初期値は0とします）。
+    :param pnl: 損益の推移
+    :return: 最大ドローダウン
+    """
+    if not len(pnl):
+        return 0.0
+    return round(float(np.max(np.maximum.accumulate(np.maximum(pnl, 0)) - pnl)), 8)
+
+
+def aggregate(rows: List[Dict[str, Any]], realized: List[np.ndarray]) -> Dict[str, Any]:
+    """日ごとの結果を全期間の結果に集計します。
+    件数やサイズ、損益は合計し、比率はそれらから計算し直します。
+    最大ドローダウンは日ごとの確定損益の推移をつなげて求めます。
+    :param rows: 日付順の日ごとの結果の行
+    :param realized: 日付順の日ごとの確定損益の推移
+    :return: 全期間の結果
+    """
+    total = {k: sum(r.get(k, 0) for r in rows) for k in SUM_KEYS}  # type: Dict[str, Any]
+    for k in ('volume', 'size_of_orders', 'size_of_limit_orders', 'size_of_market_orders', 'size_of_exec',
+              'profit', 'loss', 'total_pnl'):
+        total[k] = round(total[k], 8)
+    total['num_of_days'] = len(rows)
+
+    num = total['num_of_orders']
+    total['avg_order_size'] = round(total['size_of_orders'] / num, 8) if num else 0
+    total['exec_rate'] = round(total['size_of_exec'] / total['size_of_orders'], 2) if total['size_of_orders'] else 0
+
+    num_of_trades = total['num_of_trades']
+    win_rate = total['num_of_win'] / num_of_trades if num_of_trades else 0
+    not_win = total['num_of_lose'] + total['num_of_even']
+    avg_profit = total['profit'] / total['num_of_win'] if total['num_of_win'] else 0
+    avg_loss = total['loss'] / not_win if not_win else 0
+    total['win_rate'] = win_rate
+    total['expected_value'] = avg_profit * win_rate - avg_loss * (1 - win_rate)
+    total['pf'] = round(total['profit'] / total['loss'], 2) if total['loss'] else 0.0
+
+    # 各日の確定損益に前日までの確定損益を加算してつなげる
+    offset, curves = 0.0, []
+    for r in realized:
+        if len(r):
+            curves.append(np.asarray(r, dtype='f8') + offset)
+            offset = curves[-1][-1]
+    total['max_drawdown'] = max_drawdown(np.concatenate(curves) if curves else np.array([]))
+    return total
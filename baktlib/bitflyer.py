@@ -2,6 +2,8 @@
 
 import pandas as pd
 
+from baktlib.datautil import parse_times
+
 
 def conv_exec_to_ohlc(t: pd.DataFrame, rule: str) -> pd.DataFrame:
     # t = t.set_index(pd.to_datetime(t['exec_date']))
@@ -25,6 +27,7 @@ def create_ohlc_file_from_executions(input_file_path: str, output_file_path: str
                                                      'buy_child_order_acceptance_id': 'str',
                                                      'sell_child_order_acceptance_id': 'str',
                                                      'delay': 'float'})  # type: pd.DataFrame
+    executions = executions.set_index(parse_times(executions['exec_date'].values))
     ohlc = conv_exec_to_ohlc(executions, rule)  # type: pd.DataFrame
     t = pd.DataFrame({
         'time': ohlc.index,
@@ -34,7 +37,6 @@ def create_ohlc_file_from_executions(input_file_path: str, output_file_path: str
         'close': ohlc['price']['close'],
         'size': (ohlc['buy_size']['buy_size'] + ohlc['sell_size']['sell_size']).round(8),
         'delay': ohlc['delay']['delay'].round(3)})
-    t = t.set_index(pd.to_datetime(t['exec_date']))
     t.fillna(method='ffill').to_csv(output_file_path, index=False, header=True)
     # print(t.head(100))
 
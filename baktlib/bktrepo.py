@@ -287,8 +287,8 @@ def print_graph(orders_each_trade: List[List[Order]], result: Dict[str, Any], ds
     y -= y_span
 
     # DD
-    ax_text.text(label_x, y, "DD %", fontsize=fsize)
-    ax_text.text(value_x, y, "- %", fontsize=fsize)
+    ax_text.text(label_x, y, "Max DD", fontsize=fsize)
+    ax_text.text(value_x, y, f"{result['max_drawdown']:,}", fontsize=fsize)
     y -= y_span
 
     ax_text.text(label_x, y, "Process time", fontsize=fsize)
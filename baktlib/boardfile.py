@@ -0,0 +1,211 @@
+# coding: utf-8
+
+import json
+import os
+import struct
+from collections import OrderedDict
+from datetime import datetime
+from logging import getLogger
+from typing import Dict, Any, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from baktlib.constants import DTYPES_BOARDS
+from baktlib.datautil import index_to_ns, parse_times, read_table, to_ns
+
+logger = getLogger(__name__)
+
+SUFFIX = '.brd'  # type: str
+"""板情報のバイナリファイルの拡張子"""
+
+MAGIC = b'BAKTBRD1'  # type: bytes
+"""ファイルの先頭のマジックナンバー（末尾の1文字は形式のバージョン）"""
+
+BLOCK_SIZE = 4096  # type: int
+"""買い気配値の差分の基準値を置く間隔（行数）"""
+
+INT_TYPES = ['i1', 'i2', 'i4', 'i8']
+"""整数の列に使用する型（値を全て表せる最小の型を選びます）"""
+
+
+def data_offset(header_size: int) -> int:
+    """ヘッダーの長さから、列のデータ部の先頭の位置を返します（8バイト境界）。"""
+    return -(-(len(MAGIC) + 4 + header_size) // 8) * 8
+
+
+def is_board_file(path: str) -> bool:
+    """板情報のバイナリファイルのパスかどうかを返します。"""
+    return path.endswith(SUFFIX)
+
+
+def int_type(values: np.ndarray) -> str:
+    """値を全て表せる最小の整数型を返します。
+    :param values: 整数の配列
+    :return: 型（全て0の場合は空文字列。列を省略し、読み込み時は0とします）
+    """
+    if not len(values) or not values.any():
+        return ''
+    lo, hi = int(values.min()), int(values.max())
+    for t in INT_TYPES:
+        info = np.iinfo(t)
+        if info.min <= lo and hi <= info.max:
+            return t
+    raise OverflowError(f"Values out of int64 range. [{lo}, {hi}]")
+
+
+class BoardFile(object):
+    """板情報を列ごとの固定長の配列として保持するバイナリファイル
+
+    日時はエポックナノ秒（int64）、価格は整数、数量はfloat32（有効桁数は約7桁）で保持します。
+    買い気配値は直前の行との差分、売り気配値は買い気配値との差として保持し、
+    BLOCK_SIZE行ごとに買い気配値そのものを基準値として置くため、任意の範囲をその範囲の直前の基準値から復元できます。
+    仲値とスプレッドは気配値から求めた値（仲値は最良気配値の平均の切り捨て）との差のみ保持します（全て0の場合は列を省略します）。
+    各列はメモリマップで参照するため、ファイル全体を読み込まずに日時の範囲を指定して切り出せます。
+
+    ファイルの構成は、マジックナンバー、ヘッダーの長さ（4バイト）、ヘッダー（JSON）、列のデータ（8バイト境界に配置）です。
+    """
+
+    def __init__(self, path: str):
+        """
+        :param path: 板情報のバイナリファイルのパス
+        """
+        with open(path, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"Not a board file. [{path}]")
+            size, = struct.unpack('<I', f.read(4))
+            meta = json.loads(f.read(size).decode('utf-8'))  # type: Dict[str, Any]
+        base = data_offset(size)  # type: int
+
+        self.length = meta['length']  # type: int
+        """スナップショットの件数"""
+
+        self.block_size = meta['block_size']  # type: int
+        """買い気配値の基準値を置く間隔（行数）"""
+
+        self.__columns = {}  # type: Dict[str, np.ndarray]
+        """列名ごとのメモリマップ（省略した列はNone）"""
+        for name, dtype, offset, length in meta['columns']:
+            self.__columns[name] = None if not dtype else \
+                np.memmap(path, dtype=dtype, mode='r', offset=base + offset, shape=(length,)) if length \
+                else np.empty(0, dtype=dtype)
+
+        self.times = self.__columns['time']  # type: np.ndarray
+        """スナップショットの日時（エポックナノ秒）"""
+
+    def __len__(self) -> int:
+        return self.length
+
+    def between(self, start: datetime = None, end: datetime = None) -> slice:
+        """指定した期間のスナップショットの範囲を返します。
+        :param start: 開始日時（省略時は先頭から）
+        :param end: 終了日時（この日時は含まない。省略時は末尾まで）
+        :return: 行の範囲
+        """
+        head = int(np.searchsorted(self.times, to_ns(start), side='left')) if start is not None else 0
+        tail = int(np.searchsorted(self.times, to_ns(end), side='left')) if end is not None else self.length
+        return slice(head, max(head, tail))
+
+    def frame(self, s: slice = slice(None)) -> pd.DataFrame:
+        """指定範囲の板情報を、CSVから読み込んだ場合と同じ列構成のDataFrameとして返します。
+        :param s: 行の範囲（省略時は全て）
+        :return: 板情報（timeはdatetime64の列）
+        """
+        head, tail, _ = s.indices(self.length)
+        tail = max(head, tail)
+
+        # 範囲の直前の基準値から、買い気配値の差分を累積して復元する
+        start = head // self.block_size * self.block_size if tail > head else head
+        bid = self.__ints('bid_delta', start, tail)
+        if len(bid):
+            bid = np.cumsum(bid) - bid[0] + self.__columns['bid_anchor'][head // self.block_size]
+        bid = bid[head - start:]
+        ask = bid + self.__ints('ask_bid', head, tail)
+        return pd.DataFrame(OrderedDict([
+            ('time', pd.DatetimeIndex(np.asarray(self.times[head:tail]).view('M8[ns]'))),
+            ('mid_price', (ask + bid) // 2 + self.__ints('mid_residual', head, tail)),
+            ('best_ask_price', ask),
+            ('best_ask_size', np.asarray(self.__columns['best_ask_size'][head:tail], dtype='f8')),
+            ('best_bid_price', bid),
+            ('best_bid_size', np.asarray(self.__columns['best_bid_size'][head:tail], dtype='f8')),
+            ('spread', ask - bid + self.__ints('spread_residual', head, tail))]))
+
+    def __ints(self, name: str, head: int, tail: int) -> np.ndarray:
+        """整数の列の指定範囲をint64の配列として返します（省略した列は0）。"""
+        values = self.__columns[name]
+        return np.zeros(tail - head, dtype='i8') if values is None else np.asarray(values[head:tail], dtype='i8')
+
+
+def write_board_file(path: str, dst: str = None, block_size: int = BLOCK_SIZE) -> str:
+    """板情報ファイル（CSV/TSV）を板情報のバイナリファイルに変換します。
+    :param path: 板情報ファイルのパス
+    :param dst: 出力先のパス（省略時は拡張子をSUFFIXに置き換えたパス）
+    :param block_size: 買い気配値の基準値を置く間隔（行数）
+    :return: 出力先のパス
+    """
+    dst = dst or os.path.splitext(path)[0] + SUFFIX
+    boards = read_table(path, DTYPES_BOARDS)
+    if boards.drop(columns='time').isnull().values.any():
+        raise ValueError(f"Boards with missing values cannot be converted. [{path}]")
+
+    # 価格は差分と残差を整数で保持するため、小数の価格（仲値のx.5など）は切り捨てずに変換を中止する
+    prices = boards[['best_ask_price', 'best_bid_price', 'mid_price', 'spread']].values.astype('f8')  # type: np.ndarray
+    if (prices != np.floor(prices)).any():
+        raise ValueError(f"Boards with fractional prices cannot be converted. [{path}]")
+
+    times = index_to_ns(parse_times(boards['time'].values))  # type: np.ndarray
+    order = np.argsort(times, kind='mergesort')
+    boards = boards.iloc[order]
+
+    ask = boards['best_ask_price'].values.astype('i8')  # type: np.ndarray
+    bid = boards['best_bid_price'].values.astype('i8')  # type: np.ndarray
+
+    bid_delta = np.diff(bid, prepend=bid[:1]) if len(bid) else bid
+    columns = [('time', 'i8', times[order]),
+               ('bid_anchor', 'i8', bid[::block_size]),
+               ('bid_delta', None, bid_delta),
+               ('ask_bid', None, ask - bid),
+               ('mid_residual', None, boards['mid_price'].values - (ask + bid) // 2),
+               ('spread_residual', None, boards['spread'].values - (ask - bid)),
+               ('best_ask_size', 'f4', boards['best_ask_size'].values),
+               ('best_bid_size', 'f4', boards['best_bid_size'].values)]  # type: List[Tuple[str, str, np.ndarray]]
+
+    # 列の位置はデータ部の先頭からの位置として、8バイト境界に揃えて配置する
+    meta = {'version': 1, 'length': len(times), 'block_size': block_size, 'columns': []}
+    offset = 0
+    for name, dtype, values in columns:
+        dtype = dtype or int_type(values)
+        meta['columns'].append([name, dtype, offset, len(values)])
+        if dtype:
+            offset += -(-len(values) * np.dtype(dtype).itemsize // 8) * 8
+    header = json.dumps(meta).encode('utf-8')
+
+    tmp = dst + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(MAGIC)
+        f.write(struct.pack('<I', len(header)))
+        f.write(header)
+        base = data_offset(len(header))
+        for (_, _, values), (_, dtype, offset, _) in zip(columns, meta['columns']):
+            if dtype:
+                f.write(b'\0' * (base + offset - f.tell()))
+                f.write(np.ascontiguousarray(values, dtype=dtype).tobytes())
+    os.replace(tmp, dst)
+    logger.info(f"Converted boards. [{path} ({os.path.getsize(path):,} bytes) -> "
+                f"{dst} ({os.path.getsize(dst):,} bytes)]")
+    return dst
+
+
+def load_boards(path: str) -> pd.DataFrame:
+    """板情報のバイナリファイルの全ての板情報を読み込みます。
+    :param path: 板情報のバイナリファイルのパス
+    :return: 板情報（datautil.load_boardsと同じ形式）
+    """
+    return BoardFile(path).frame()
+
+
+if __name__ == '__main__':
+    import sys
+
+    for p in sys.argv[1:]:
+        print(write_board_file(p))
@@ -0,0 +1,319 @@
+# coding: utf-8
+
+import heapq
+from typing import Any, Callable, Dict, List, Set, Tuple
+
+import numpy as np
+import pandas as pd
+
+from baktlib.calc import sub, to_units, from_units, SIZE_UNIT
+from baktlib.constants import DEPTH_SNAPSHOT, ORDER_TYPE_LIMIT, Side
+from baktlib.datautil import index_to_ns, parse_times
+from baktlib.models import Order
+
+CUM_LEVELS = 64  # type: int
+"""数量の累積を最初に作成する最良気配からの気配の数（注文サイズに足りない場合は全ての気配まで作成し直します）"""
+
+
+class DepthIndex(object):
+    """板の全ての価格の数量（L2）の、スナップショットと差分のメッセージを時刻順に保持する索引
+
+    板情報ファイルを一度だけ解析して、メッセージごとの配列として保持します（パラメーターを変えた複数回のバックテストで共有できます）。
+    """
+
+    def __init__(self, depth: pd.DataFrame):
+        """
+        :param depth: L2の板情報（DTYPES_DEPTHのレイアウト）
+        """
+        times = index_to_ns(parse_times(depth['time'].values))  # type: np.ndarray
+        order = np.argsort(times, kind='mergesort')
+
+        self.times = times[order]  # type: np.ndarray
+        """メッセージの日時（エポックナノ秒）"""
+
+        self.snapshot = (np.asarray(depth['type'].values) == DEPTH_SNAPSHOT)[order]  # type: np.ndarray
+        """スナップショットの場合True、差分の場合False"""
+
+        self.bid = (np.asarray(depth['side'].values) == Side.BUY.value)[order]  # type: np.ndarray
+        """買い気配の場合True、売り気配の場合False"""
+
+        self.price = depth['price'].values.astype('f8')[order]  # type: np.ndarray
+        """価格"""
+
+        self.size = depth['size'].values.astype('f8')[order]  # type: np.ndarray
+        """数量（差分の場合は更新後の数量。0はその価格の気配がなくなったことを表します）"""
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+
+class OrderBook(object):
+    """L2の板情報を再生して、任意の時点の板を再現する板
+
+    価格ごとの気配は、sideごとに価格の昇順に並べた価格と数量の配列で保持します。
+    進めた範囲のメッセージはsideごとにまとめて適用し、同じ価格の更新は後勝ちとして、既存の配列との併合で反映します。
+    最良気配から順の数量の累積（固定小数点表現の単位数）は、sideの板が変わった後に必要になった時点で、必要な気配まで作成します。
+    進めた範囲内にスナップショットがある場合は、最後のスナップショットから板を作り直します。
+    """
+
+    def __init__(self, depth: DepthIndex):
+        """
+        :param depth: L2の板情報
+        """
+        self.__depth = depth  # type: DepthIndex
+
+        self.__head = 0  # type: int
+        """次に適用するメッセージの位置"""
+
+        self.time = 0  # type: int
+        """板を進めた日時（エポックナノ秒）"""
+
+        self.__prices = {True: np.empty(0, dtype='f8'), False: np.empty(0, dtype='f8')}  # type: Dict[bool, np.ndarray]
+        """sideごと（買い気配の場合True）の気配の価格（昇順）"""
+
+        self.__sizes = {True: np.empty(0, dtype='f8'), False: np.empty(0, dtype='f8')}  # type: Dict[bool, np.ndarray]
+        """sideごとの気配の数量（価格の配列と同じ順）"""
+
+        self.__cum = {True: None, False: None}  # type: Dict[bool, np.ndarray]
+        """sideごとの最良気配から順の数量の累積（sideの板が変わるとNoneに戻し、walkで必要な気配まで作成し直します）"""
+
+        self.__watched = {}  # type: Dict[Tuple[bool, float], Any]
+        """数量の変化を監視している気配（買い気配かどうかと価格の組をキーとする辞書）"""
+
+        self.__listener = None  # type: Callable[[bool, float, float], None]
+        """監視している気配の数量が変わった場合に呼び出す関数"""
+
+    def watch(self, levels: Dict[Tuple[bool, float], Any], listener: Callable[[bool, float, float], None]) -> None:
+        """気配の数量の変化を監視します。
+        :param levels: 監視する気配（買い気配かどうかと価格の組をキーとする辞書。呼び出し元がキーを追加・削除します）
+        :param listener: 監視している気配の数量が変わった場合に、買い気配かどうか、価格、変更後の数量を受け取る関数
+        """
+        self.__watched = levels
+        self.__listener = listener
+
+    def advance(self, ns: int) -> None:
+        """指定日時より前のメッセージを板に適用します。指定日時が前回より前の場合は何もしません。
+        :param ns: 日時（エポックナノ秒。この日時のメッセージは含まない）
+        """
+        d = self.__depth
+        self.time = max(self.time, ns)
+        tail = int(np.searchsorted(d.times, ns, side='left'))
+        if tail <= self.__head:
+            return
+        head = self.__head
+        self.__head = tail
+
+        # 範囲内の最後のスナップショットがあれば、そのスナップショットから板を作り直す
+        snaps = np.flatnonzero(d.snapshot[head:tail])
+        if len(snaps):
+            last = head + int(snaps[-1])
+            first = int(np.searchsorted(d.times[head:last + 1], d.times[last], side='left')) + head
+            s = slice(first, last + 1)
+            snap, b, price, size = d.snapshot[s], d.bid[s], d.price[s], d.size[s]
+            for bid, m in ((True, snap & b), (False, snap & ~b)):
+                self.__prices[bid] = np.empty(0, dtype='f8')
+                self.__sizes[bid] = np.empty(0, dtype='f8')
+                self.__apply(bid, price[m], size[m])
+            head = last + 1
+            for is_bid, p in list(self.__watched):
+                self.__listener(is_bid, p, self.__size(is_bid, p))
+
+        if head < tail:
+            s = slice(head, tail)
+            b, price, size = d.bid[s], d.price[s], d.size[s]
+            for bid, m in ((True, b), (False, ~b)):
+                if m.any():
+                    self.__apply(bid, price[m], size[m])
+
+            # 監視している気配には、途中の数量も含めてメッセージの順に変更後の数量を通知する
+            if self.__watched:
+                for is_bid, p, z in zip(b.tolist(), price.tolist(), size.tolist()):
+                    if (is_bid, p) in self.__watched:
+                        self.__listener(is_bid, p, max(z, 0.0))
+
+    def __apply(self, bid: bool, prices: np.ndarray, sizes: np.ndarray) -> None:
+        """sideのメッセージ（時刻順）を板に適用します。
+        :param bid: 買い気配の場合True
+        :param prices: 価格
+        :param sizes: 変更後の数量（0以下はその価格の気配がなくなったことを表します）
+        """
+        # メッセージを価格で安定ソートして既存の気配と併合し、同じ価格の中で最後のもの（最新の数量）を残す
+        order = np.argsort(prices, kind='mergesort')
+        book_p, book_z = self.__prices[bid], self.__sizes[bid]
+        at = np.searchsorted(book_p, prices[order], side='right') + np.arange(len(order))
+        rest = np.ones(len(book_p) + len(order), dtype=bool)
+        rest[at] = False
+        p = np.empty(len(rest), dtype='f8')
+        z = np.empty(len(rest), dtype='f8')
+        p[at], z[at] = prices[order], sizes[order]
+        p[rest], z[rest] = book_p, book_z
+        last = np.empty(len(p), dtype=bool)
+        np.not_equal(p[:-1], p[1:], out=last[:-1])
+        last[-1:] = True
+        last &= z > 0
+        self.__prices[bid] = p[last]
+        self.__sizes[bid] = z[last]
+        self.__cum[bid] = None
+
+    def __size(self, bid: bool, price: float) -> float:
+        p = self.__prices[bid]
+        i = int(np.searchsorted(p, price))
+        return float(self.__sizes[bid][i]) if i < len(p) and p[i] == price else 0.0
+
+    def __best_first(self, bid: bool) -> Tuple[np.ndarray, np.ndarray]:
+        """最良気配から順の価格と数量を返します。"""
+        if bid:
+            return self.__prices[bid][::-1], self.__sizes[bid][::-1]
+        return self.__prices[bid], self.__sizes[bid]
+
+    def size(self, side: Side, price: float) -> float:
+        """指定した価格の気配の数量を返します。
+        :param side: 気配のside（BUYは買い気配、SELLは売り気配）
+        :param price: 価格
+        :return: 数量（気配がない場合は0）
+        """
+        return self.__size(side == Side.BUY or side == Side.BUY.value, float(price))
+
+    def best_bid(self) -> float:
+        """最良買い気配値（買い気配がない場合はNone）"""
+        p = self.__prices[True]
+        return float(p[-1]) if len(p) else None
+
+    def best_ask(self) -> float:
+        """最良売り気配値（売り気配がない場合はNone）"""
+        p = self.__prices[False]
+        return float(p[0]) if len(p) else None
+
+    def levels(self, side: Side, n: int = None) -> Tuple[np.ndarray, np.ndarray]:
+        """最良気配から順に、気配の価格と数量を返します。
+        :param side: 気配のside（BUYは買い気配、SELLは売り気配）
+        :param n: 返す気配の数（省略時は全て）
+        :return: 最良気配から順の価格と数量
+        """
+        p, s = self.__best_first(side == Side.BUY or side == Side.BUY.value)
+        return p[:n].copy(), s[:n].copy()
+
+    def walk(self, side: Side, size: float) -> Tuple[np.ndarray, np.ndarray]:
+        """成行注文が最良気配から順に板を食って約定する価格と数量を返します。
+        数量の累積を二分探索して、注文サイズを満たす気配までを求めます（板の数量は減らしません）。
+        :param side: 成行注文のside（BUYは売り気配、SELLは買い気配を食います）
+        :param size: 注文サイズ
+        :return: 約定する価格と数量（板の数量が足りない場合は板の全ての気配）
+        """
+        bid = not (side == Side.BUY or side == Side.BUY.value)
+        p, s = self.__best_first(bid)
+        units = to_units(size)  # type: int
+        cum = self.__cum[bid]
+        while cum is None or (len(cum) < len(s) and cum[-1] < units):
+            n = len(s) if cum is not None else CUM_LEVELS
+            cum = self.__cum[bid] = np.cumsum(np.rint(s[:n] * SIZE_UNIT).astype('i8'))
+        k = int(np.searchsorted(cum, units, side='left'))
+        if k >= len(p):
+            return p.copy(), s.copy()
+        filled = s[:k + 1].copy()
+        filled[k] = from_units(units - (int(cum[k - 1]) if k else 0))
+        return p[:k + 1].copy(), filled
+
+
+class QueueTracker(object):
+    """シミュレーション上の指値注文について、板の同じ価格で自分より前に並んでいる数量を追跡する
+
+    待ち行列の位置は、注文が板に乗った時刻（注文日時に遅延時間を加えた日時）の、その価格の気配の数量で初期化します。
+    自分より前の数量は、同じ価格での約定と、気配の数量の減少（取消）で減り、その後に増えることはありません。
+    取消は自分より後ろから行われたものとみなし、気配の数量が自分より前の数量を下回った場合のみ減らします。
+    """
+
+    def __init__(self, book: OrderBook):
+        """
+        :param book: 再生中の板
+        """
+        self.__book = book  # type: OrderBook
+
+        self.__ahead = {}  # type: Dict[Order, float]
+        """注文ごとの、自分より前に並んでいる数量"""
+
+        self.__pending = []  # type: List[Tuple[int, int, Order]]
+        """板に乗る前の注文（板に乗る日時、追加順、注文のヒープ）"""
+
+        self.__seq = 0  # type: int
+        """追加順の連番"""
+
+        self.__levels = {}  # type: Dict[Tuple[bool, float], Set[Order]]
+        """追跡中の注文が並んでいる気配（買い気配かどうかと価格の組）ごとの注文"""
+
+        book.watch(self.__levels, self.__on_level_changed)
+
+    def add(self, o: Order, ns: int) -> None:
+        """注文が板に乗る日時を登録します。板をその日時まで進めた時点で、その価格の気配の数量から追跡を開始します。
+        :param o: 注文（指値注文以外は追跡しません）
+        :param ns: 注文が板に乗る日時（エポックナノ秒）
+        """
+        if o.type != ORDER_TYPE_LIMIT:
+            return
+        heapq.heappush(self.__pending, (ns, self.__seq, o))
+        self.__seq += 1
+
+    def advance(self, ns: int) -> None:
+        """板を指定日時まで進めます。途中で板に乗る注文は、板に乗る日時まで板を進めた時点で追跡を開始します。
+        :param ns: 日時（エポックナノ秒。この日時のメッセージは含まない）
+        """
+        book = self.__book
+        pending = self.__pending
+        while pending and pending[0][0] <= ns:
+            activation, _, o = heapq.heappop(pending)
+            if o.is_active() and o not in self.__ahead:
+                book.advance(activation)
+                self.__track(o)
+        book.advance(ns)
+
+    def __track(self, o: Order) -> float:
+        """現在の気配の数量を自分より前の数量として、注文の追跡を開始します。"""
+        ahead = self.__ahead[o] = self.__book.size(o.side, o.price)
+        self.__levels.setdefault((o.side == Side.BUY, float(o.price)), set()).add(o)
+        return ahead
+
+    def __on_level_changed(self, is_bid: bool, price: float, size: float) -> None:
+        for o in self.__levels[(is_bid, price)]:
+            if size < self.__ahead[o]:
+                self.__ahead[o] = size
+
+    def ahead(self, o: Order) -> float:
+        """注文より前に並んでいる数量を返します（追跡を開始していない場合は現在の気配の数量）。
+        :param o: 注文
+        :return: 数量
+        """
+        ahead = self.__ahead.get(o)
+        return self.__book.size(o.side, o.price) if ahead is None else ahead
+
+    def fill_size(self, o: Order, ex_price: float, ex_size: float) -> float:
+        """1件の約定で、注文が約定可能なサイズを返し、自分より前の数量を更新します。
+        追跡を開始していない注文は、現在の気配の数量から追跡を開始します。
+        注文の価格より有利な価格で約定した場合は、その価格の気配は全て約定したものとみなします。
+        :param o: 約定可能な価格の注文
+        :param ex_price: 約定価格
+        :param ex_size: 約定サイズ
+        :return: 自分より前の数量を消化した後の約定サイズ
+        """
+        if o.type != ORDER_TYPE_LIMIT:
+            return ex_size
+        ahead = self.__ahead.get(o)
+        if ahead is None:
+            ahead = self.__track(o)
+        through = ex_price < o.price if o.side == Side.BUY else ex_price > o.price
+        if through:
+            self.__ahead[o] = 0.0
+            return ex_size
+        self.__ahead[o] = max(sub(ahead, ex_size), 0.0)
+        return max(sub(ex_size, ahead), 0.0)
+
+    def discard(self, o: Order) -> None:
+        """約定、キャンセルまたは期限切れになった注文の追跡を終了します。
+        :param o: 注文
+        """
+        if self.__ahead.pop(o, None) is None:
+            return
+        key = (o.side == Side.BUY, float(o.price))
+        orders = self.__levels[key]
+        orders.discard(o)
+        if not orders:
+            del self.__levels[key]
@@ -3,6 +3,9 @@
 from decimal import Decimal
 from typing import Iterable
 
+SIZE_UNIT = 10 ** 8  # type: int
+"""サイズの固定小数点表現における1BTCあたりの単位数（1単位 = 0.00000001BTC）"""
+
 
 def d(f: float) -> Decimal:
     """数値をDecimal型に変換して返します。
@@ -12,16 +15,53 @@ def d(f: float) -> Decimal:
     return Decimal(str(f))
 
 
+def to_units(size: float) -> int:
+    """サイズを固定小数点表現（整数の単位数）に変換して返します。
+    小数点以下9桁目以降は丸められます。
+    :param size: サイズ（BTC）
+    :return: 単位数
+    """
+    return int(round(size * SIZE_UNIT))
+
+
+def from_units(units: int) -> float:
+    """固定小数点表現のサイズをfloatに変換して返します。
+    :param units: 単位数
+    :return: サイズ（BTC）
+    """
+    return units / SIZE_UNIT
+
+
+def is_integral(*values: float) -> bool:
+    """全ての値が整数値であるかどうかを返します。
+    :param values: 数値
+    :return: 全て整数値の場合True
+    """
+    return all(float(v).is_integer() for v in values)
+
+
+def div_round(n: int, m: int) -> int:
+    """整数同士の除算結果を偶数丸め（round関数と同じ丸め方）で整数にして返します。
+    :param n: 被除数
+    :param m: 除数（正の整数）
+    :return: round(n / m)
+    """
+    q, r = divmod(n, m)
+    if r * 2 > m or (r * 2 == m and q % 2 == 1):
+        q += 1
+    return q
+
+
 def add(a, b) -> float:
-    da = d(a) if type(a) is not Decimal else a
-    db = d(b) if type(b) is not Decimal else b
-    return round(float(da + db), 8)
+    if type(a) is Decimal or type(b) is Decimal:
+        return round(float(d(a) + d(b)), 8)
+    return from_units(to_units(a) + to_units(b))
 
 
 def sub(a, b) -> float:
-    da = d(a) if type(a) is not Decimal else a
-    db = d(b) if type(b) is not Decimal else b
-    return round(float(da - db), 8)
+    if type(a) is Decimal or type(b) is Decimal:
+        return round(float(d(a) - d(b)), 8)
+    return from_units(to_units(a) - to_units(b))
 
 
 def multi(a, b) -> float:
@@ -31,4 +71,4 @@ def multi(a, b) -> float:
 
 
 def sum_size(iterable: Iterable) -> float:
-    return round(float(sum([d(i) for i in iterable])), 8)
+    return from_units(sum(to_units(i) for i in iterable))
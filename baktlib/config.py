@@ -2,6 +2,8 @@
 
 from configparser import ConfigParser
 
+from baktlib.constants import CLOCK_TIMEFRAME
+
 
 class Config(object):
 
@@ -20,6 +22,9 @@ class Config(object):
         self.num_of_trade = int(conf[section]['num_of_trade'])  # type: int
         """トレードの施行回数（時間枠の数）"""
 
+        self.clock = str(conf[section].get('clock', CLOCK_TIMEFRAME))  # type: str
+        """シミュレーションの時計（timeframe: 時間枠ごと、event: イベントごと）"""
+
         self.report_dst_dir = str(conf[section]['report_dst_dir'])  # type: str
 
         self.strategy = str(conf[section]['strategy'])  # type: str
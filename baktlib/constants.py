@@ -27,6 +27,12 @@ SIDE_BUY = 'BUY'  # type: str
 SIDE_SELL = 'SELL'  # type: str
 """売買種別：売り"""
 
+CLOCK_TIMEFRAME = 'timeframe'  # type: str
+"""シミュレーションの時計：一定の時間枠ごとにストラテジーを起動する"""
+
+CLOCK_EVENT = 'event'  # type: str
+"""シミュレーションの時計：約定、注文の板乗り・有効期限、ストラテジーのタイマーの発生時刻ごとにストラテジーを起動する"""
+
 DATETIME_F = '%Y-%m-%d %H:%M:%S'
 """"""
 
@@ -50,6 +56,18 @@ DTYPES_BOARDS = {'time': 'str',
                  'best_bid_size': 'float',
                  'spread': 'int'}
 
+DTYPES_DEPTH = {'time': 'str',
+                'type': 'str',
+                'side': 'str',
+                'price': 'float',
+                'size': 'float'}
+
+DEPTH_SNAPSHOT = 'snapshot'  # type: str
+"""L2の板情報のメッセージ種別：スナップショット（同じ日時の行で板全体を表す）"""
+
+DEPTH_DIFF = 'diff'  # type: str
+"""L2の板情報のメッセージ種別：差分（その価格の気配の更新後の数量を表す）"""
+
 
 class Side(Enum):
     """
@@ -0,0 +1,753 @@
+# coding: utf-8
+
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from datetime import datetime
+from logging import getLogger
+from typing import Callable, Dict, Any, Iterator, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from baktlib.bars import BarBuilder, SIDES, ID_COLUMNS, hash_ids
+from baktlib.constants import DTYPES_EXEC, DTYPES_BOARDS, DTYPES_DEPTH
+
+logger = getLogger(__name__)
+
+CACHE_VERSION = 2  # type: int
+"""キャッシュの形式のバージョン"""
+
+CACHE_SUFFIX = '.bakt'  # type: str
+"""キャッシュを格納するディレクトリ名の接尾辞（元のファイルと同じディレクトリに作成します）"""
+
+STORE_SUFFIX = '.store'  # type: str
+"""約定履歴ストアを格納するディレクトリ名の接尾辞（元のファイルと同じディレクトリに作成します）"""
+
+
+def to_ns(t: datetime) -> int:
+    """日時をUTCのエポックナノ秒に変換して返します。
+    :param t: 日時（タイムゾーンなしの場合はUTCとみなします）
+    :return: エポックナノ秒
+    """
+    return pd.Timestamp(t).value
+
+
+def index_to_ns(index: pd.DatetimeIndex) -> np.ndarray:
+    """DatetimeIndexをUTCのエポックナノ秒の配列に変換して返します。
+    :param index: 日時インデックス
+    :return: int64の配列
+    """
+    return index.values.astype('datetime64[ns]').view('i8')
+
+
+TIME_LENGTH = 19  # type: int
+"""秒までの日時の文字列の長さ（YYYY-MM-DDTHH:MM:SS）"""
+
+MINUTE_LENGTH = 16  # type: int
+"""分までの日時の文字列の長さ（YYYY-MM-DDTHH:MM）"""
+
+MINUTE_FIELDS = [(0, 4), (5, 2), (8, 2), (11, 2), (14, 2)]  # type: List[Tuple[int, int]]
+"""日時の文字列の年、月、日、時、分の位置と桁数"""
+
+
+def parse_fixed_times(values: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """bitFlyerの形式（YYYY-MM-DDTHH:MM:SS[.fffffffff][Z]、日付と時刻の区切りは空白も可）の日時の文字列を変換します。
+    文字列をバイト列の2次元配列として扱い、各桁を列ごとにまとめて計算します。
+    分までの部分は連続する行で同じことが多いため、直前の行から変化した行のみ解析して、同じ行には同じ値を使用します。
+    :param values: 日時の文字列の配列
+    :return: エポックナノ秒の配列、形式に一致した行のマスク、末尾にZがある行のマスク
+    """
+    n = len(values)
+    ns, ok, utc = np.zeros(n, dtype='i8'), np.zeros(n, dtype=bool), np.zeros(n, dtype=bool)
+    try:
+        b = np.asarray(values).astype('S')  # type: np.ndarray
+    except (UnicodeEncodeError, TypeError, ValueError):
+        return ns, ok, utc
+    if not n or b.itemsize < TIME_LENGTH:
+        return ns, ok, utc
+    if b.itemsize == TIME_LENGTH:
+        b = b.astype(f"S{TIME_LENGTH + 1}")
+    c = b.view('u1').reshape(n, b.itemsize)  # type: np.ndarray
+
+    # 分までの部分が直前の行から変化した行（先頭行）のみ、年月日時分を解析して分単位の日時を求める
+    prefix = np.ndarray((n,), dtype=f"S{MINUTE_LENGTH}", buffer=b, strides=(b.itemsize,))  # type: np.ndarray
+    changed = np.ones(n, dtype=bool)
+    changed[1:] = prefix[1:] != prefix[:-1]
+    heads = c[changed, :MINUTE_LENGTH]  # type: np.ndarray
+    d = heads - np.uint8(ord('0'))  # 数字以外の文字は符号なしの減算で10以上になる
+    head_ok = ((heads[:, 4] == ord('-')) & (heads[:, 7] == ord('-'))
+               & ((heads[:, 10] == ord('T')) | (heads[:, 10] == ord(' '))) & (heads[:, 13] == ord(':')))
+    fields = []
+    for i, w in MINUTE_FIELDS:
+        v = d[:, i].astype('i8')
+        head_ok &= d[:, i] <= 9
+        for j in range(i + 1, i + w):
+            head_ok &= d[:, j] <= 9
+            v = v * 10 + d[:, j]
+        fields.append(v)
+    year, month, day, hour, minute = fields
+    head_ok &= (month >= 1) & (month <= 12) & (day >= 1) & (hour < 24) & (minute < 60)
+
+    # 月初の日数から日付を求め、翌月の月初までの日数で日の範囲を判定する
+    months = np.where(head_ok, (year - 1970) * 12 + month - 1, 0).astype('M8[M]')  # type: np.ndarray
+    first = months.astype('M8[D]').view('i8')
+    head_ok &= day <= (months + 1).astype('M8[D]').view('i8') - first
+    run = np.cumsum(changed) - 1
+    ok = head_ok[run]
+    minutes = (((first + day - 1) * 24 + hour) * 60 + minute)[run]
+
+    # 秒以降は行ごとに解析する（末尾のZを除いた長さで小数部の桁数を判定する）
+    length = TIME_LENGTH + (c[:, TIME_LENGTH:] != 0).sum(axis=1)
+    utc = c[np.arange(n), length - 1] == ord('Z')
+    length -= utc
+    ok &= (length == TIME_LENGTH) | ((length > TIME_LENGTH + 1) & (length <= TIME_LENGTH + 10)
+                                     & (c[:, TIME_LENGTH] == ord('.')))
+    tens, ones = c[:, 17] - np.uint8(ord('0')), c[:, 18] - np.uint8(ord('0'))
+    sec = tens.astype('i8') * 10 + ones
+    ok &= (c[:, MINUTE_LENGTH] == ord(':')) & (tens <= 9) & (ones <= 9) & (sec < 60)
+
+    # 小数部は桁数が行ごとに異なるため、桁ごとに文字列の長さの範囲内かを判定して加算する
+    frac = np.zeros(n, dtype='i8')
+    for k in range(min(b.itemsize - TIME_LENGTH - 1, 9)):
+        in_frac = TIME_LENGTH + 1 + k < length
+        digit = c[:, TIME_LENGTH + 1 + k] - np.uint8(ord('0'))
+        ok &= ~in_frac | (digit <= 9)
+        frac += np.where(in_frac, digit, np.uint8(0)).astype('i8') * 10 ** (8 - k)
+
+    ns = np.where(ok, (minutes * 60 + sec) * 10 ** 9 + frac, 0)
+    return ns, ok, utc & ok
+
+
+def parse_times(values: np.ndarray) -> pd.DatetimeIndex:
+    """日時の文字列の配列をDatetimeIndexに変換します（pd.to_datetimeの代わりに全ての読み込み処理で使用します）。
+    bitFlyerの形式の行はparse_fixed_timesで変換し、形式に一致しない行のみpd.to_datetimeで変換します。
+    :param values: 日時の文字列の配列（datetime64の配列の場合はそのまま返します）
+    :return: 日時（タイムゾーン付きの行がある場合はUTC、それ以外はタイムゾーンなし）
+    """
+    values = np.asarray(values)
+    if values.dtype.kind == 'M':
+        return pd.DatetimeIndex(values)
+    ns, ok, utc = parse_fixed_times(values)
+    aware = bool(utc.any())
+    if not ok.all():
+        rest = pd.DatetimeIndex(pd.to_datetime(values[~ok]))
+        ns[~ok] = index_to_ns(rest)
+        aware |= rest.tz is not None
+    index = pd.DatetimeIndex(ns.view('M8[ns]'))
+    return index.tz_localize('UTC') if aware else index
+
+
+class TimeWindow(object):
+    """ソート済みの約定日時を時間枠ごとに切り出すためのカーソル
+
+    全時間枠の境界位置をsearchsortedで一度だけ求めておき、時間枠を進めるごとにカーソルを前進させます。
+    時間枠あたりの切り出しは、データ全体ではなく時間枠内の件数にのみ比例します。
+    """
+
+    def __init__(self, times: np.ndarray, start: datetime, timeframe_sec: int, num: int):
+        """
+        :param times: 昇順にソート済みの約定日時（エポックナノ秒）
+        :param start: 最初の時間枠の開始日時
+        :param timeframe_sec: 時間枠の長さ（秒）
+        :param num: 時間枠の数
+        """
+        ends = to_ns(start) + np.arange(1, num + 1, dtype='i8') * (timeframe_sec * 10 ** 9)  # type: np.ndarray
+
+        self.__bounds = np.searchsorted(times, ends, side='left')  # type: np.ndarray
+        """各時間枠の終端（この位置を含まない）"""
+
+        self.__head = int(np.searchsorted(times, to_ns(start), side='left'))  # type: int
+        """次に切り出す時間枠の先頭位置"""
+
+        self.__num = 0  # type: int
+        """切り出し済みの時間枠の数"""
+
+    def next(self) -> slice:
+        """次の時間枠に含まれる約定の範囲を返し、カーソルを進めます。
+        :return: 時間枠 [from, to) に含まれる行の範囲
+        """
+        if self.__num >= len(self.__bounds):
+            raise IndexError('No more time windows.')
+        tail = int(self.__bounds[self.__num])
+        s = slice(self.__head, tail)
+        self.__head = tail
+        self.__num += 1
+        return s
+
+    def empty_run(self) -> int:
+        """次の時間枠から連続する、約定を含まない時間枠の数を返します。
+        :return: 約定を含まない時間枠の数（以降の全ての時間枠に約定が存在しない場合は残りの時間枠の数）
+        """
+        return int(np.searchsorted(self.__bounds, self.__head, side='right')) - self.__num
+
+    def skip(self, n: int) -> None:
+        """約定を含まない時間枠を切り出さずにカーソルを進めます。
+        :param n: 進める時間枠の数（empty_run以下）
+        """
+        if n > self.empty_run():
+            raise ValueError('Cannot skip time windows that contain executions.')
+        self.__num += n
+
+
+class BoardIndex(object):
+    """板情報のスナップショットを時刻で検索するための索引
+
+    板情報ファイルを一度だけ解析して、時刻（エポックナノ秒）の昇順に並べた配列として保持します。
+    検索は二分探索で行うため、1回あたりO(log n)です。
+    """
+
+    def __init__(self, boards: pd.DataFrame):
+        """
+        :param boards: 板情報（DTYPES_BOARDSのレイアウト）
+        """
+        times = index_to_ns(parse_times(boards['time'].values))  # type: np.ndarray
+        order = np.argsort(times, kind='mergesort')
+
+        self.times = times[order]  # type: np.ndarray
+        """スナップショットの日時（エポックナノ秒）"""
+
+        self.mid_price = boards['mid_price'].values[order]  # type: np.ndarray
+        """仲値"""
+
+        self.best_ask_price = boards['best_ask_price'].values[order]  # type: np.ndarray
+        """最良売り気配値"""
+
+        self.best_ask_size = boards['best_ask_size'].values[order]  # type: np.ndarray
+        """最良売り気配の数量"""
+
+        self.best_bid_price = boards['best_bid_price'].values[order]  # type: np.ndarray
+        """最良買い気配値"""
+
+        self.best_bid_size = boards['best_bid_size'].values[order]  # type: np.ndarray
+        """最良買い気配の数量"""
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    def at(self, t: datetime, sec: int = 1) -> int:
+        """指定日時から一定時間内で最初のスナップショットの位置を返します。
+        :param t: 日時
+        :param sec: 検索する時間の幅（秒）
+        :return: [t, t + sec) に含まれる最初のスナップショットの位置。存在しない場合は-1。
+        """
+        ns = to_ns(t)
+        i = int(np.searchsorted(self.times, ns, side='left'))
+        return i if i < len(self.times) and self.times[i] < ns + sec * 10 ** 9 else -1
+
+    def asof(self, t: datetime) -> int:
+        """指定日時の時点で最新のスナップショットの位置を返します。
+        :param t: 日時
+        :return: t以前で最後のスナップショットの位置。存在しない場合は-1。
+        """
+        return int(np.searchsorted(self.times, to_ns(t), side='right')) - 1
+
+
+def read_table(path: str, dtype: Dict[str, str]) -> pd.DataFrame:
+    """CSVまたはTSVのファイルを読み込みます。
+    :param path: ファイルパス（拡張子が.tsvの場合はタブ区切りとして読み込みます）
+    :param dtype: 列の型
+    :return: 読み込んだデータ
+    """
+    return pd.read_csv(path, dtype=dtype, sep='\t' if path.endswith('.tsv') else ',')
+
+
+def load_executions(path: str, use_cache: bool = True) -> pd.DataFrame:
+    """約定履歴を読み込みます。
+    exec_dateはdatetime64、sideはcategoryの列として返します。
+    :param path: 約定履歴ファイルのパス
+    :param use_cache: キャッシュを使用する場合True
+    :return: 約定履歴
+    """
+    def read() -> pd.DataFrame:
+        t = read_table(path, DTYPES_EXEC)
+        logger.info('start parse_times exec_date')
+        t['exec_date'] = parse_times(t['exec_date'].values)
+        logger.info('end parse_times exec_date')
+        t['side'] = t['side'].astype('category')
+        return t
+
+    return load_cached(path, read) if use_cache else read()
+
+
+def load_boards(path: str, use_cache: bool = True) -> pd.DataFrame:
+    """板情報を読み込みます。
+    timeはdatetime64の列として返します。
+    :param path: 板情報ファイルのパス
+    :param use_cache: キャッシュを使用する場合True
+    :return: 板情報
+    """
+    def read() -> pd.DataFrame:
+        t = read_table(path, DTYPES_BOARDS)
+        t['time'] = parse_times(t['time'].values)
+        return t
+
+    return load_cached(path, read) if use_cache else read()
+
+
+def load_depth(path: str, use_cache: bool = True) -> pd.DataFrame:
+    """L2の板情報（スナップショットと差分）を読み込みます。
+    timeはdatetime64、typeとsideはcategoryの列として返します。
+    :param path: L2の板情報ファイルのパス
+    :param use_cache: キャッシュを使用する場合True
+    :return: L2の板情報
+    """
+    def read() -> pd.DataFrame:
+        t = read_table(path, DTYPES_DEPTH)
+        t['time'] = parse_times(t['time'].values)
+        t['type'] = t['type'].astype('category')
+        t['side'] = t['side'].astype('category')
+        return t
+
+    return load_cached(path, read) if use_cache else read()
+
+
+def fingerprint(path: str, chunk_size: int = 1 << 20) -> Dict[str, Any]:
+    """ファイルが変更されていないかを判定するための情報を返します。
+    ファイル全体のハッシュは巨大なファイルでは時間がかかるため、先頭と末尾の一定サイズのみをハッシュ化します。
+    :param path: ファイルパス
+    :param chunk_size: ハッシュ化する先頭と末尾のサイズ（バイト）
+    :return: サイズ、更新日時、ハッシュ値
+    """
+    st = os.stat(path)
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        h.update(f.read(chunk_size))
+        if st.st_size > chunk_size:
+            f.seek(max(chunk_size, st.st_size - chunk_size))
+            h.update(f.read(chunk_size))
+    return {'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'sha1': h.hexdigest()}
+
+
+def load_cached(path: str, read: Callable[[], pd.DataFrame]) -> pd.DataFrame:
+    """キャッシュが有効であればキャッシュから、そうでなければ元のファイルからデータを読み込みます。
+    元のファイルから読み込んだ場合は、列ごとのバイナリ形式のキャッシュを作成します。
+    :param path: 元のファイルのパス
+    :param read: 元のファイルを読み込む関数
+    :return: 読み込んだデータ
+    """
+    cache_dir = path + CACHE_SUFFIX
+    source = fingerprint(path)
+    meta = read_cache_meta(cache_dir)
+    if meta and meta['version'] == CACHE_VERSION and meta['source'] == source:
+        logger.info(f"Load from cache. [{cache_dir}]")
+        return read_cache(cache_dir, meta)
+
+    t = read()
+    try:
+        write_cache(cache_dir, t, source)
+        logger.info(f"Created cache. [{cache_dir}]")
+    except OSError as e:
+        logger.warning(f"Failed to create cache. [{cache_dir}] {e}")
+    return t
+
+
+def read_cache_meta(cache_dir: str) -> Dict[str, Any]:
+    """キャッシュのメタ情報を返します。
+    :param cache_dir: キャッシュのディレクトリ
+    :return: メタ情報。キャッシュが存在しない場合はNone。
+    """
+    try:
+        with open(os.path.join(cache_dir, 'meta.json'), 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_cache(cache_dir: str, t: pd.DataFrame, source: Dict[str, Any]) -> None:
+    """データを列ごとの.npyファイルとして書き込みます。
+    日時はエポックナノ秒、文字列はカテゴリのコードとカテゴリの一覧として書き込みます。
+    文字列の列は元の型（categoryまたはobject）を記録し、キャッシュから読み込んだ場合も同じ型に戻します。
+    メタ情報は最後に書き込むため、書き込みが中断されたキャッシュが使用されることはありません。
+    :param cache_dir: キャッシュのディレクトリ
+    :param t: データ
+    :param source: 元のファイルの情報
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    columns = []
+    for name in t.columns:
+        col = t[name]
+        c = {'name': name}
+        if pd.api.types.is_datetime64_any_dtype(col):
+            c['kind'] = 'datetime'
+            c['tz'] = str(col.dt.tz) if col.dt.tz else None
+            values = index_to_ns(pd.DatetimeIndex(col))
+        elif pd.api.types.is_categorical_dtype(col) or pd.api.types.is_object_dtype(col):
+            c['kind'] = 'category' if pd.api.types.is_categorical_dtype(col) else 'object'
+            codes, categories = (col.cat.codes.values, col.cat.categories) \
+                if pd.api.types.is_categorical_dtype(col) else pd.factorize(col)
+            np.save(os.path.join(cache_dir, f"{name}.categories.npy"), np.asarray(categories, dtype='U'))
+            values = codes.astype('i4')
+        else:
+            c['kind'] = 'numeric'
+            values = col.values
+        np.save(os.path.join(cache_dir, f"{name}.npy"), values)
+        columns.append(c)
+
+    tmp = os.path.join(cache_dir, 'meta.json.tmp')
+    with open(tmp, 'w') as f:
+        json.dump({'version': CACHE_VERSION, 'source': source, 'length': len(t), 'columns': columns}, f)
+    os.replace(tmp, os.path.join(cache_dir, 'meta.json'))
+
+
+def read_cache(cache_dir: str, meta: Dict[str, Any]) -> pd.DataFrame:
+    """列ごとの.npyファイルからデータを読み込みます。
+    :param cache_dir: キャッシュのディレクトリ
+    :param meta: メタ情報
+    :return: データ
+    """
+    data = OrderedDict()
+    for c in meta['columns']:
+        name = c['name']
+        values = np.load(os.path.join(cache_dir, f"{name}.npy"))
+        if c['kind'] == 'datetime':
+            values = pd.DatetimeIndex(values.view('M8[ns]'))
+            if c['tz']:
+                values = values.tz_localize('UTC').tz_convert(c['tz'])
+        elif c['kind'] in ('category', 'object'):
+            categories = np.load(os.path.join(cache_dir, f"{name}.categories.npy"))
+            values = pd.Categorical.from_codes(values, categories=categories)
+            if c['kind'] == 'object':
+                values = np.asarray(values, dtype=object)
+        data[name] = values
+    return pd.DataFrame(data)
+
+
+class ExecutionStore(object):
+    """約定履歴を列ごとの固定長のバイナリファイルとして保持し、メモリマップで参照するストア
+
+    約定履歴全体をメモリに読み込まずに、時間枠ごとに必要な範囲だけを切り出して使用できます。
+    ストアの作成もチャンク単位で行うため、メモリに収まらない約定履歴でも扱えます。
+
+    文字列の列は、sideはSIDESのコード（該当なしは-1）、子注文受付IDはハッシュ値（欠損は0）として保持します。
+    """
+
+    COLUMNS = OrderedDict([('time', 'i8'),
+                           ('id', 'i8'),
+                           ('side', 'i1'),
+                           ('price', 'f8'),
+                           ('size', 'f8'),
+                           ('delay', 'f8'),
+                           ('buy_child_order_acceptance_id', 'u8'),
+                           ('sell_child_order_acceptance_id', 'u8')])
+    """列名と型"""
+
+    def __init__(self, store_dir: str):
+        """
+        :param store_dir: ストアのディレクトリ
+        """
+        meta = read_cache_meta(store_dir)
+        if meta is None:
+            raise FileNotFoundError(f"Execution store not found. [{store_dir}]")
+
+        self.length = meta['length']  # type: int
+        """約定履歴の件数"""
+
+        self.time = None  # type: np.ndarray
+        """約定日時（エポックナノ秒）"""
+
+        self.id = None  # type: np.ndarray
+        """約定ID"""
+
+        self.side = None  # type: np.ndarray
+        """sideのコード"""
+
+        self.price = None  # type: np.ndarray
+        """約定価格"""
+
+        self.size = None  # type: np.ndarray
+        """約定サイズ"""
+
+        self.delay = None  # type: np.ndarray
+        """遅延時間（秒）"""
+
+        self.buy_child_order_acceptance_id = None  # type: np.ndarray
+        """買い注文の子注文受付IDのハッシュ値"""
+
+        self.sell_child_order_acceptance_id = None  # type: np.ndarray
+        """売り注文の子注文受付IDのハッシュ値"""
+
+        for name, dtype in self.COLUMNS.items():
+            values = np.memmap(os.path.join(store_dir, f"{name}.bin"), dtype=dtype, mode='r', shape=(self.length,)) \
+                if self.length else np.empty(0, dtype=dtype)
+            setattr(self, name, values)
+
+    def __len__(self) -> int:
+        return self.length
+
+    @classmethod
+    def open(cls, path: str, chunk_size: int = 10 ** 6) -> 'ExecutionStore':
+        """約定履歴ファイルに対応するストアを開きます。
+        ストアが存在しない場合や、元のファイルが変更されている場合はストアを作成し直します。
+        :param path: 約定履歴ファイルのパス
+        :param chunk_size: ストアの作成時に一度に読み込む行数
+        :return: ストア
+        """
+        store_dir = path + STORE_SUFFIX
+        source = fingerprint(path)
+        meta = read_cache_meta(store_dir)
+        if not (meta and meta['version'] == CACHE_VERSION and meta['source'] == source):
+            logger.info(f"Create execution store. [{store_dir}]")
+            write_store(path, store_dir, source, chunk_size)
+        return cls(store_dir)
+
+    def frame(self, s: slice) -> pd.DataFrame:
+        """指定範囲の約定履歴をDataFrameとして返します。
+        :param s: 行の範囲
+        :return: exec_dateをインデックスとする約定履歴
+        """
+        t = pd.DataFrame(OrderedDict([
+            ('id', self.id[s]),
+            ('side', pd.Categorical.from_codes(self.side[s], categories=SIDES)),
+            ('price', self.price[s]),
+            ('size', self.size[s]),
+            ('buy_child_order_acceptance_id', self.buy_child_order_acceptance_id[s]),
+            ('sell_child_order_acceptance_id', self.sell_child_order_acceptance_id[s]),
+            ('delay', self.delay[s])]),
+            index=pd.DatetimeIndex(self.time[s].view('M8[ns]'), name='exec_date').tz_localize('UTC'))
+        return t
+
+    def ohlc(self, rule: str, chunk_size: int = 10 ** 6) -> pd.DataFrame:
+        """約定履歴からOHLCを作成します。
+        bitflyer.conv_exec_to_ohlcと同じ形式で返しますが、チャンク単位で集計するため、約定履歴全体をメモリに読み込みません。
+        :param rule: 時間足（1日を割り切れる長さ）
+        :param chunk_size: 一度に集計する行数
+        :return: OHLC
+        """
+        builder = BarBuilder(rule)
+        for head in range(0, self.length, chunk_size):
+            s = slice(head, head + chunk_size)
+            builder.add(*[np.asarray(c[s]) for c in self.columns()])
+        return builder.to_frame()
+
+    def columns(self) -> List[np.ndarray]:
+        """時間足の集計に使用する列を返します。
+        :return: bars.frame_columnsと同じ構成の列（メモリマップ）
+        """
+        return [getattr(self, c) for c in ['time', 'side', 'price', 'size', 'delay'] + ID_COLUMNS]
+
+
+def write_store(path: str, store_dir: str, source: Dict[str, Any], chunk_size: int) -> None:
+    """約定履歴ファイルをチャンク単位で読み込み、ストアの各列のファイルに追記します。
+    :param path: 約定履歴ファイルのパス
+    :param store_dir: ストアのディレクトリ
+    :param source: 元のファイルの情報
+    :param chunk_size: 一度に読み込む行数
+    """
+    os.makedirs(store_dir, exist_ok=True)
+    files = {name: open(os.path.join(store_dir, f"{name}.bin"), 'wb') for name in ExecutionStore.COLUMNS}
+    length = 0
+    try:
+        for t in pd.read_csv(path, dtype=DTYPES_EXEC, sep='\t' if path.endswith('.tsv') else ',',
+                             chunksize=chunk_size):
+            values = {'time': index_to_ns(parse_times(t['exec_date'].values)),
+                      'side': pd.Categorical(t['side'], categories=SIDES).codes}
+            for name in ID_COLUMNS:
+                values[name] = hash_ids(t[name].values)
+            for name, dtype in ExecutionStore.COLUMNS.items():
+                v = values[name] if name in values else t[name].values
+                files[name].write(np.ascontiguousarray(v, dtype=dtype).tobytes())
+            length += len(t)
+    finally:
+        for f in files.values():
+            f.close()
+
+    tmp = os.path.join(store_dir, 'meta.json.tmp')
+    with open(tmp, 'w') as f:
+        json.dump({'version': CACHE_VERSION, 'source': source, 'length': length,
+                   'columns': list(ExecutionStore.COLUMNS.items())}, f)
+    os.replace(tmp, os.path.join(store_dir, 'meta.json'))
+
+
+def read_execution_chunks(path: str, chunk_size: int) -> Iterator[pd.DataFrame]:
+    """約定履歴ファイルをチャンク単位で読み込みます。
+    :param path: 約定履歴ファイルのパス
+    :param chunk_size: 一度に読み込む行数
+    :return: exec_dateをインデックスとする約定履歴のチャンク
+    """
+    for t in pd.read_csv(path, dtype=DTYPES_EXEC, sep='\t' if path.endswith('.tsv') else ',', chunksize=chunk_size):
+        t['exec_date'] = parse_times(t['exec_date'].values)
+        t['side'] = pd.Categorical(t['side'], categories=SIDES)
+        yield t.set_index('exec_date')
+
+
+def stream_ohlc(path: str, rule: str, chunk_size: int = 10 ** 6) -> Tuple[pd.DataFrame, int]:
+    """約定履歴ファイルをチャンク単位で読み込みながらOHLCを作成します。
+    :param path: 約定履歴ファイルのパス
+    :param rule: 時間足
+    :param chunk_size: 一度に読み込む行数
+    :return: OHLCと約定履歴の件数
+    """
+    builder = BarBuilder(rule)
+    length = 0
+    for t in read_execution_chunks(path, chunk_size):
+        builder.add_frame(t)
+        length += len(t)
+    return builder.to_frame(), length
+
+
+class ExecutionStream(object):
+    """約定履歴ファイルをチャンク単位で読み込みながら、時間枠ごとに約定履歴を切り出すストリーム
+
+    保持する約定履歴は、読み込み済みで未だ切り出していない範囲のみのため、メモリ使用量はチャンクの大きさで抑えられます。
+    約定履歴ファイルは約定日時の昇順に並んでいる必要があります。
+    """
+
+    def __init__(self, path: str, chunk_size: int = 10 ** 5):
+        """
+        :param path: 約定履歴ファイルのパス
+        :param chunk_size: 一度に読み込む行数
+        """
+        self.__chunks = read_execution_chunks(path, chunk_size)  # type: Iterator[pd.DataFrame]
+        """未読のチャンク"""
+
+        self.__buffer = None  # type: pd.DataFrame
+        """読み込み済みで未だ切り出していない約定履歴"""
+
+        self.__times = np.empty(0, dtype='i8')  # type: np.ndarray
+        """バッファの約定日時（エポックナノ秒）"""
+
+        self.__eof = False  # type: bool
+        """ファイルを最後まで読み込んだ場合True"""
+
+        self.length = 0  # type: int
+        """読み込み済みの約定履歴の件数"""
+
+        self.__listeners = []  # type: List[Callable[[pd.DataFrame], None]]
+        """チャンクを読み込むたびに呼び出す関数"""
+
+        self.__taken = False  # type: bool
+        """約定履歴を切り出した場合True"""
+
+        self.__fill()
+
+    def subscribe(self, listener: Callable[[pd.DataFrame], None]) -> None:
+        """チャンクを読み込むたびに、読み込んだ約定履歴を受け取る関数を登録します。
+        登録時点で読み込み済みの約定履歴は、登録時に渡します。
+        切り出し済みの約定履歴は渡せないため、約定履歴を切り出す前に登録してください。
+        :param listener: exec_dateをインデックスとする約定履歴を受け取る関数
+        """
+        if self.__taken:
+            raise ValueError('Listeners must be subscribed before taking executions.')
+        self.__listeners.append(listener)
+        if len(self.__times):
+            listener(self.__buffer)
+
+    def first_time(self) -> pd.Timestamp:
+        """未だ切り出していない最初の約定日時を返します。
+        :return: 約定日時。約定履歴が存在しない場合はNone。
+        """
+        return self.__buffer.index[0] if len(self.__times) else None
+
+    def ends_before(self, to: datetime) -> bool:
+        """最後の約定日時が指定日時より前かどうかを返します。
+        :param to: 日時
+        :return: 指定日時以降の約定履歴が存在しない場合True
+        """
+        ns = to_ns(to)
+        self.__fill_until(ns)
+        return not len(self.__times) or self.__times[-1] < ns
+
+    def take(self, to: datetime) -> pd.DataFrame:
+        """指定日時より前の約定履歴を切り出します。
+        :param to: 日時（この日時を含まない）
+        :return: exec_dateをインデックスとする約定履歴
+        """
+        ns = to_ns(to)
+        self.__fill_until(ns)
+        self.__taken = True
+        i = int(np.searchsorted(self.__times, ns, side='left'))
+        t = self.__buffer.iloc[:i]
+        self.__buffer = self.__buffer.iloc[i:]
+        self.__times = self.__times[i:]
+        return t
+
+    def __fill_until(self, ns: int) -> None:
+        """指定日時以降の約定履歴を読み込むか、ファイルを最後まで読み込むまでチャンクを読み込みます。
+        :param ns: 日時（エポックナノ秒）
+        """
+        while not self.__eof and (not len(self.__times) or self.__times[-1] < ns):
+            self.__fill()
+
+    def __fill(self) -> None:
+        """次のチャンクをバッファに追加します。"""
+        try:
+            t = next(self.__chunks)
+        except StopIteration:
+            self.__eof = True
+            return
+        self.__buffer = t if self.__buffer is None else pd.concat([self.__buffer, t])
+        self.__times = index_to_ns(self.__buffer.index)
+        self.length += len(t)
+        for listener in self.__listeners:
+            listener(t)
+
+
+class BoardStream(object):
+    """板情報ファイルをチャンク単位で読み込みながら、時刻で検索するためのストリーム
+
+    BoardIndexと同じ属性と検索メソッドを持ちます。検索する時刻は単調に増加する必要があり、
+    検索した時刻以前のスナップショットは、直前の1件を除いて次のチャンクの読み込み時に破棄します。
+    検索結果の位置は次に検索するまでの間のみ有効なため、配列は検索を行ってから参照してください。
+    板情報ファイルは時刻の昇順に並んでいる必要があります。
+    """
+
+    def __init__(self, path: str, chunk_size: int = 10 ** 5):
+        """
+        :param path: 板情報ファイルのパス
+        :param chunk_size: 一度に読み込む行数
+        """
+        self.__chunks = pd.read_csv(path, dtype=DTYPES_BOARDS, sep='\t' if path.endswith('.tsv') else ',',
+                                    chunksize=chunk_size)
+        """未読のチャンク"""
+
+        self.__buffer = pd.DataFrame(columns=list(DTYPES_BOARDS.keys()))  # type: pd.DataFrame
+        """読み込み済みの板情報"""
+
+        self.__index = BoardIndex(self.__buffer)  # type: BoardIndex
+        """読み込み済みの板情報の索引"""
+
+        self.__eof = False  # type: bool
+        """ファイルを最後まで読み込んだ場合True"""
+
+    def __getattr__(self, name: str):
+        # times, mid_price等の配列は読み込み済みの板情報の索引から返す
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self.__index, name)
+
+    def __len__(self) -> int:
+        return len(self.__index)
+
+    def at(self, t: datetime, sec: int = 1) -> int:
+        """BoardIndex.atと同じです。"""
+        self.__fill(t, to_ns(t) + sec * 10 ** 9)
+        return self.__index.at(t, sec)
+
+    def asof(self, t: datetime) -> int:
+        """BoardIndex.asofと同じです。"""
+        self.__fill(t, to_ns(t) + 1)
+        return self.__index.asof(t)
+
+    def __fill(self, t: datetime, ns: int) -> None:
+        """指定日時までの板情報が揃うまでチャンクを読み込みます。
+        :param t: 検索する日時（これより前のスナップショットは直前の1件を除いて破棄します）
+        :param ns: 読み込みが必要な日時（エポックナノ秒）
+        """
+        times = self.__index.times
+        if self.__eof or (len(times) and times[-1] >= ns):
+            return
+        chunks = [self.__buffer.iloc[max(self.__index.asof(t), 0):]] if len(times) else []
+        while not self.__eof and (not len(times) or times[-1] < ns):
+            try:
+                chunk = next(self.__chunks)
+            except StopIteration:
+                self.__eof = True
+                break
+            chunks.append(chunk)
+            times = index_to_ns(parse_times(chunk['time'].values))
+        if not chunks:
+            return
+        self.__buffer = pd.concat(chunks, ignore_index=True)
+        self.__index = BoardIndex(self.__buffer)
@@ -0,0 +1,693 @@
+# coding: utf-8
+
+import heapq
+import logging
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from importlib import import_module
+from logging import getLogger
+from typing import List, Dict, Any
+
+import numpy as np
+import pandas as pd
+
+from baktlib import boardfile, config, datautil
+from baktlib.bars import BarCache
+from baktlib.book import DepthIndex, OrderBook, QueueTracker
+from baktlib.calc import d, sub, from_units
+from baktlib.constants import *
+from baktlib.models import Order, OrderStatus, Side, OrderType
+from baktlib.service import OrderManager, PositionManager, HistoryManager, TradeManager
+
+logger = getLogger(__name__)
+
+
+def strg_cls(conf: config.Config):
+    tokens = conf.strategy.split('.')
+    pkg_name = tokens[0]
+    cls_name = tokens[1]
+    return getattr(import_module('baktlib.strategies.' + pkg_name), cls_name)
+
+
+def find_crossable(new_exec: pd.DataFrame, orders: List[Order], resolution_ns: int = 10 ** 9) -> np.ndarray:
+    """約定履歴と注文の組み合わせごとに、約定可能かどうかを一括で判定します。
+    注文が約定可能になるまでの遅延時間は、約定日時をresolution_ns単位に切り捨てた日時を基準に判定します。
+    :param new_exec: 時間枠内の約定履歴
+    :param orders: 判定対象の注文
+    :param resolution_ns: 遅延時間を判定する精度（ナノ秒。省略時は秒単位）
+    :return: 約定履歴の件数×注文の件数のbool配列
+    """
+    # 約定履歴
+    ex_ns = datautil.index_to_ns(new_exec.index)  # type: np.ndarray
+    ex_sec = (ex_ns // resolution_ns * resolution_ns)[:, np.newaxis]  # type: np.ndarray
+    ex_buy = (new_exec['side'].values == Side.BUY.value)[:, np.newaxis]  # type: np.ndarray
+    ex_sell = (new_exec['side'].values == Side.SELL.value)[:, np.newaxis]  # type: np.ndarray
+    ex_price = new_exec['price'].values[:, np.newaxis]  # type: np.ndarray
+
+    # 注文
+    o_buy = np.array([o.side == Side.BUY for o in orders], dtype=bool)  # type: np.ndarray
+    o_sell = np.array([o.side == Side.SELL for o in orders], dtype=bool)  # type: np.ndarray
+    o_market = np.array([o.type != OrderType.LIMIT.value for o in orders], dtype=bool)  # type: np.ndarray
+    o_price = np.array([o.price for o in orders], dtype='f8')  # type: np.ndarray
+    o_created = np.array([datautil.to_ns(o.created_at) for o in orders], dtype='i8')  # type: np.ndarray
+    o_delay = np.array([o.delay_sec for o in orders], dtype='f8')  # type: np.ndarray
+
+    buy_ok = o_buy & ex_sell & (o_market | (ex_price <= o_price))
+    sell_ok = o_sell & ex_buy & (o_market | (ex_price >= o_price))
+    delayed = (ex_sec - o_created) / 10 ** 9 >= o_delay
+    return (buy_ok | sell_ok) & delayed
+
+
+class Tape(object):
+    """バックテストの入力データ（約定履歴、板情報、OHLC）
+
+    一度読み込んだデータは、パラメーターを変えた複数回のバックテストで共有できます（ストリーム読み込みの場合を除く）。
+    """
+
+    def __init__(self, executions, boards, bar_cache: BarCache, source: str, data_from: pd.Timestamp,
+                 data_length: int, times: np.ndarray = None, depth: DepthIndex = None):
+        self.executions = executions
+        """約定履歴（exec_dateをインデックスとするDataFrame、datautil.ExecutionStoreまたはdatautil.ExecutionStream）"""
+
+        self.boards = boards
+        """板情報（datautil.BoardIndexまたはdatautil.BoardStream）"""
+
+        self.bar_cache = bar_cache  # type: BarCache
+        """OHLCのキャッシュ（エンジンと全てのストラテジーで共有する）"""
+
+        self.source = source  # type: str
+        """OHLCのキャッシュに登録した約定履歴の名前"""
+
+        self.data_from = data_from  # type: pd.Timestamp
+        """最初の約定日時"""
+
+        self.__data_length = data_length  # type: int
+        """約定履歴の件数（ストリーム読み込みで、約定履歴を読み通していない場合はNone）"""
+
+        self.times = times  # type: np.ndarray
+        """約定日時（エポックナノ秒。ストリーム読み込みの場合はNone）"""
+
+        self.depth = depth  # type: DepthIndex
+        """L2の板情報（指定した場合は、指値注文の待ち行列の位置を考慮し、成行注文は板を食って約定させます）"""
+
+    @property
+    def data_length(self) -> int:
+        """約定履歴の件数（ストリーム読み込みで、約定履歴を読み通していない場合は読み込み済みの件数）"""
+        return self.executions.length if self.__data_length is None else self.__data_length
+
+    @property
+    def streaming(self) -> bool:
+        """約定履歴と板情報をチャンク単位で読み込みながらバックテストを行う場合True"""
+        return self.times is None
+
+    @property
+    def last_exec_date(self) -> pd.Timestamp:
+        """最後の約定日時"""
+        return pd.Timestamp(self.times[-1], tz='UTC')
+
+    def last_price(self, t: datetime) -> float:
+        """指定日時より前の最後の約定価格を返します。
+        :param t: 日時
+        :return: 約定価格（指定日時より前の約定が存在しない場合はNone）
+        """
+        i = int(np.searchsorted(self.times, datautil.to_ns(t), side='left')) - 1
+        if i < 0:
+            return None
+        prices = self.executions['price'].values if isinstance(self.executions, pd.DataFrame) \
+            else self.executions.price
+        return float(prices[i])
+
+    @classmethod
+    def from_frames(cls, executions: pd.DataFrame, boards: pd.DataFrame, source: str = '',
+                    depth: pd.DataFrame = None) -> 'Tape':
+        """メモリ上の約定履歴と板情報から入力データを作成します。
+        :param executions: 約定履歴（exec_dateの列またはインデックスを持つDataFrame）
+        :param boards: 板情報（DTYPES_BOARDSのレイアウト）
+        :param source: 約定履歴の名前
+        :param depth: L2の板情報（DTYPES_DEPTHのレイアウト）
+        :return: バックテストの入力データ
+        """
+        if 'exec_date' in executions.columns:
+            executions = executions.set_index('exec_date')
+        bar_cache = BarCache()
+        bar_cache.add_source(source, executions)
+        times = datautil.index_to_ns(executions.index)
+        return cls(executions, datautil.BoardIndex(boards), bar_cache, source, pd.Timestamp(times[0], tz='UTC'),
+                   len(executions), times, depth=DepthIndex(depth) if depth is not None else None)
+
+
+def load_tape(file: str, boards: str, rule: str, use_cache: bool = True, mmap: bool = False,
+              stream: bool = False, depth: str = None, prebuild: bool = False) -> Tape:
+    """約定履歴と板情報のファイルを読み込みます。
+    :param file: 約定履歴ファイルのパス
+    :param boards: 板情報ファイルのパス（拡張子がboardfile.SUFFIXの場合はバイナリファイルとして読み込みます）
+    :param rule: ストリーム読み込みで、OHLCを事前に作成する場合の時間足
+    :param use_cache: データファイルのキャッシュを使用する場合True
+    :param mmap: 約定履歴をメモリマップしたストアから読み込む場合True
+    :param stream: 約定履歴と板情報をチャンク単位で読み込みながらバックテストを行う場合True
+    :param depth: L2の板情報ファイルのパス（指定した場合は、指値注文の待ち行列の位置を考慮し、成行注文は板を食って約定させます）
+    :param prebuild: ストリーム読み込みで、バックテストの前に約定履歴を一度読み通してOHLCを作成する場合True
+    :return: バックテストの入力データ
+    """
+    bar_cache = BarCache()  # type: BarCache
+    depth_index = DepthIndex(datautil.load_depth(depth, use_cache=use_cache)) if depth else None  # type: DepthIndex
+
+    # インジケーター等の計算結果は約定履歴のキャッシュと同じディレクトリに保存する
+    cache_dir = file + datautil.CACHE_SUFFIX if use_cache else None  # type: str
+
+    if stream:
+        # 約定履歴と板情報はチャンク単位で読み込みながら時間枠ごとに切り出す
+        # OHLCはチャンクを読み込むたびに時間足ごとに作成する（事前に作成する場合は、先に約定履歴を一度読み通す）
+        data_length = None  # type: int
+        if prebuild:
+            ohlc, data_length = datautil.stream_ohlc(file, rule=rule)  # type: pd.DataFrame, int
+            bar_cache.put(file, rule, ohlc, cache_dir=cache_dir)
+        exec = datautil.ExecutionStream(file)  # type: datautil.ExecutionStream
+        bar_cache.add_stream(file, exec, cache_dir=cache_dir)
+        board_index = datautil.BoardIndex(boardfile.load_boards(boards)) if boardfile.is_board_file(boards) \
+            else datautil.BoardStream(boards)
+        tape = Tape(exec, board_index, bar_cache, file, exec.first_time(), data_length, depth=depth_index)
+        logger.info(f"Executions: from={tape.data_from}")
+        return tape
+
+    exec = None  # type: datautil.ExecutionStore
+    if mmap:
+        # 約定履歴はメモリマップしたストアから時間枠ごとに切り出す
+        # ストアを作成できない場合（読み取り専用のディレクトリ、ディスクの空き不足等）は、約定履歴をメモリに読み込む
+        try:
+            exec = datautil.ExecutionStore.open(file)
+            times = exec.time  # type: np.ndarray
+        except OSError as e:
+            logger.warning(f"Failed to create execution store, load executions into memory. [{file}] {e}")
+    if exec is None:
+        exec = datautil.load_executions(file, use_cache=use_cache).set_index('exec_date')
+        times = datautil.index_to_ns(exec.index)
+    bar_cache.add_source(file, exec, cache_dir=cache_dir)
+    board_index = datautil.BoardIndex(boardfile.load_boards(boards) if boardfile.is_board_file(boards)
+                                      else datautil.load_boards(boards, use_cache=use_cache))
+    tape = Tape(exec, board_index, bar_cache, file, pd.Timestamp(times[0], tz='UTC'), len(exec), times,
+                depth=depth_index)
+    logger.info(f"Executions: len={tape.data_length:,}, from={tape.data_from}, to={tape.last_exec_date}")
+    return tape
+
+
+class BacktestEngine(object):
+    """1回のバックテストの状態（注文、ポジション、取引、履歴）を保持して、バックテストを実行するエンジン
+
+    状態はインスタンスごとに独立しているため、同じプロセス内で複数のバックテストを実行できます。
+    """
+
+    def __init__(self, conf: config.Config, tape: Tape, strategy_cls=None, start: datetime = None,
+                 end: datetime = None):
+        """
+        :param conf: 設定
+        :param tape: バックテストの入力データ
+        :param strategy_cls: ストラテジークラス（省略時は設定のstrategyからロードします）
+        :param start: バックテストを開始する日時（省略時は最初の約定日時。ストリーム読み込みの場合は指定できません）
+        :param end: バックテストを終了する日時（指定した場合は、時間枠の数は設定のnum_of_tradeではなくこの日時で決まります）
+        """
+        self.conf = conf  # type: config.Config
+        """設定"""
+
+        self.tape = tape  # type: Tape
+        """バックテストの入力データ"""
+
+        self.strategy_cls = strategy_cls or strg_cls(conf)
+        """ストラテジークラス"""
+
+        if start is not None and tape.streaming:
+            raise ValueError('Start time cannot be specified for a streaming tape.')
+        if conf.clock not in (CLOCK_TIMEFRAME, CLOCK_EVENT):
+            raise ValueError(f"Unknown clock. [{conf.clock}]")
+        if conf.clock == CLOCK_EVENT and tape.streaming:
+            raise ValueError('Event-driven clock cannot be used with a streaming tape.')
+
+        self.start = start  # type: datetime
+        """バックテストを開始する日時"""
+
+        self.end = end  # type: datetime
+        """バックテストを終了する日時（この日時より後に終わる時間枠は実行しません）"""
+
+        self.order_mgr = OrderManager()  # type: OrderManager
+        """注文"""
+
+        self.pos_mgr = PositionManager()  # type: PositionManager
+        """ポジション"""
+
+        self.trd_mgr = TradeManager()  # type: TradeManager
+        """取引"""
+
+        self.his_mgr = HistoryManager(conf.num_of_trade)  # type: HistoryManager
+        """時間枠ごとの履歴"""
+
+        self.orders_each_trade = []  # type: List[List[Order]]
+        """時間枠ごとの新規注文"""
+
+        self.book = OrderBook(tape.depth) if tape.depth is not None else None  # type: OrderBook
+        """L2の板情報を再生した板（L2の板情報がない場合はNone）"""
+
+        self.queue = QueueTracker(self.book) if self.book is not None else None  # type: QueueTracker
+        """指値注文の待ち行列の位置"""
+
+        # 約定、キャンセルまたは期限切れで有効でなくなった注文は、待ち行列の位置の追跡を終了する
+        if self.queue is not None:
+            self.order_mgr.listener = self.queue.discard
+
+    def match(self, new_exec: pd.DataFrame, orders: List[Order], resolution_ns: int = 10 ** 9,
+              until_ns: int = None) -> None:
+        """時間枠内の約定履歴と有効な注文を突き合わせて、注文を約定させます。
+        約定可能な組み合わせをまとめて判定し、約定が発生する約定履歴についてのみ約定処理を行います。
+        L2の板情報がある場合、成行注文は約定履歴ではなく、板に乗る時刻の板を食って約定させます。
+        :param new_exec: 時間枠内の約定履歴
+        :param orders: 有効な注文
+        :param resolution_ns: 注文の遅延時間を判定する精度（ナノ秒）
+        :param until_ns: 時間枠の終端（エポックナノ秒。この日時より前に板に乗る成行注文を約定させます。省略時は最後の約定日時）
+        """
+        if self.book is not None:
+            market = sorted((o for o in orders if o.type == ORDER_TYPE_MARKET),
+                            key=self.__activation_ns)  # type: List[Order]
+            orders = [o for o in orders if o.type != ORDER_TYPE_MARKET]
+            if until_ns is None:
+                until_ns = datautil.to_ns(new_exec.index[-1]) + 1 if not new_exec.empty else 0
+
+            # 約定履歴がなければ、成行注文のみ約定させる
+            if new_exec.empty:
+                self.__take(market, until_ns)
+                return
+        crossable = find_crossable(new_exec, orders, resolution_ns)  # type: np.ndarray
+        ids = new_exec['id'].values
+        sides = new_exec['side'].values
+        prices = new_exec['price'].values
+        sizes = new_exec['size'].values
+        if self.book is None:
+            for i in np.flatnonzero(crossable.any(axis=1)):
+                self.contract(new_exec.index[i], ids[i], sides[i], prices[i].item(), sizes[i].item(),
+                              [orders[j] for j in np.flatnonzero(crossable[i])])
+            return
+
+        # L2の板情報がある場合は、約定の直前まで板を再生し、自分より前に並んでいる数量を消化した分だけ約定させる
+        # 板を時刻順に進めるため、約定の時刻までに板に乗る成行注文を先に約定させる
+        ex_ns = datautil.index_to_ns(new_exec.index)  # type: np.ndarray
+        for i in np.flatnonzero(crossable.any(axis=1)):
+            market = self.__take(market, int(ex_ns[i]) + 1)
+            self.queue.advance(int(ex_ns[i]))
+            remaining = sizes[i].item()  # type: float
+            for j in np.flatnonzero(crossable[i]):
+                o = orders[j]
+                if not o.is_active() or not remaining:
+                    continue
+                size = min(self.queue.fill_size(o, prices[i].item(), remaining), remaining)  # type: float
+                if size > 0:
+                    open_units = o.open_size_units  # type: int
+                    self.contract(new_exec.index[i], ids[i], sides[i], prices[i].item(), size, [o])
+                    remaining = sub(remaining, from_units(open_units - o.open_size_units))
+        self.__take(market, until_ns)
+
+    @staticmethod
+    def __activation_ns(o: Order) -> int:
+        """注文が板に乗る日時（エポックナノ秒）"""
+        return datautil.to_ns(o.created_at) + int(o.delay_sec * 10 ** 9)
+
+    def __take(self, market: List[Order], until_ns: int) -> List[Order]:
+        """指定日時より前に板に乗る成行注文を、板に乗る時刻の板を食って約定させます。
+        板の数量が足りない場合、残りは次の時間枠で改めて板を食って約定させます。
+        :param market: 板に乗る時刻の順の成行注文
+        :param until_ns: 日時（エポックナノ秒）
+        :return: まだ板に乗っていない成行注文
+        """
+        book = self.book
+        for k, o in enumerate(market):
+            ns = self.__activation_ns(o)  # type: int
+            if ns >= until_ns:
+                return market[k:]
+            self.queue.advance(ns)
+            ex_date = pd.Timestamp(book.time, tz='UTC')  # type: pd.Timestamp
+            for price, size in zip(*(a.tolist() for a in book.walk(o.side, o.open_size))):
+
+                # 反対sideのポジションの決済と新規のポジションは別々に約定するため、気配の数量を消化するまで繰り返す
+                while size > 0 and o.is_active():
+                    open_units = o.open_size_units  # type: int
+                    self.contract(ex_date, 0, o.side.value, price, size, [o])
+                    if open_units == o.open_size_units:
+                        break
+                    size = sub(size, from_units(open_units - o.open_size_units))
+        return []
+
+    def contract(self, ex_date: pd.Timestamp, ex_id: int, ex_side: str, ex_price: float, ex_size: float,
+                 orders: List[Order]) -> None:
+        """1件の約定履歴に対して注文を約定させます。
+        :param ex_date: 約定日時
+        :param ex_id: 約定ID
+        :param ex_side: 約定履歴のside
+        :param ex_price: 約定価格
+        :param ex_size: 約定サイズ
+        :param orders: この約定履歴で約定可能な注文
+        """
+        # 既に全約定した注文を除外
+        active_orders = [o for o in orders if o.is_active()]  # type: List[Order]
+        if not active_orders:
+            return
+
+        e_size = ex_size
+        logger.debug(f"Start to execute: {ex_id} {ex_date} {ex_side} size={e_size}, price={ex_price}")
+        for o in active_orders:
+
+            # TODO L2の板情報（--depth）がない場合、成行は注文サイズを満たす約定履歴を消化する前に、次の成行注文が発生してしまう可能性がある。
+            # TODO L2の板情報がない場合、本来なら発動すれば板を食って約定するものだが、約定履歴で代用するため状況が異なる。
+            # TODO L2の板情報がない場合、成行は約定履歴は価格の参考のみにした方が良いかも（--depthを指定すれば板を食って約定する）。
+            # 約定可能サイズ
+            can_exec_size_by_order = min(o.open_size, e_size)  # type: float
+
+            # 保有中のポジションのうち、決済対象となる反対sideのポジションの保有量
+            reverse_size = self.pos_mgr.sum_size(side=Side.SELL if o.side == Side.BUY else Side.BUY)  # type: float
+
+            # 決済対象のポジションが存在しない場合
+            if not reverse_size:
+                self.pos_mgr.add_position(ex_date, o, can_exec_size_by_order, 0.0,
+                                          price=ex_price if o.type == ORDER_TYPE_MARKET else o.price)
+                o.contract(ex_date, ex_price, can_exec_size_by_order)
+                e_size = sub(e_size, can_exec_size_by_order)
+
+            # 決済対象のポジションが存在する場合は、古いポジションから順に決済する
+            else:
+                closed_size, closed = self.pos_mgr.contract(o, ex_date, ex_price, can_exec_size_by_order)
+                e_size = sub(e_size, closed_size)
+                for p in closed:
+                    self.trd_mgr.add_trade(p)
+
+            # e_sizeを消化しきっており、これ以上約定させられないため、処理を終了する
+            if e_size == 0:
+                return
+
+    def run(self) -> Dict[str, Any]:
+        """バックテストを実行します。
+        :return: バックテスト結果
+        """
+        if self.conf.clock == CLOCK_EVENT:
+            return self.__run_events()
+
+        st = time.time()
+        conf = self.conf
+        tape = self.tape
+        order_mgr = self.order_mgr
+        pos_mgr = self.pos_mgr
+        exec = tape.executions
+        boards = tape.boards
+        data_from = self.start or tape.data_from  # type: datetime
+        if not tape.streaming:
+            last_exec_date = tape.last_exec_date  # type: pd.Timestamp
+
+        # トレードの時間枠の先頭
+        _from = datetime(year=data_from.year, month=data_from.month, day=data_from.day, hour=data_from.hour,
+                         minute=data_from.minute, second=data_from.second, tzinfo=timezone.utc)  # type: datetime
+        if _from.second % conf.timeframe_sec > 0:
+            _from = _from - timedelta(seconds=_from.second % conf.timeframe_sec)
+
+        # トレードの時間枠の終端
+        to = _from + timedelta(seconds=conf.timeframe_sec)
+
+        # 時間枠の数
+        num_of_trade = conf.num_of_trade  # type: int
+        if self.end is not None:
+            num_of_trade = (datautil.to_ns(self.end) - datautil.to_ns(_from)) // (conf.timeframe_sec * 10 ** 9)
+
+        # 時間枠ごとの約定履歴の切り出し位置を事前に計算する
+        # 途中から開始する場合は、開始日時より前の最後の約定価格を最終約定価格の初期値とする
+        if not tape.streaming:
+            window = datautil.TimeWindow(tape.times, _from, conf.timeframe_sec, max(num_of_trade, 0))
+            ltp = tape.last_price(_from)
+        else:
+            ltp = None
+
+        # ストラテジークラスをロードする（OHLCはストラテジーがOHLCのキャッシュから取得する）
+        stg = self.strategy_cls(conf.user, exec, bar_cache=tape.bar_cache)
+        stg.boards = boards
+        stg.book = self.book
+        stg.clock = conf.clock
+
+        trade_num = 1  # type: int
+        while trade_num <= num_of_trade:
+            if trade_num % 100 == 0:
+                logger.info(f"Start to trading. No: {trade_num}, from {_from}, to: {to}")
+            if logger.isEnabledFor(logging.DEBUG):
+                a = len(order_mgr.get(status=OrderStatus.ACTIVE))
+                c = len(order_mgr.get(status=OrderStatus.CANCELED))
+                p = len(order_mgr.get(status=OrderStatus.PARTIAL))
+                m = len(order_mgr.get(status=OrderStatus.COMPLETED))
+                logger.debug(f"[Trading] No={trade_num},from='{_from}',to='{to}' "
+                             f"[Order] ACTIVE={a},CANCELED={c},PARTIAL={p},COMPLETED={m}, "
+                             f"[Position] len={pos_mgr.len()},buy_size={pos_mgr.sum_size(side=Side.BUY)},"
+                             f"sell_size={pos_mgr.sum_size(side=Side.SELL)} ")
+
+            # 約定のない時間枠が続き、その間ストラテジーを起動しない場合は、まとめて記録して進める
+            if not tape.streaming:
+                skip = min(window.empty_run(), self.__idle_timeframes(stg, to, ltp),
+                           num_of_trade - trade_num + 1)  # type: int
+                if skip > 0:
+                    self.__fast_forward(window, to, skip, ltp)
+                    _from += timedelta(seconds=conf.timeframe_sec * skip)
+                    to = _from + timedelta(seconds=conf.timeframe_sec)
+                    trade_num += skip
+                    continue
+
+            # 現在時刻までの約定履歴を取得する
+            if tape.streaming:
+                new_exec = exec.take(to)  # type: pd.DataFrame
+            elif isinstance(exec, pd.DataFrame):
+                new_exec = exec.iloc[window.next()]
+            else:
+                new_exec = exec.frame(window.next())
+            stg.on_executions(new_exec)
+
+            # 新しい約定履歴と有効な注文が存在するなら約定判定を行う
+            # L2の板情報がある場合は、約定履歴がなくても成行注文が板を食って約定する
+            if not new_exec.empty or self.book is not None:
+                active_orders = order_mgr.get_active_orders(to)  # type: List[Order]
+                if active_orders:
+                    self.match(new_exec, active_orders, until_ns=datautil.to_ns(to))
+
+            # 最終約定価格を最新の価格に更新
+            if not new_exec.empty:
+                ltp = new_exec['price'].values[-1]
+
+            # 取引時間帯の板を抽出し、ストラテジーを実行して状況を記録する
+            self.__step(stg, trade_num, to, boards.at(to), new_exec, ltp)
+
+            # 時間を進める
+            _from = to
+            to = _from + timedelta(seconds=conf.timeframe_sec)
+            trade_num += 1
+            logger.debug(f"End trading.\n")
+
+            # 約定履歴データがこれ以上存在しない場合は、ループを終了する
+            if exec.ends_before(to) if tape.streaming else to > last_exec_date:
+                break
+
+        return self.__result(st, data_from, to, trade_num)
+
+    def __run_events(self) -> Dict[str, Any]:
+        """イベント駆動でバックテストを実行します。
+        約定の発生時刻、注文が板に乗る時刻、注文の有効期限、ストラテジーのタイマーを優先度付きキューで管理し、
+        時刻の早い順にイベントを処理します（同時刻のイベントはまとめて1回で処理します）。
+        処理量は時間枠の数ではなくイベントの数に比例し、約定判定や注文の遅延は秒未満の精度で扱います。
+        :return: バックテスト結果
+        """
+        st = time.time()
+        conf = self.conf
+        tape = self.tape
+        order_mgr = self.order_mgr
+        exec = tape.executions
+        times = tape.times  # type: np.ndarray
+        data_from = self.start or tape.data_from  # type: datetime
+
+        # 終了日時を省略した場合は、時間枠ごとに実行する場合と同じ期間を対象とする
+        start_ns = datautil.to_ns(data_from)  # type: int
+        end_ns = datautil.to_ns(self.end) if self.end is not None \
+            else start_ns + conf.num_of_trade * conf.timeframe_sec * 10 ** 9  # type: int
+        head = int(np.searchsorted(times, start_ns, side='left'))  # type: int
+        tail = int(np.searchsorted(times, end_ns, side='left'))  # type: int
+        ltp = tape.last_price(data_from)
+
+        # ストラテジーをロードする（OHLCはストラテジーがOHLCのキャッシュから取得する）
+        stg = self.strategy_cls(conf.user, exec, bar_cache=tape.bar_cache)
+        stg.boards = tape.boards
+        stg.book = self.book
+        stg.clock = conf.clock
+
+        # 約定以外のイベントの発生時刻（エポックナノ秒）
+        # 約定の発生時刻はソート済みの約定日時をカーソルで順に読み出し、キューの先頭と比較する
+        clock = []  # type: List[int]
+        no_exec = exec.iloc[0:0] if isinstance(exec, pd.DataFrame) else exec.frame(slice(0, 0))  # type: pd.DataFrame
+        now = data_from  # type: datetime
+        event_num = 0  # type: int
+        while True:
+            ns = min(int(times[head]) if head < tail else end_ns, clock[0] if clock else end_ns)  # type: int
+            if ns >= end_ns:
+                break
+            while clock and clock[0] <= ns:
+                heapq.heappop(clock)
+            now = pd.Timestamp(ns, tz='UTC')
+            event_num += 1
+            if event_num % 10000 == 0:
+                logger.info(f"Start to trading. No: {event_num}, at {now}")
+
+            # 現在時刻に発生した約定履歴を取得する
+            if head < tail and times[head] == ns:
+                s = slice(head, int(np.searchsorted(times, ns, side='right')))
+                head = s.stop
+                new_exec = exec.iloc[s] if isinstance(exec, pd.DataFrame) else exec.frame(s)  # type: pd.DataFrame
+            else:
+                new_exec = no_exec
+            if not new_exec.empty:
+                stg.on_executions(new_exec)
+
+            # 約定可能かどうかは、注文が板に乗る時刻と約定時刻をナノ秒単位で比較して判定する
+            if not new_exec.empty or self.book is not None:
+                active_orders = order_mgr.get_active_orders(now)  # type: List[Order]
+                if active_orders:
+                    self.match(new_exec, active_orders, resolution_ns=1, until_ns=ns + 1)
+            if not new_exec.empty:
+                ltp = new_exec['price'].values[-1]
+
+            # 現在時刻の板を参照して、ストラテジーを実行する
+            new_ords = self.__step(stg, event_num, now, tape.boards.asof(now), new_exec, ltp)  # type: List[Order]
+
+            # 新規注文が板に乗る時刻と有効期限、ストラテジーのタイマーをキューに登録する
+            # 有効期限は経過時間が期限を超えた時点で判定されるため、期限の直後の時刻を登録する
+            # 遅延のない注文は現在時刻に板に乗るため、現在時刻を再びイベントにしない
+            for o in new_ords:
+                created_ns = datautil.to_ns(o.created_at)  # type: int
+                activation_ns = self.__activation_ns(o)  # type: int
+                if activation_ns > ns:
+                    heapq.heappush(clock, activation_ns)
+                if o.expire_sec > 0:
+                    heapq.heappush(clock, created_ns + int(o.expire_sec * 10 ** 9) + 1000)
+            for t in stg.pop_timers():
+                t_ns = datautil.to_ns(t)  # type: int
+                if t_ns > ns:
+                    heapq.heappush(clock, t_ns)
+
+        return self.__result(st, data_from, now, event_num)
+
+    def __idle_timeframes(self, stg, to: datetime, ltp: float) -> int:
+        """約定のない時間枠が続く場合に、ストラテジーを起動せずに進めてよい時間枠の数を返します。
+        :param stg: ストラテジー
+        :param to: 次の時間枠の終端
+        :param ltp: 最終約定価格
+        :return: 時間枠の数（制限がない場合はsys.maxsize）
+        """
+        # 板を食って約定する成行注文が残っている間は、時間枠ごとに約定判定を行う
+        if self.book is not None and self.order_mgr.get(_type=OrderType.MARKET, status=OrderStatus.ACTIVE):
+            return 0
+        if stg.skip_empty:
+            return sys.maxsize
+        if not stg.is_sleeping(to, ltp):
+            return 0
+
+        # 約定がなければ価格は変わらないため、休止を再開する日時の直前の時間枠まで進めてよい
+        until = stg.sleeping_until  # type: datetime
+        if until is None:
+            return sys.maxsize
+        tf_ns = self.conf.timeframe_sec * 10 ** 9  # type: int
+        return max(-(-(datautil.to_ns(until) - datautil.to_ns(to)) // tf_ns), 0)
+
+    def __fast_forward(self, window: datautil.TimeWindow, to: datetime, n: int, ltp: float) -> None:
+        """約定のない連続した時間枠を、ストラテジーを起動せずにまとめて進めます。
+        約定がないためポジションと価格は変わらず、有効期限を過ぎた注文のキャンセルは最後の時間枠でまとめて行います。
+        :param window: 約定履歴の切り出し位置
+        :param to: 最初の時間枠の終端
+        :param n: 進める時間枠の数
+        :param ltp: 最終約定価格
+        """
+        pos_mgr = self.pos_mgr
+        times = datautil.to_ns(to) + np.arange(n, dtype='i8') * (self.conf.timeframe_sec * 10 ** 9)  # type: np.ndarray
+        window.skip(n)
+        self.order_mgr.cancel(to + timedelta(seconds=self.conf.timeframe_sec * (n - 1)))
+        self.orders_each_trade.extend([] for _ in range(n))
+        self.his_mgr.fill_history(times.astype('M8[ns]'),
+                                  buy_pos_size=pos_mgr.sum_size(side=Side.BUY),
+                                  sell_pos_size=pos_mgr.sum_size(side=Side.SELL),
+                                  ltp=ltp,
+                                  realized_pnl=self.trd_mgr.sum_pnl(),
+                                  unrealized_pnl=pos_mgr.sum_unrealized_pnl(ltp))
+
+    def __step(self, stg, num: int, now: datetime, b: int, new_exec: pd.DataFrame, ltp: float) -> List[Order]:
+        """有効期限を過ぎた注文をキャンセルしてからストラテジーを実行し、新規注文を受け付けて状況を記録します。
+        :param stg: ストラテジー
+        :param num: 時間枠（イベント駆動の場合はイベント）の番号
+        :param now: 現在日時
+        :param b: 参照する板情報の位置（存在しない場合は-1）
+        :param new_exec: 前回から現在日時までの約定履歴
+        :param ltp: 最終約定価格
+        :return: 新規注文
+        """
+        order_mgr = self.order_mgr
+        pos_mgr = self.pos_mgr
+        boards = self.tape.boards
+
+        # 有効期限を過ぎた注文をキャンセルする
+        order_mgr.cancel(now)
+
+        # ストラテジーが参照する板を現在日時まで進める
+        if self.queue is not None:
+            self.queue.advance(datautil.to_ns(now))
+
+        # ストラテジーを実行してシグナル探索&発注（休止中、または約定がなく起動不要な場合は実行しない）
+        if stg.is_sleeping(now, ltp) or (stg.skip_empty and new_exec.empty):
+            new_ords = []  # type: List[Order]
+        else:
+            new_ords = stg.think(num, now, order_mgr.get(status=OrderStatus.ACTIVE),
+                                 positions=pos_mgr.get(),
+                                 long_pos_size=pos_mgr.sum_size(side=Side.BUY),
+                                 short_pos_size=pos_mgr.sum_size(side=Side.SELL),
+                                 ltp=ltp,
+                                 mid_price=boards.mid_price[b].item() if b >= 0 else None,
+                                 best_ask_price=boards.best_ask_price[b].item() if b >= 0 else None,
+                                 best_bid_price=boards.best_bid_price[b].item() if b >= 0 else None)
+            order_mgr.add_orders(new_ords)
+
+            # 新規の指値注文は、板に乗る日時から待ち行列の位置を追跡する
+            if self.queue is not None:
+                for o in new_ords:
+                    self.queue.add(o, self.__activation_ns(o))
+
+        # 時間枠ごとに状況を記録する
+        self.orders_each_trade.append(new_ords)
+        his_mgr = self.his_mgr
+        sides = new_exec['side'].values
+        sizes = new_exec['size'].values  # type: np.ndarray
+        delays = new_exec['delay'].values  # type: np.ndarray
+        his_mgr.add_history(time=now,
+                            buy_pos_size=pos_mgr.sum_size(side=Side.BUY),
+                            sell_pos_size=pos_mgr.sum_size(side=Side.SELL),
+                            buy_volume=round(float(sizes[sides == 'BUY'].sum()), 8),
+                            sell_volume=round(float(sizes[sides == 'SELL'].sum()) * -1, 8),
+                            ltp=ltp,
+                            realized_pnl=self.trd_mgr.sum_pnl(), unrealized_pnl=pos_mgr.sum_unrealized_pnl(ltp),
+                            exec_recv_delay=np.nanmean(delays) if (~np.isnan(delays)).any() else np.nan,
+                            order_delay=float(sum([d(o.delay_sec) for o in new_ords]) / len(new_ords))
+                            if new_ords else 0.0,
+                            market_volume=sizes.sum())
+        return new_ords
+
+    def __result(self, st: float, data_from: datetime, to: datetime, num: int) -> Dict[str, Any]:
+        """バックテスト結果を作成します。
+        :param st: バックテストを開始した時刻（time.time()）
+        :param data_from: 最初の時間枠の基準とした日時
+        :param to: 最後に処理した日時
+        :param num: 処理した時間枠（イベント駆動の場合はイベント）の数
+        :return: バックテスト結果
+        """
+        res = {'datetime': datetime.now().strftime(DATETIME_F),
+               'duration': time.time() - st,
+               'exchange': self.conf.exchange,
+               'data_from': data_from.strftime(DATETIME_F),
+               'data_to': to.strftime(DATETIME_F),
+               'data_length': self.tape.data_length,
+               'timeframe_sec': self.conf.timeframe_sec,
+               'num_of_timeframes': num}
+        res.update(self.his_mgr.get())
+        res.update(self.order_mgr.stats())
+        res.update(self.trd_mgr.stats())
+        return res
@@ -0,0 +1,180 @@
+# coding: utf-8
+
+import hashlib
+import os
+from datetime import datetime
+from logging import getLogger
+from typing import Callable, Dict, Any, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from baktlib.bars import BarBuilder
+from baktlib.datautil import to_ns, index_to_ns
+
+logger = getLogger(__name__)
+
+
+class IndicatorStore(object):
+    """OHLC全体に対して一度だけ計算したインジケーターを、時間足の位置で参照するストア
+
+    インジケーターは登録時にOHLC全体に対してベクトル演算で計算し、キャッシュディレクトリがあればファイルに保存します。
+    参照位置（カーソル）はadvanceで指定した日時までに確定した最後の時間足を指し、前にしか進みません。
+    getはカーソル以前の値しか返さないため、ストラテジーが未確定の時間足の値を参照すること（先読み）はありません。
+    BarBuilderを指定した場合は、カーソルが既知の最後の時間足に達した時点で、BarBuilderに約定履歴が追加されていれば
+    OHLCを作成し直してインジケーターを再計算します（ストリーム読み込みでは、再計算は約定履歴のチャンクごとに1回です）。
+    """
+
+    def __init__(self, ohlc: pd.DataFrame, rule: str, cache_dir: str = None, builder: BarBuilder = None):
+        """
+        :param ohlc: OHLC（bitflyer.conv_exec_to_ohlcと同じ形式）
+        :param rule: OHLCの時間足
+        :param cache_dir: 計算したインジケーターを保存するディレクトリ（省略時は保存しません）
+        :param builder: OHLCを逐次作成しているBarBuilder（指定した場合、インジケーターはファイルに保存しません）
+        """
+        self.ohlc = ohlc  # type: pd.DataFrame
+        """OHLC"""
+
+        self.cache_dir = cache_dir  # type: str
+        """計算したインジケーターを保存するディレクトリ"""
+
+        self.__freq = pd.Timedelta(rule).value  # type: int
+        """時間足の長さ（ナノ秒）"""
+
+        self.__ends = index_to_ns(ohlc.index) + self.__freq  # type: np.ndarray
+        """時間足ごとの確定日時（エポックナノ秒）"""
+
+        self.__builder = builder  # type: BarBuilder
+        """OHLCを逐次作成しているBarBuilder"""
+
+        self.__revision = builder.revision if builder is not None else 0  # type: int
+        """OHLCを作成した時点のBarBuilderの更新回数"""
+
+        self.__funcs = {}  # type: Dict[str, Tuple[Callable[..., Any], Dict[str, Any]]]
+        """登録したインジケーターの計算関数とパラメーター"""
+
+        self.__pos = -1  # type: int
+        """確定済みの最後の時間足の位置"""
+
+        self.__values = {}  # type: Dict[str, np.ndarray]
+        """登録したインジケーター"""
+
+        self.__columns = {}  # type: Dict[Any, np.ndarray]
+        """参照したOHLCの列"""
+
+        self.__digest = None  # type: str
+        """OHLCのダイジェスト（キャッシュのキーに使用します）"""
+
+    @property
+    def pos(self) -> int:
+        """確定済みの最後の時間足の位置（確定した時間足がない場合は-1）"""
+        return self.__pos
+
+    def __len__(self) -> int:
+        return len(self.__ends)
+
+    def register(self, name: str, func: Callable[..., Any], **params) -> None:
+        """インジケーターを登録します。
+        funcはOHLC全体とparamsを受け取り、時間足と同じ長さの系列（またはtalib.MACDのような系列のタプル）を返す関数です。
+        キャッシュディレクトリに同じ名前・パラメーター・OHLCで計算済みのファイルがあれば、計算せずに読み込みます
+        （funcの計算内容はキャッシュのキーに含まれないため、計算内容を変更した場合は名前も変更してください）。
+        :param name: インジケーターの名前
+        :param func: インジケーターを計算する関数
+        :param params: funcに渡すパラメーター
+        """
+        self.__funcs[name] = (func, params)
+        path = self.__cache_path(name, params)
+        if path and os.path.isfile(path):
+            values = np.load(path)
+        else:
+            values = self.__compute(name, func, params)
+            if path:
+                try:
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    tmp = f"{path}.{os.getpid()}.tmp.npy"
+                    np.save(tmp, values)
+                    os.replace(tmp, path)
+                except OSError as e:
+                    logger.warning(f"Failed to save indicator. [{path}] {e}")
+        self.__values[name] = values
+
+    def __compute(self, name: str, func: Callable[..., Any], params: Dict[str, Any]) -> np.ndarray:
+        """OHLC全体に対してインジケーターを計算します。"""
+        values = func(self.ohlc, **params)
+        if isinstance(values, (tuple, list)):
+            values = np.column_stack([np.asarray(v, dtype='f8') for v in values])
+        else:
+            values = np.asarray(values, dtype='f8')
+        if len(values) != len(self.__ends):
+            raise ValueError(f"Indicator length does not match OHLC. "
+                             f"[name={name}, len={len(values)}, ohlc={len(self.__ends)}]")
+        return values
+
+    def __refresh(self) -> None:
+        """BarBuilderに約定履歴が追加されていれば、OHLCを作成し直してインジケーターを再計算します。
+        確定済みの時間足の値は、約定履歴が追加されても変わりません。
+        """
+        if self.__builder is None or self.__builder.revision == self.__revision:
+            return
+        self.__revision = self.__builder.revision
+        self.ohlc = self.__builder.to_frame()
+        self.__ends = index_to_ns(self.ohlc.index) + self.__freq
+        self.__columns = {}
+        for name, (func, params) in self.__funcs.items():
+            self.__values[name] = self.__compute(name, func, params)
+
+    def advance(self, dt: datetime) -> int:
+        """カーソルを、指定した日時までに確定した最後の時間足まで進めます。
+        日時は前回の呼び出し以降のものを指定します（カーソルは戻りません）。
+        :param dt: 日時
+        :return: 確定済みの最後の時間足の位置（確定した時間足がない場合は-1）
+        """
+        t = to_ns(dt)
+        if not len(self.__ends) or self.__ends[-1] <= t:
+            self.__refresh()
+        n = len(self.__ends)
+        while self.__pos + 1 < n and self.__ends[self.__pos + 1] <= t:
+            self.__pos += 1
+        return self.__pos
+
+    def get(self, name: str, back: int = 0) -> Union[float, np.ndarray]:
+        """カーソル位置からback本前の時間足のインジケーターの値を返します。
+        :param name: インジケーターの名前
+        :param back: さかのぼる時間足の数
+        :return: 値（系列のタプルを登録した場合は系列ごとの値の配列。範囲外の場合はNaN）
+        """
+        values = self.__values[name]
+        i = self.__pos - back
+        if i < 0 or back < 0:
+            return np.full(values.shape[1:], np.nan) if values.ndim > 1 else np.nan
+        return values[i]
+
+    def bar(self, column, back: int = 0) -> float:
+        """カーソル位置からback本前の時間足のOHLCの値を返します。
+        :param column: OHLCの列（例: ('price', 'close')）
+        :param back: さかのぼる時間足の数
+        :return: 値（範囲外の場合はNaN）
+        """
+        if column not in self.__columns:
+            self.__columns[column] = self.ohlc[column].values
+        i = self.__pos - back
+        if i < 0 or back < 0:
+            return np.nan
+        return self.__columns[column][i]
+
+    def history(self, name: str) -> np.ndarray:
+        """カーソル位置までのインジケーターの値を返します。
+        :param name: インジケーターの名前
+        :return: 確定済みの時間足の値の配列
+        """
+        return self.__values[name][:self.__pos + 1]
+
+    def __cache_path(self, name: str, params: Dict[str, Any]) -> str:
+        """インジケーターを保存するファイルのパスを返します。"""
+        if not self.cache_dir or self.__builder is not None:
+            return None
+        if self.__digest is None:
+            h = pd.util.hash_pandas_object(self.ohlc, index=True).values
+            self.__digest = hashlib.sha1(h.tobytes()).hexdigest()
+        key = f"{name}:{sorted(params.items())}:{self.__digest}"
+        return os.path.join(self.cache_dir, 'indicators', hashlib.sha1(key.encode()).hexdigest() + '.npy')
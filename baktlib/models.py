@@ -2,9 +2,10 @@
 
 from datetime import datetime
 from logging import getLogger
+from typing import Callable, List
 
 from baktlib.constants import *
-from baktlib.calc import d
+from baktlib.calc import d, to_units, from_units, is_integral, div_round, SIZE_UNIT
 
 logger = getLogger(__name__)
 
@@ -33,11 +34,11 @@ class Order(object):
         self.price = price  # type: float
         """価格"""
 
-        self.size = size  # type: float
-        """発注サイズ"""
+        self.size_units = to_units(size)  # type: int
+        """発注サイズ（固定小数点表現）"""
 
-        self.open_size = size  # type: float
-        """未約定サイズ"""
+        self.open_size_units = self.size_units  # type: int
+        """未約定サイズ（固定小数点表現）"""
 
         self.delay_sec = delay_sec  # type: float
         """この注文が約定可能になるまでの遅延時間（秒）"""
@@ -54,11 +55,30 @@ class Order(object):
         self.executions = []  # type: List[Execution]
         """この注文によって発生した約定"""
 
+        self.listener = None  # type: Callable[[Order, str], None]
+        """ステータスが変更された時に、注文と変更前のステータスを引数に呼び出される関数"""
+
         logger.debug(f"Created {self}")
 
+    @property
+    def size(self) -> float:
+        """発注サイズ"""
+        return from_units(self.size_units)
+
+    @property
+    def open_size(self) -> float:
+        """未約定サイズ"""
+        return from_units(self.open_size_units)
+
+    def __set_status(self, status: str) -> None:
+        prev = self.status
+        self.status = status
+        if self.listener and prev != status:
+            self.listener(self, prev)
+
     def cancel(self) -> None:
         """注文をキャンセルします。"""
-        self.status = 'CANCELED'
+        self.__set_status(ORDER_STATUS_CANCELED)
         logger.debug(f"Order was canceled. [{self}]")
 
     def contract(self, exec_date: datetime, exec_price: float, exec_size: float) -> None:
@@ -77,12 +97,13 @@ class Order(object):
                 assert exec_price >= self.price, m
 
         # 約定サイズが注文サイズを超えていないかチェック
-        assert exec_size <= self.open_size, \
+        units = to_units(exec_size)  # type: int
+        assert units <= self.open_size_units, \
             f"Size is too large. [{self.id}, exec_size={exec_size}, open_size={self.open_size}]"
 
-        self.open_size = round(float(d(self.open_size) - d(exec_size)), 8)
-        if self.open_size == 0:
-            self.status = ORDER_STATUS_COMPLETED
+        self.open_size_units -= units
+        if self.open_size_units == 0:
+            self.__set_status(ORDER_STATUS_COMPLETED)
 
         # 約定履歴を作成
         self.executions.append(Execution(order_id=self.id,
@@ -90,7 +111,7 @@ class Order(object):
                                          side=self.side.value,
                                          price=exec_price,
                                          size=exec_size, ))
-        logger.debug(f"Order was {'full' if self.open_size == 0 else 'partial'} contracted. [{self}]")
+        logger.debug(f"Order was {'full' if self.open_size_units == 0 else 'partial'} contracted. [{self}]")
 
     def is_active(self) -> bool:
         """この注文が有効であるかどうかを返します。
@@ -112,11 +133,16 @@ class Execution(object):
         self.order_id = order_id  # type: int
         self.created_at = created_at  # type: datetime
         self.side = side  # type: str
-        self.size = size  # type: float
+        self.size_units = to_units(size)  # type: int
         self.price = price  # type: float
         self.delay = delay  # type: float
         logger.debug(f"Created {self}")
 
+    @property
+    def size(self) -> float:
+        """約定サイズ"""
+        return from_units(self.size_units)
+
     def __str__(self):
         return f"Execution[order_id={self.order_id}, created_at={self.created_at}, side={self.side}" \
             f", size={self.size}, price={self.price}, delay={self.delay}]"
@@ -131,9 +157,11 @@ class Position(object):
         self.open_order_id = open_order_id
         self.opened_at = opened_at
         self.side = side
-        self.amount = amount
+        self.amount_units = to_units(amount)  # type: int
+        """保有量（固定小数点表現）"""
         self.open_price = open_price
-        self.open_amount = amount
+        self.open_amount_units = self.amount_units  # type: int
+        """未決済の保有量（固定小数点表現）"""
         self.open_fee = 0
         self.closed_at = None
         self.close_price = None
@@ -141,10 +169,58 @@ class Position(object):
         self.pnl = 0
         logger.debug(f"Created {self}")
 
+    @property
+    def amount(self) -> float:
+        """保有量"""
+        return from_units(self.amount_units)
+
+    @property
+    def open_amount(self) -> float:
+        """未決済の保有量"""
+        return from_units(self.open_amount_units)
+
     def close(self, exec_date: datetime, exec_price: float, exec_size: float) -> float:
 
         logger.debug(f"Start to close position. {self}")
 
+        # 価格が全て整数（円）の場合は、サイズを固定小数点表現にして整数演算のみで計算する
+        if is_integral(self.open_price, exec_price, self.close_price or 0):
+            self.__close_fixed(exec_date, exec_price, exec_size)
+        else:
+            self.__close_decimal(exec_date, exec_price, exec_size)
+
+        logger.debug(f"Position was closed({'partial' if self.open_amount_units else 'full'}). {self}")
+
+    def __close_fixed(self, exec_date: datetime, exec_price: float, exec_size: float) -> None:
+
+        amount = self.amount_units  # type: int
+        open_amount = self.open_amount_units  # type: int
+        close_price = int(exec_price)  # type: int
+        open_price = int(self.open_price)  # type: int
+        size = to_units(exec_size)  # type: int
+
+        # クローズが既に発生している場合は、過去の約定済み金額を算出
+        past = int(self.close_price) * (amount - open_amount) if self.close_price else 0  # type: int
+
+        # 損益計算
+        if self.side == SIDE_BUY:
+            current_pnl = div_round((close_price - open_price) * size, SIZE_UNIT)
+        elif self.side == SIDE_SELL:
+            current_pnl = div_round((open_price - close_price) * size, SIZE_UNIT)
+        else:
+            raise SystemError(f"Illegal value [side='{self.side}'")
+
+        # 過去の損益と今回クローズした分の損益の合計を計算
+        self.pnl = int(self.pnl + current_pnl)
+
+        # 約定総額 = 今回約定金額＋約定済み金額
+        self.close_price = div_round(past + close_price * open_amount, amount)
+        self.close_fee = 0  # TODO feeに対応させる
+        self.closed_at = exec_date
+        self.open_amount_units -= size
+
+    def __close_decimal(self, exec_date: datetime, exec_price: float, exec_size: float) -> None:
+
         # クローズ済みの分を含むポジションの全体量
         amount = d(self.amount)  # type: Decimal
 
@@ -177,9 +253,7 @@ class Position(object):
         self.close_price = round(float((past + close_price * open_amount) / amount))
         self.close_fee = 0  # TODO feeに対応させる
         self.closed_at = exec_date
-        self.open_amount = round(float(open_amount - d(exec_size)), 8)
-
-        logger.debug(f"Position was closed({'partial' if self.open_amount else 'full'}). {self}")
+        self.open_amount_units -= to_units(exec_size)
 
     def __str__(self):
         return f"Position[id={self.id}, side={self.side}, amount={self.amount}, open_order_id={self.open_order_id}, " \
@@ -1,10 +1,14 @@
+import heapq
+from collections import deque
 from datetime import datetime
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Callable, Tuple, Deque
 
 import numpy as np
 
 from baktlib.constants import *
-from baktlib.calc import sub
+from baktlib import calc
+from baktlib.calc import to_units, from_units
+from baktlib.datautil import to_ns
 from baktlib.models import Order, Position, Execution
 
 
@@ -16,24 +20,49 @@ class OrderManager(object):
 
     @staticmethod
     def sum_size(orders) -> float:
-        return float(sum([Decimal(str(o.size)) for o in orders]))
+        return from_units(sum(o.size_units for o in orders))
 
     def __init__(self):
         self.__orders = []  # type: List[Order]
         self.__orders_each_trade = []  # type: List[List[Order]]
 
+        self.__by_status = {s.value: {} for s in OrderStatus}  # type: Dict[str, Dict[Order, int]]
+        """ステータスごとの注文（値は登録順の連番）"""
+
+        self.__by_side = {s: [] for s in Side}  # type: Dict[Side, List[Order]]
+        """sideごとの注文"""
+
+        self.__by_type = {t.value: [] for t in OrderType}  # type: Dict[str, List[Order]]
+        """注文種別ごとの注文"""
+
+        self.__expiry = []  # type: List[Tuple[int, int, Order]]
+        """有効期限を持つ注文のヒープ（キャンセル判定を行う日時のエポックナノ秒, 連番, 注文）"""
+
+        self.__pending = []  # type: List[Tuple[int, int, Order]]
+        """板に乗る前の注文のヒープ（板に乗る日時のエポックナノ秒, 連番, 注文）"""
+
+        self.__live = {}  # type: Dict[Order, int]
+        """板に乗っている有効な注文（値は登録順の連番）"""
+
+        self.__live_max_seq = -1  # type: int
+        """板に乗った注文の連番の最大値"""
+
+        self.__now = None  # type: datetime
+        """板に乗る前の注文を最後に判定した日時"""
+
+        self.listener = None  # type: Callable[[Order], None]
+        """有効な注文が約定、キャンセルまたは期限切れになった場合に呼び出す関数"""
+
     def get(self, side: Side = None, _type: OrderType = None, status: OrderStatus = None) -> List[Order]:
         ret = self.__orders
 
         if side:
             if side not in [Side.BUY, Side.SELL]:
                 raise ValueError()
-            ret = [o for o in ret if o.side == side]
 
         if _type:
             if _type not in [OrderType.LIMIT, OrderType.MARKET]:
                 raise ValueError()
-            ret = [o for o in ret if o.type == _type.value]
 
         if status:
             defined_status = [OrderStatus.ACTIVE,
@@ -42,7 +71,18 @@ class OrderManager(object):
                               OrderStatus.PARTIAL]
             if not status or status not in defined_status:
                 raise ValueError()
-            ret = [o for o in ret if o.status == status.value]
+
+            # 登録順に並べて返す（ACTIVE以外は、ステータスの変更順に索引へ追加されるため並べ直す）
+            orders = self.__by_status[status.value]
+            ret = list(orders) if status == OrderStatus.ACTIVE else sorted(orders, key=orders.get)
+            if side:
+                ret = [o for o in ret if o.side == side]
+
+        elif side:
+            ret = self.__by_side[side]
+
+        if _type:
+            ret = [o for o in ret if o.type == _type.value]
 
         return ret
 
@@ -50,6 +90,8 @@ class OrderManager(object):
         return self.__orders_each_trade
 
     def len(self, side: str = None, _type: str = None, status: OrderStatus = None) -> int:
+        if isinstance(status, OrderStatus) and not side and not _type:
+            return len(self.__by_status[status.value])
         return len(self.get(side, _type, status))
 
     def size(self, side: Side = None, _type: OrderType = None, status: OrderStatus = None) -> int:
@@ -62,9 +104,28 @@ class OrderManager(object):
 
     def add_orders(self, orders: List[Order]) -> None:
         if orders:
-            self.__orders.extend(orders)
+            for o in orders:
+                self.__by_status[o.status][o] = len(self.__orders)
+                self.__by_side[o.side].append(o)
+                self.__by_type[o.type].append(o)
+                if o.is_active():
+                    activate_at = to_ns(o.created_at) + int(o.delay_sec * 10 ** 9) - 1  # type: int
+                    heapq.heappush(self.__pending, (activate_at, len(self.__orders), o))
+                if o.expire_sec and o.is_active():
+                    expire_at = to_ns(o.created_at) + int(o.expire_sec * 10 ** 9) - 1  # type: int
+                    heapq.heappush(self.__expiry, (expire_at, len(self.__orders), o))
+                o.listener = self.__on_status_changed
+                self.__orders.append(o)
             self.__orders_each_trade.append(orders)
 
+    def __on_status_changed(self, o: Order, prev: str) -> None:
+        seq = self.__by_status[prev].pop(o)
+        self.__by_status[o.status][o] = seq
+        if prev == ORDER_STATUS_ACTIVE:
+            self.__live.pop(o, None)
+            if self.listener:
+                self.listener(o)
+
     def get_active_orders(self, now: datetime) -> List[Order]:
         """有効な注文の一覧を返します。
         作成された注文が有効であるかの判断には、ステータスに加え、板乗りまでの時間も考慮します。
@@ -74,11 +135,47 @@ class OrderManager(object):
         """
         if not now:
             raise ValueError
-        return [o for o in self.get(status=OrderStatus.ACTIVE) if (now - o.created_at).total_seconds() >= o.delay_sec]
-        # return [o for o in self.__orders if o.status == 'ACTIVE' and (now - o.created_at).total_seconds() >= o.delay_sec]
+
+        # 前回より過去の日時を指定された場合は、板に乗っている注文から改めて判定する
+        if self.__now and now < self.__now:
+            return [o for o in self.__live if (now - o.created_at).total_seconds() >= o.delay_sec]
+
+        self.__activate(now)
+        return list(self.__live)
+
+    def __activate(self, now: datetime) -> None:
+        """板に乗る日時を迎えた注文を、板に乗っている注文に移します。
+        :param now: 現在日時
+        """
+        self.__now = now
+        ns = to_ns(now)
+        pending = []  # type: List[Tuple[int, int, Order]]
+        activated = []  # type: List[Tuple[int, Order]]
+        while self.__pending and self.__pending[0][0] <= ns:
+            e = heapq.heappop(self.__pending)
+            o = e[2]
+            if not o.is_active():
+                continue
+            if (now - o.created_at).total_seconds() >= o.delay_sec:
+                activated.append((e[1], o))
+            else:
+                pending.append(e)
+
+        for e in pending:
+            heapq.heappush(self.__pending, e)
+
+        # 板に乗っている注文は登録順に並べておく
+        if activated:
+            activated.sort(key=lambda a: a[0])
+            if activated[0][0] < self.__live_max_seq:
+                activated.extend((seq, o) for o, seq in self.__live.items())
+                activated.sort(key=lambda a: a[0])
+                self.__live.clear()
+            self.__live.update((o, seq) for seq, o in activated)
+            self.__live_max_seq = max(self.__live_max_seq, activated[-1][0])
 
     def get_total_size(self) -> float:
-        return float(sum([Decimal(o.size) for o in self.__orders]))
+        return __class__.sum_size(self.__orders)
 
     def get_executions(self) -> List[Execution]:
         executions = []  # type: List[Execution]
@@ -87,17 +184,35 @@ class OrderManager(object):
         return executions
 
     def sum_exec_size(self) -> float:
-        return round(float(sum([Decimal(str(o.size - o.open_size)) for o in self.__orders])), 8)
+        return from_units(sum(o.size_units - o.open_size_units for o in self.__orders))
 
     def cancel(self, to: datetime):
+        """有効期限を過ぎた注文をキャンセルします。
+        有効期限の早い順に並べたヒープから、期限を迎えた注文のみを取り出して判定します。
+        :param to: 現在日時
+        """
+        now = to_ns(to)
+        pending = []  # type: List[Tuple[int, int, Order]]
+        while self.__expiry and self.__expiry[0][0] <= now:
+            expire_at, seq, o = heapq.heappop(self.__expiry)
 
-        # 有効な注文を抽出する
-        active_orders = self.get_active_orders(to)  # type: List[Order]
+            # 既に約定またはキャンセルされた注文は対象外
+            if not o.is_active():
+                continue
+
+            # 板に乗る前の注文は、板に乗る日時に改めて判定する
+            elapsed = (to - o.created_at).total_seconds()  # type: float
+            if elapsed < o.delay_sec:
+                pending.append((to_ns(o.created_at) + int(o.delay_sec * 10 ** 9), seq, o))
 
-        # 注文作成後の経過時間が有効期限を過ぎていれば該当の注文をキャンセルする
-        for o in active_orders:
-            if o.expire_sec and (to - o.created_at).total_seconds() > o.expire_sec:
+            # 注文作成後の経過時間が有効期限を過ぎていれば該当の注文をキャンセルする
+            elif elapsed > o.expire_sec:
                 o.cancel()
+            else:
+                pending.append((expire_at, seq, o))
+
+        for e in pending:
+            heapq.heappush(self.__expiry, e)
 
     def stats(self) -> Dict[str, Any]:
 
@@ -107,13 +222,13 @@ class OrderManager(object):
 
         return {
             'num_of_orders': num,
-            'num_of_buy_orders': len(self.get(side=Side.BUY)),
-            'num_of_sel_orders': len(self.get(side=Side.SELL)),
-            'num_of_lmt_orders': len(self.get(_type=OrderType.LIMIT)),
-            'num_of_mkt_orders': len(self.get(_type=OrderType.MARKET)),
-            'num_of_completed_orders': len(self.get(status=OrderStatus.COMPLETED)),
-            'num_of_canceled_orders': len(self.get(status=OrderStatus.CANCELED)),
-            'num_of_active_orders': len(self.get(status=OrderStatus.ACTIVE)),
+            'num_of_buy_orders': len(self.__by_side[Side.BUY]),
+            'num_of_sel_orders': len(self.__by_side[Side.SELL]),
+            'num_of_lmt_orders': len(self.__by_type[OrderType.LIMIT.value]),
+            'num_of_mkt_orders': len(self.__by_type[OrderType.MARKET.value]),
+            'num_of_completed_orders': self.len(status=OrderStatus.COMPLETED),
+            'num_of_canceled_orders': self.len(status=OrderStatus.CANCELED),
+            'num_of_active_orders': self.len(status=OrderStatus.ACTIVE),
             'num_of_exec': len(self.get_executions()),
             'size_of_orders': size,
             'size_of_limit_orders': self.size(_type=OrderType.LIMIT),
@@ -125,30 +240,52 @@ class OrderManager(object):
 
 
 class PositionManager(object):
+    """保有中のポジション
+
+    ポジションはsideごとに保有開始順のキューで管理し、FIFOで決済します。
+    side別の保有量（固定小数点表現）と取得価額の合計を随時更新するため、保有量と未実現損益はO(1)で求まります。
+    """
 
     def __init__(self):
-        self.__positions = []  # type: List[Position]
+        self.__positions = {Side.BUY.value: deque(), Side.SELL.value: deque()}  # type: Dict[str, Deque[Position]]
+        """sideごとのポジション（保有開始順）"""
+
+        self.__open_units = {Side.BUY.value: 0, Side.SELL.value: 0}  # type: Dict[str, int]
+        """sideごとの保有量（固定小数点表現）"""
+
+        self.__cost = {Side.BUY.value: 0, Side.SELL.value: 0}  # type: Dict[str, int]
+        """sideごとの取得価額の合計（価格×保有量の単位数。価格が整数でないポジションを保有した場合はDecimal）"""
+
         self.__id = 0  # type: int
 
     def get(self) -> List[Position]:
-        return self.__positions
+        return list(self.__positions[SIDE_BUY]) + list(self.__positions[SIDE_SELL])
 
-    def add_position(self, exec_date, o: Order, amount: float, fee_rate: float):
-        if not exec_date or not o.side or not o.price or not amount or not o.id:
+    def add_position(self, exec_date, o: Order, amount: float, fee_rate: float, price: float = None):
+        price = price or o.price
+        if not exec_date or not o.side or not price or not amount or not o.id:
             raise ValueError
         self.__id = self.__id + 1
-        p = Position(self.__id, exec_date, o.side.value, o.price, amount, fee_rate, o.id)
-        self.__positions.append(p)
-
-    def delete_positions(self, i: int) -> None:
-        del self.__positions[i]
+        p = Position(self.__id, exec_date, o.side.value, price, amount, fee_rate, o.id)
+        self.__positions[p.side].append(p)
+        self.__update(p, p.amount_units)
+
+    def __update(self, p: Position, units: int) -> None:
+        """side別の保有量と取得価額の合計を更新します。
+        :param p: 増減したポジション
+        :param units: 保有量の増減（固定小数点表現）
+        """
+        self.__open_units[p.side] += units
+        if calc.is_integral(p.open_price):
+            self.__cost[p.side] += int(p.open_price) * units
+        else:
+            self.__cost[p.side] += d(p.open_price) * units
 
     def len(self) -> int:
-        return len(self.__positions)
+        return len(self.__positions[SIDE_BUY]) + len(self.__positions[SIDE_SELL])
 
     def sum_size(self, side: Side) -> float:
-        oa = [Decimal(str(p.open_amount)) for p in self.filter(side=side)]
-        return round(float(sum(oa)), 8) if oa else 0.0
+        return from_units(self.__open_units[side.value])
 
     def sum_unrealized_pnl(self, ltp: float) -> int:
         """未実現損益の金額を返します。
@@ -156,72 +293,111 @@ class PositionManager(object):
         :param ltp: 最終取引価格
         :return: 未実現損益
         """
-        if not self.__positions:
+        if not self.len():
             return 0
-        if self.__positions[0].side == SIDE_BUY:
-            pnl = [(d(ltp) - d(p.open_price)) * d(p.open_amount) for p in self.__positions]
-        elif self.__positions[0].side == SIDE_SELL:
-            pnl = [(d(p.open_price) - d(ltp)) * d(p.open_amount) for p in self.__positions]
-        return round(float(sum(pnl)))
+        cost = self.__cost
+        # 価格が全て整数（円）の場合は、整数演算のみで計算する
+        if calc.is_integral(ltp) and type(cost[SIDE_BUY]) is int and type(cost[SIDE_SELL]) is int:
+            price = int(ltp)  # type: int
+            pnl = (price * self.__open_units[SIDE_BUY] - cost[SIDE_BUY]) \
+                + (cost[SIDE_SELL] - price * self.__open_units[SIDE_SELL])  # type: int
+            return calc.div_round(pnl, calc.SIZE_UNIT)
+        price = d(ltp)
+        pnl = (price * self.__open_units[SIDE_BUY] - cost[SIDE_BUY]) \
+            + (cost[SIDE_SELL] - price * self.__open_units[SIDE_SELL])  # type: Decimal
+        return round(float(pnl / calc.SIZE_UNIT))
 
     def filter(self, side: Side = None) -> List[Position]:
-        ret = self.__positions
         if side:
             if side not in [Side.BUY, Side.SELL]:
                 raise ValueError()
-            ret = [p for p in ret if p.side == side.value]
-        return ret
+            return list(self.__positions[side.value])
+        return self.get()
 
     def get_open_size(self) -> float:
-        if self.__positions:
-            return round(float(sum([Decimal(str(p.open_amount)) for p in self.__positions])), 8)
-        return 0.0
-
-    def contract(self, can_exec_size_by_order, buy_ok: bool, sell_ok: bool, exec_date, exec_price, o, trades):
-
-        for i, p in enumerate(self.__positions):
+        return from_units(self.__open_units[SIDE_BUY] + self.__open_units[SIDE_SELL])
+
+    def contract(self, o: Order, exec_date: datetime, exec_price: float, size: float) -> Tuple[float, List[Position]]:
+        """注文と反対sideのポジションを、保有開始の古い順に指定したサイズまで決済します。
+        決済した分は注文にも約定として反映します。
+        :param o: 注文
+        :param exec_date: 約定日時
+        :param exec_price: 約定価格
+        :param size: 決済可能なサイズ
+        :return: 決済したサイズと、全量を決済したポジションのリスト
+        """
+        positions = self.__positions[SIDE_SELL if o.side == Side.BUY else SIDE_BUY]  # type: Deque[Position]
+        units = to_units(size)  # type: int
+        can_exec_units = units  # type: int
+        closed = []  # type: List[Position]
 
-            # 注文と同じsideのポジションはスキップ
-            if (buy_ok and p.side == SIDE_BUY) or (sell_ok and p.side == SIDE_SELL):
-                continue
+        while positions and can_exec_units > 0:
+            p = positions[0]
 
             # ポジションの一部を決済
-            if p.open_amount - can_exec_size_by_order > 0:
-                p.close(exec_date, exec_price, can_exec_size_by_order)
-                o.contract(exec_date, exec_price, can_exec_size_by_order)
-                exec_size = sub(exec_size, can_exec_size_by_order)
+            if p.open_amount_units > can_exec_units:
+                exec_size = from_units(can_exec_units)  # type: float
+                p.close(exec_date, exec_price, exec_size)
+                o.contract(exec_date, exec_price, exec_size)
+                self.__update(p, -can_exec_units)
 
                 # この注文と約定履歴の約定可能量を消化しきっているため、ゼロで更新
-                can_exec_size_by_order = 0
+                can_exec_units = 0
 
             # ポジションの全部を決済
             else:
-
-                # 約定履歴の持つ約定量からこのポジション決済によって、約定した分を減らす
-                exec_size = sub(exec_size, p.open_amount)
+                open_units = p.open_amount_units  # type: int
+                open_amount = from_units(open_units)  # type: float
 
                 # この注文と約定履歴の約定可能量を更新
-                can_exec_size_by_order = sub(can_exec_size_by_order, p.open_amount)
+                can_exec_units -= open_units
 
                 # 約定した量の分を注文に反映
-                o.contract(exec_date, exec_price, p.open_amount)
+                o.contract(exec_date, exec_price, open_amount)
 
                 # 残りのポジションを全てクローズ
-                p.close(exec_date, exec_price, p.open_amount)
-                trades.append(p)
-                self.delete_positions(i)
-                # del positions[i]
+                p.close(exec_date, exec_price, open_amount)
+                self.__update(p, -open_units)
+                positions.popleft()
+                closed.append(p)
 
-            # 発注量を消化しきったらpositionsのループをbreakして次の注文の処理へ
-            if can_exec_size_by_order == 0:
-                break
+        return from_units(units - can_exec_units), closed
 
 
 class TradeManager(object):
+    """決済済みのポジション
+
+    損益の合計や注文単位の勝敗数、最大ドローダウンは、ポジションを追加するたびに更新します。
+    """
 
     def __init__(self):
         self.__positions = []  # type: List[Position]
 
+        self.__pnl = 0  # type: int
+        """実現損益の合計"""
+
+        self.__profit = 0  # type: int
+        """利益が出たポジションの損益の合計"""
+
+        self.__loss = 0  # type: int
+        """損失が出たポジションの損益の合計"""
+
+        self.__pnl_by_order = {}  # type: Dict[int, int]
+        """注文IDごとの損益"""
+
+        self.__num_by_result = {'win': 0, 'lose': 0, 'even': 0}  # type: Dict[str, int]
+        """注文単位の勝敗数"""
+
+        self.__peak = 0  # type: int
+        """実現損益の最大値"""
+
+        self.__max_drawdown = 0  # type: int
+        """実現損益の最大ドローダウン"""
+
+    @staticmethod
+    def __result(pnl: int) -> str:
+        return 'win' if pnl > 0 else 'lose' if pnl < 0 else 'even'
+
     def get(self) -> List[Position]:
         return self.__positions
 
@@ -230,33 +406,45 @@ class TradeManager(object):
             raise ValueError
         self.__positions.append(position)
 
+        pnl = position.pnl
+        self.__pnl += pnl
+        if pnl > 0:
+            self.__profit += pnl
+        elif pnl < 0:
+            self.__loss += pnl
+
+        # 勝敗はポジション単位ではなく、注文単位で計測する
+        prev = self.__pnl_by_order.get(position.open_order_id)
+        if prev is not None:
+            self.__num_by_result[__class__.__result(prev)] -= 1
+        order_pnl = (prev or 0) + pnl
+        self.__pnl_by_order[position.open_order_id] = order_pnl
+        self.__num_by_result[__class__.__result(order_pnl)] += 1
+
+        # 最大ドローダウン
+        self.__peak = max(self.__peak, self.__pnl)
+        self.__max_drawdown = max(self.__max_drawdown, self.__peak - self.__pnl)
+
     def sum_pnl(self) -> float:
-        return round(float(sum([p.pnl for p in self.__positions])), 8)
+        return round(float(self.__pnl), 8)
 
     def sum_pnl_positive(self):
-        return round(float(sum([p.pnl for p in self.__positions if p.pnl > 0])), 8)
+        return round(float(self.__profit), 8)
 
     def sum_pnl_negative(self):
-        return round(float(sum([p.pnl for p in self.__positions if p.pnl < 0])), 8)
+        return round(float(self.__loss), 8)
 
     def sum_size(self) -> float:
-        return round(float(sum([p.size for p in self.__positions])), 8)
-
-    def stats(self) -> Dict[str, Any]:
-        import pandas as pd
+        return from_units(sum(p.amount_units for p in self.__positions))
 
-        # 注文IDと損益の表を作成
-        t = pd.DataFrame(data={'open_order_id': [p.open_order_id for p in self.__positions],
-                               'pnl': [p.pnl for p in self.__positions]})  # type: pd.DataFrame
+    def max_drawdown(self) -> float:
+        return round(float(self.__max_drawdown), 8)
 
-        # 注文IDごとの損益
-        t_pnl_by_order = t.groupby('open_order_id').sum()
-
-        # 勝敗はポジション単位ではなく、注文単位で計測する
-        num_of_trades = len(t_pnl_by_order)
-        num_of_win = len(t_pnl_by_order[t_pnl_by_order['pnl'] > 0])
-        num_of_lose = len(t_pnl_by_order[t_pnl_by_order['pnl'] < 0])
-        num_of_even = len(t_pnl_by_order[t_pnl_by_order['pnl'] == 0])
+    def stats(self) -> Dict[str, Any]:
+        num_of_trades = len(self.__pnl_by_order)
+        num_of_win = self.__num_by_result['win']
+        num_of_lose = self.__num_by_result['lose']
+        num_of_even = self.__num_by_result['even']
         win_rate = num_of_win / num_of_trades if num_of_trades else 0
         profit = self.sum_pnl_positive()
         loss = abs(self.sum_pnl_negative())
@@ -272,25 +460,39 @@ class TradeManager(object):
                 'loss': loss,
                 'expected_value': avg_profit * win_rate - avg_loss * (1 - win_rate),
                 'total_pnl': profit - loss,
-                'pf': round(profit / loss, 2) if loss else 0.0}
+                'pf': round(profit / loss, 2) if loss else 0.0,
+                'max_drawdown': self.max_drawdown()}
 
 
 class HistoryManager(object):
+    """時間枠ごとの状況の記録
+
+    記録は項目ごとに型を持つ構造化配列として保持します。
+    配列は時間枠の数だけ事前に確保し、不足した場合は倍の大きさに拡張します。
+    """
+
+    DTYPE = np.dtype([('time', 'M8[ns]'),
+                      ('buy_pos_size', 'f8'),
+                      ('sell_pos_size', 'f8'),
+                      ('buy_volume', 'f8'),
+                      ('sell_volume', 'f8'),
+                      ('ltp', 'f8'),
+                      ('realized_pnl', 'f8'),
+                      ('unrealized_pnl', 'i8'),
+                      ('exec_recv_delay', 'f8'),
+                      ('order_delay', 'f8'),
+                      ('market_volume', 'f8')])
+    """記録する項目と型"""
+
+    def __init__(self, size: int = 0):
+        """
+        :param size: 記録する時間枠の数の見込み
+        """
+        self.__rows = np.zeros(max(size, 1), dtype=__class__.DTYPE)  # type: np.ndarray
+        self.__len = 0  # type: int
 
-    def __init__(self):
-        self.__time = []  # type: datetime
-        self.__buy_pos_sizes = []  # type: BuyPositionSizes
-        self.__sell_pos_sizes = []  # type: SellPositionSizes
-        self.__realized_pnl = []  # type: RealizedPnl
-        self.__unrealized_pnl = []  # type: UnrealizedPnl
-        self.__ltp = []  # type: LTP
-        self.__buy_volumes = []
-        self.__sell_volumes = []
-        self.__times = []
-        self.__orders = []  # type: List[Orders]
-        self.__exec_recv_delay = []
-        self.__order_delay = []
-        self.__market_volumes = []
+    def __len__(self) -> int:
+        return self.__len
 
     def add_history(self,
                     time: datetime,
@@ -305,29 +507,71 @@ class HistoryManager(object):
                     exec_recv_delay: float = None,
                     order_delay: float = None,
                     market_volume: float = None):
-        self.__time.append(time)
-        self.__buy_pos_sizes.append(buy_pos_size)
-        self.__sell_pos_sizes.append(sell_pos_size)
-        self.__buy_volumes.append(buy_volume)
-        self.__sell_volumes.append(sell_volume)
-        self.__ltp.append(ltp)
-        self.__realized_pnl.append(realized_pnl)
-        self.__unrealized_pnl.append(unrealized_pnl)
-        # self.__timies.append(time)
-        # self.__orders.append(orders)
-        self.__exec_recv_delay.append(exec_recv_delay)
-        self.__order_delay.append(order_delay)
-        self.__market_volumes.append(market_volume)
-
-    def get(self) -> Dict[str, List[float]]:
-        return {'time': self.__time,
-                'buy_pos_size': self.__buy_pos_sizes,
-                'sell_pos_size': self.__sell_pos_sizes,
-                'market_buy_size': self.__buy_volumes,
-                'market_sell_size': self.__sell_volumes,
-                'last_prices': self.__ltp,
-                'realized_gain': np.array(self.__realized_pnl),
-                'unrealized_gain': np.array(self.__unrealized_pnl),
-                'exec_recv_delay_sec': self.__exec_recv_delay,
-                'order_delay_sec': self.__order_delay,
-                'volume': round(float(sum([Decimal(str(v)) for v in self.__market_volumes])), 8)}
+        if self.__len == len(self.__rows):
+            self.__rows = np.concatenate([self.__rows, np.zeros(len(self.__rows), dtype=__class__.DTYPE)])
+        self.__rows[self.__len] = (to_ns(time),
+                                   buy_pos_size,
+                                   sell_pos_size,
+                                   buy_volume,
+                                   sell_volume,
+                                   ltp,
+                                   realized_pnl,
+                                   unrealized_pnl,
+                                   np.nan if exec_recv_delay is None else exec_recv_delay,
+                                   np.nan if order_delay is None else order_delay,
+                                   np.nan if market_volume is None else market_volume)
+        self.__len += 1
+
+    def fill_history(self,
+                     times: np.ndarray,
+                     buy_pos_size: float,
+                     sell_pos_size: float,
+                     ltp: float,
+                     realized_pnl: float,
+                     unrealized_pnl: float) -> None:
+        """約定も新規注文もない連続した時間枠の状況をまとめて記録します。
+        各時間枠の記録は、add_historyで出来高と注文の遅延時間を0として記録した場合と同じです。
+        :param times: 時間枠ごとの日時（エポックナノ秒）
+        :param buy_pos_size: 買いポジションの保有量
+        :param sell_pos_size: 売りポジションの保有量
+        :param ltp: 最終約定価格
+        :param realized_pnl: 確定損益
+        :param unrealized_pnl: 評価損益
+        """
+        n = len(times)
+        if self.__len + n > len(self.__rows):
+            size = max(len(self.__rows) * 2, self.__len + n)
+            self.__rows = np.concatenate([self.__rows, np.zeros(size - len(self.__rows), dtype=__class__.DTYPE)])
+        rows = self.__rows[self.__len:self.__len + n]
+        rows['time'] = times
+        rows['buy_pos_size'] = buy_pos_size
+        rows['sell_pos_size'] = sell_pos_size
+        rows['buy_volume'] = 0.0
+        rows['sell_volume'] = -0.0
+        rows['ltp'] = np.nan if ltp is None else ltp
+        rows['realized_pnl'] = realized_pnl
+        rows['unrealized_pnl'] = unrealized_pnl
+        rows['exec_recv_delay'] = np.nan
+        rows['order_delay'] = 0.0
+        rows['market_volume'] = 0.0
+        self.__len += n
+
+    def get_array(self) -> np.ndarray:
+        """記録済みの時間枠の構造化配列を返します（コピーはしません）。
+        :return: DTYPEの構造化配列
+        """
+        return self.__rows[:self.__len]
+
+    def get(self) -> Dict[str, np.ndarray]:
+        rows = self.get_array()
+        return {'time': rows['time'],
+                'buy_pos_size': rows['buy_pos_size'],
+                'sell_pos_size': rows['sell_pos_size'],
+                'market_buy_size': rows['buy_volume'],
+                'market_sell_size': rows['sell_volume'],
+                'last_prices': rows['ltp'],
+                'realized_gain': rows['realized_pnl'],
+                'unrealized_gain': rows['unrealized_pnl'],
+                'exec_recv_delay_sec': rows['exec_recv_delay'],
+                'order_delay_sec': rows['order_delay'],
+                'volume': calc.sum_size(rows['market_volume'][~np.isnan(rows['market_volume'])])}
@@ -1,23 +1,25 @@
 # coding: utf-8
 
-from datetime import datetime, timedelta
+from datetime import datetime
 from typing import List, Dict, Any
 
 import pandas as pd
 
 from baktlib.constants import *
-from baktlib import bitflyer
 from baktlib.calc import d
 from baktlib.models import Order, Position
+from baktlib.bars import BarCache
 from baktlib.strategy import Strategy
 
 
 class ClosePriceFollow(Strategy):
 
-    def __init__(self, user_config: Dict[str, Any], executions: pd.DataFrame):
-        super().__init__(user_config, executions)
+    def __init__(self, user_config: Dict[str, Any], executions: pd.DataFrame, bar_cache: BarCache = None):
+        super().__init__(user_config, executions, bar_cache)
         self.order_delay_sec = float(self.user_config['order_delay_sec'])
         self.order_expire_sec = float(self.user_config['order_expire_sec'])
+        self.bars = self.add_rolling_bars('5s', 10)
+        """直近10本の5秒足"""
 
     def think(self,
               trade_num: int,
@@ -27,13 +29,13 @@ class ClosePriceFollow(Strategy):
               bids=None,
               asks=None) -> List[Order]:
 
-        executions = self.executions[
-            (self.executions['exec_date'] > (dt - timedelta(minutes=1))) & (self.executions['exec_date'] < dt)]
-        if executions.empty:
+        # 約定履歴を5秒ごとにグルーピングした直近の10本
+        t = self.bars.frame()  # type: pd.DataFrame
+        if t.empty:
             return []
 
         new_orders = []  # type: List[Order]
-        ltp = float(executions.tail(1).iat[0, 3])  # type: float
+        ltp = float(t['price']['close'].values[-1])  # type: float
         buy_pos = [d(p.open_amount) for p in positions if p.side == 'BUY']
         sell_pos = [d(p.open_amount) for p in positions if p.side == 'SELL']
         buy_pos_size = round(float(sum(buy_pos)), 8) if buy_pos else 0.0
@@ -41,8 +43,6 @@ class ClosePriceFollow(Strategy):
         # recv_delay = float(executions.at[len(executions) - 1, 'delay'])
         recv_delay = 0
 
-        # 約定履歴を1秒ごとにグルーピング、一定期間分遡ったボリューム差を合算する
-        t = bitflyer.conv_exec_to_ohlc(executions, str(5) + 's').tail(10)  # type: pd.DataFrame
         # ls_diff_sum_5 = (t['buy_size']['buy_size'] - t['sell_size']['sell_size'])\
         #     .rolling(5, min_periods=5).sum().fillna(0)  # type: pd.Series
         # v1 = ls_diff_sum_5.values[-1]
@@ -6,12 +6,23 @@ from typing import List, Dict, Any
 import pandas as pd
 
 from baktlib.constants import *
-from baktlib import bitflyer
 from baktlib.calc import d
 from baktlib.models import Order, Position
+from baktlib.bars import BarCache
 from baktlib.strategy import Strategy
 
 
+def price_z(ohlc: pd.DataFrame, w: int) -> pd.Series:
+    """価格のZスコア = 偏差（価格 - 母平均） / 標準偏差"""
+    close = ohlc['price']['close']
+    return (close - close.rolling(w, min_periods=1).mean()) / close.rolling(w, min_periods=1).std()
+
+
+def price_z_mean(ohlc: pd.DataFrame, w: int, mean_w: int) -> pd.Series:
+    """価格のZスコアの平均"""
+    return price_z(ohlc, w).rolling(mean_w, min_periods=mean_w).mean()
+
+
 class Cobra(Strategy):
     """
     価格の期間あたりのZスコアを算出して、異常値を検出したら逆張りでエントリーします。
@@ -19,8 +30,9 @@ class Cobra(Strategy):
 
     def __init__(self,
                  user_config: Dict[str, Any],
-                 executions: pd.DataFrame):
-        super().__init__(user_config, executions)
+                 executions: pd.DataFrame,
+                 bar_cache: BarCache = None):
+        super().__init__(user_config, executions, bar_cache)
 
         # 約定履歴
         self.executions = executions  # type: pd.DataFrame
@@ -36,26 +48,14 @@ class Cobra(Strategy):
 
         # OHLC
         rule = self.user_config['ohlc_rule']
-        self.ohlc = bitflyer.conv_exec_to_ohlc(self.executions, rule=rule).fillna(method='ffill')
+        self.ohlc = self.bar_cache.get(rule)
 
         w = int(self.user_config['window'])
-        close = self.ohlc['price']['close']
-
-        # 期間ごとの平均価格
-        self.ohlc['mean'] = close.rolling(w, min_periods=1).mean()
-
-        # 価格の偏差
-        deviation = close - self.ohlc['mean']
-
-        # 価格の標準偏差
-        stdev = close.rolling(w, min_periods=1).std()
-
-        # 価格のZスコア = 偏差（価格 - 母平均） / 標準偏差
-        self.price_z = deviation / stdev
 
-        # 価格のZスコアの平均
-        w = 5
-        self.price_z_mean = self.price_z.rolling(w, min_periods=w).mean()
+        # 価格のZスコアと、その平均
+        self.indicators = self.create_indicator_store(self.ohlc, rule)
+        self.indicators.register('price_z', price_z, w=w)
+        self.indicators.register('price_z_mean', price_z_mean, w=w, mean_w=5)
 
     def think(self,
               trade_num: int,
@@ -66,13 +66,15 @@ class Cobra(Strategy):
               asks=None) -> List[Order]:
 
         new_orders = []  # type: List[Order]
-        index = trade_num - 1
-        if index >= len(self.ohlc):
+        index = self.indicators.advance(dt)
+        if index < 0:
             return []
-        close = self.ohlc['price']['close'][index]
+        close = self.indicators.bar(('price', 'close'))
         long_size, short_size = self.get_pos_size(positions)
-        delay = float(self.ohlc['delay']['delay'][index])
-        print(f"{trade_num}, time: {self.ohlc.index[index]}, close: {close}, z: {self.price_z[index]}, "
+        delay = float(self.indicators.bar(('delay', 'delay')))
+        z_mean = [self.indicators.get('price_z_mean', back=i) for i in range(3)]
+        print(f"{trade_num}, time: {self.indicators.ohlc.index[index]}, close: {close}, "
+              f"z: {self.indicators.get('price_z')}, "
               f"long_size: {long_size}, short_size: {short_size}, delay: {delay}")
 
         z_outside = 3.0  # type: float
@@ -104,7 +106,7 @@ class Cobra(Strategy):
         #                             _type=ORDER_TYPE_LIMIT, size=short_size, price=close,
         #                             delay_sec=self.order_delay_sec, expire_sec=self.order_expire_sec))
 
-        if long_size >= 0.01 and self.price_z_mean[index - 1] > self.price_z_mean[index]:
+        if long_size >= 0.01 and z_mean[1] > z_mean[0]:
             new_orders.append(Order(id=self.next_order_id, created_at=dt, side=SIDE_SELL,
                                     _type=ORDER_TYPE_LIMIT,
                                     size=long_size,
@@ -112,7 +114,7 @@ class Cobra(Strategy):
                                     delay_sec=self.order_delay_sec,
                                     expire_sec=self.order_expire_sec))
 
-        elif short_size >= 0.01 and self.price_z_mean[index - 1] < self.price_z_mean[index]:
+        elif short_size >= 0.01 and z_mean[1] < z_mean[0]:
             new_orders.append(Order(id=self.next_order_id, created_at=dt, side=SIDE_BUY,
                                     _type=ORDER_TYPE_LIMIT,
                                     size=short_size,
@@ -121,8 +123,8 @@ class Cobra(Strategy):
                                     expire_sec=self.order_expire_sec))
 
         elif index > 1\
-            and self.price_z_mean[index - 2] > self.price_z_mean[index - 1] < -2 \
-            and self.price_z_mean[index - 1] < self.price_z_mean[index]:
+            and z_mean[2] > z_mean[1] < -2 \
+            and z_mean[1] < z_mean[0]:
             new_orders.append(Order(id=self.next_order_id, created_at=dt, side=SIDE_BUY,
                                     _type=ORDER_TYPE_LIMIT,
                                     size=self.order_size,
@@ -131,8 +133,8 @@ class Cobra(Strategy):
                                     expire_sec=self.order_expire_sec))
 
         elif index > 1\
-            and self.price_z_mean[index - 2] < self.price_z_mean[index - 1] > 2\
-            and self.price_z_mean[index - 1] > self.price_z_mean[index]:
+            and z_mean[2] < z_mean[1] > 2\
+            and z_mean[1] > z_mean[0]:
             new_orders.append(Order(id=self.next_order_id, created_at=dt, side=SIDE_SELL,
                                     _type=ORDER_TYPE_LIMIT,
                                     size=self.order_size,
@@ -7,18 +7,25 @@ import pandas as pd
 import talib
 
 from baktlib.constants import *
-from baktlib import bitflyer
 from baktlib.calc import d
 from baktlib.models import Order, Position
+from baktlib.bars import BarCache
 from baktlib.strategy import Strategy
 
 
+def bbands(ohlc: pd.DataFrame, timeperiod: int, nbdev: float):
+    """終値のボリンジャーバンド（上限、中央、下限）"""
+    return talib.BBANDS(ohlc['price']['close'].values, timeperiod=timeperiod, matype=talib.MA_Type.SMA,
+                        nbdevup=nbdev, nbdevdn=nbdev)
+
+
 class DoubleBollingerBand(Strategy):
 
     def __init__(self,
                  user_config: Dict[str, Any],
-                 executions: pd.DataFrame):
-        super().__init__(user_config, executions)
+                 executions: pd.DataFrame,
+                 bar_cache: BarCache = None):
+        super().__init__(user_config, executions, bar_cache)
 
         self.timeperiod = 20
         self.ohlc_timeframe_sec = 10
@@ -27,18 +34,14 @@ class DoubleBollingerBand(Strategy):
         self.order_delay_sec = float(self.user_config['order_delay_sec'])
         self.order_expire_sec = float(self.user_config['order_expire_sec'])
 
-        # 全約定履歴に対応するローソク足を作成
-        self.ohlc = bitflyer.conv_exec_to_ohlc(executions, str(self.ohlc_timeframe_sec) + 's')  # type: pd.DataFrame
-
-        # Nan値は直前の値に置換する
-        self.ohlc = self.ohlc.fillna(method='ffill')
+        # 全約定履歴に対応するローソク足（Nan値は直前の値に置換済み）
+        self.ohlc = self.bar_cache.get(str(self.ohlc_timeframe_sec) + 's')  # type: pd.DataFrame
         print(f"Create {len(self.ohlc)} OHLC.")
 
         # Bollinger Bandを作成
-        self.upp2, self.mid2, self.low2 = talib.BBANDS(
-            self.ohlc['price']['close'], timeperiod=self.timeperiod, matype=talib.MA_Type.SMA, nbdevup=2, nbdevdn=2)
-        self.upp3, self.mid3, self.low3 = talib.BBANDS(
-            self.ohlc['price']['close'], timeperiod=self.timeperiod, matype=talib.MA_Type.SMA, nbdevup=3, nbdevdn=3)
+        self.indicators = self.create_indicator_store(self.ohlc, str(self.ohlc_timeframe_sec) + 's')
+        self.indicators.register('bb2', bbands, timeperiod=self.timeperiod, nbdev=2)
+        self.indicators.register('bb3', bbands, timeperiod=self.timeperiod, nbdev=3)
 
     def think(self,
               trade_num: int,
@@ -50,26 +53,27 @@ class DoubleBollingerBand(Strategy):
 
         new_orders = []  # type: List[Order]
 
-        t = self.ohlc[self.ohlc.index < dt]
-        if len(t) < self.timeperiod:
+        if self.indicators.advance(dt) + 1 < self.timeperiod:
             return []
 
-        ltp = t.tail(1)['price']['close'].values[0]
+        ltp = self.indicators.bar(('price', 'close'))
         buy_pos = [d(p.open_amount) for p in positions if p.side == 'BUY']
         sell_pos = [d(p.open_amount) for p in positions if p.side == 'SELL']
         buy_pos_size = round(float(sum(buy_pos)), 8) if buy_pos else 0.0
         sell_pos_size = round(float(sum(sell_pos)), 8) if sell_pos else 0.0
-        recv_delay = float(t.tail(1)['delay'].values[0])
+        recv_delay = float(self.indicators.bar(('delay', 'delay')))
         # if recv_delay >= 1.5:
         #     return []
-        c1 = t['price']['close'][-1]
+        c1 = ltp
+        upp2, mid2, low2 = self.indicators.get('bb2')
+        upp3, mid3, low3 = self.indicators.get('bb3')
 
         size = 0.15
         sign = None
 
         # Open long position
-        if self.low3[trade_num - 1] <= c1 <= self.low2[trade_num - 1]:
-            # if c1 < self.mid2[trade_num]:
+        if low3 <= c1 <= low2:
+            # if c1 < mid2:
             if buy_pos_size < float(self.user_config['pos_limit_size']):
                 sign = 'buy'
                 new_orders.append(Order(id=self.next_order_id, created_at=dt,
@@ -80,8 +84,8 @@ class DoubleBollingerBand(Strategy):
                                         delay_sec=self.order_delay_sec,
                                         expire_sec=self.order_expire_sec))
 
-        elif self.upp2[trade_num - 1] <= c1 <= self.upp3[trade_num - 1]:
-            # elif c1 > self.mid2[trade_num]:
+        elif upp2 <= c1 <= upp3:
+            # elif c1 > mid2:
             if sell_pos_size < float(self.user_config['pos_limit_size']):
                 sign = 'sell'
                 new_orders.append(Order(id=self.next_order_id, created_at=dt,
@@ -92,6 +96,6 @@ class DoubleBollingerBand(Strategy):
                                         delay_sec=self.order_delay_sec,
                                         expire_sec=self.order_expire_sec))
 
-        print(f"No. {trade_num}  time={dt}, ohlc={t.tail(1).index.values[0]}, c1={c1}, sign={sign}, up2={self.upp2[trade_num]} up3={self.upp3[trade_num]}, lo2={self.low2[trade_num]}, lo3={self.low3[trade_num]}")
+        print(f"No. {trade_num}  time={dt}, ohlc={self.indicators.ohlc.index[self.indicators.pos]}, c1={c1}, sign={sign}, up2={upp2} up3={upp3}, lo2={low2}, lo3={low3}")
 
         return new_orders
@@ -6,9 +6,18 @@ from typing import List, Dict, Any
 import pandas as pd
 
 from baktlib.models import Order, Position
+from baktlib.bars import BarCache
+from baktlib.indicators import IndicatorStore
 from baktlib.strategy import Strategy
 
 
+def dev_rate(ohlc: pd.DataFrame, fast: int, slow: int, signal: int) -> pd.Series:
+    """MACDのヒストグラムのシグナルに対する乖離率"""
+    macd = ohlc['price']['close'].ewm(span=fast).mean() - ohlc['price']['close'].ewm(span=slow).mean()
+    sig = macd.ewm(span=signal).mean()
+    return ((macd - sig) / sig).fillna(0)
+
+
 class Duck(Strategy):
     """
     Duck is trend follow strategy.
@@ -19,26 +28,15 @@ class Duck(Strategy):
     def __init__(self,
                  user_config: Dict[str, Any],
                  executions: pd.DataFrame,
-                 ohlc: pd.DataFrame):
-        super().__init__(user_config, executions)
+                 bar_cache: BarCache = None):
+        super().__init__(user_config, executions, bar_cache)
         self.order_delay_sec = float(self.user_config['order_delay_sec'])
         self.order_expire_sec = float(self.user_config['order_expire_sec'])
         self.order_size = float(self.user_config['order_size'])
         self.pos_limit_size = float(self.user_config['pos_limit_size'])
-        self.ohlc = ohlc
-        
-        sema = self.ohlc['close'].ewm(span=6).mean()
-        lema = self.ohlc['close'].ewm(span=19).mean()
-        macd = sema - lema
-        signal = macd.ewm(span=9).mean()
-        histgram = macd - signal
-        self.dev_rate = (histgram / signal).fillna(0)
-        print('--- histgram ---')
-        print(histgram.tail(10))
-        print('--- signal ---')
-        print(signal.tail(10))
-        print('--- dev_rate ---')
-        print(self.dev_rate.tail(10))
+        self.ohlc = self.bar_cache.get(self.user_config['ohlc_rule'])
+        self.indicators = self.create_indicator_store(self.ohlc, self.user_config['ohlc_rule'])  # type: IndicatorStore
+        self.indicators.register('dev_rate', dev_rate, fast=6, slow=19, signal=9)
 
     def think(self,
               trade_num: int,
@@ -52,15 +50,14 @@ class Duck(Strategy):
               best_ask_price=None,
               best_bid_price=None) -> List[Order]:
 
-        t = self.ohlc[self.ohlc.index < dt]
-        if len(t) < 2:
+        if self.indicators.advance(dt) < 1:
             return []
 
-        ltp = t.tail(1)['close'].values[0]
+        ltp = self.indicators.bar(('price', 'close'))
         size = self.order_size
         new_orders = []  # type: List[Order]
-        cur = self.dev_rate[trade_num]
-        prv = self.dev_rate[trade_num - 1]
+        cur = self.indicators.get('dev_rate')
+        prv = self.indicators.get('dev_rate', back=1)
         # print(f'cur={cur}, prv={prv}')
         
         if cur > 0:
@@ -6,16 +6,18 @@ from typing import List, Dict, Any
 import pandas as pd
 
 from baktlib.constants import *
-from baktlib import bitflyer
 from baktlib.calc import d
 from baktlib.models import Order, Position
+from baktlib.bars import BarCache
 from baktlib.strategy import Strategy
 
 
 class MarketMaker(Strategy):
 
-    def __init__(self, user_config: Dict[str, Any], executions):
-        super().__init__(user_config, executions)
+    def __init__(self, user_config: Dict[str, Any], executions, bar_cache: BarCache = None):
+        super().__init__(user_config, executions, bar_cache)
+        self.bars = self.add_rolling_bars('1s', 10)
+        """直近10本の1秒足"""
 
     def think(self,
               trade_num: int,
@@ -35,12 +37,13 @@ class MarketMaker(Strategy):
         :return: 新規発行する注文のリスト
         """
 
-        executions = self.executions[self.executions['exec_date'] < dt]
-        if executions.empty:
+        # 約定履歴を1秒ごとにグルーピングした直近の10本
+        t = self.bars.frame()  # type: pd.DataFrame
+        if t.empty:
             return []
 
         new_orders = []  # type: List[Order]
-        ltp = float(executions.tail(1).iat[0, 3])  # type: float
+        ltp = float(t['price']['close'].values[-1])  # type: float
         buy_pos = [d(p.open_amount) for p in positions if p.side == 'BUY']
         sell_pos = [d(p.open_amount) for p in positions if p.side == 'SELL']
         buy_pos_size = round(float(sum(buy_pos)), 8) if buy_pos else 0.0
@@ -50,8 +53,7 @@ class MarketMaker(Strategy):
         # recv_delay = float(executions.at[len(executions) - 1, 'delay'])
         recv_delay = 0
 
-        # 約定履歴を1秒ごとにグルーピング、一定期間分遡ったボリューム差を合算する
-        t = bitflyer.conv_exec_to_ohlc(executions, str(1) + 's').tail(10)  # type: pd.DataFrame
+        # 一定期間分遡ったボリューム差を合算する
         size_diff = t['buy_size']['buy_size'] - t['sell_size']['sell_size']
         ls_diff_sum_5 = size_diff.rolling(5, min_periods=5).sum().fillna(0)  # type: pd.Series
         v1 = ls_diff_sum_5.values[-1]
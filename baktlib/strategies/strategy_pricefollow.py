@@ -6,9 +6,9 @@ from typing import List, Dict, Any
 import pandas as pd
 
 from baktlib.constants import *
-from baktlib import bitflyer
 from baktlib.calc import d
 from baktlib.models import Order, Position
+from baktlib.bars import BarCache
 from baktlib.strategy import Strategy
 
 
@@ -16,13 +16,13 @@ class PriceFollow(Strategy):
 
     def __init__(self,
                  user_config: Dict[str, Any],
-                 executions: pd.DataFrame):
-        super().__init__(user_config, executions)
+                 executions: pd.DataFrame,
+                 bar_cache: BarCache = None):
+        super().__init__(user_config, executions, bar_cache)
         self.order_delay_sec = float(self.user_config['order_delay_sec'])
         self.order_expire_sec = float(self.user_config['order_expire_sec'])
-        self.ohlc = bitflyer.conv_exec_to_ohlc(executions, str(2) + 's')  # type: pd.DataFrame
-        self.ohlc['lsdiff'] = self.ohlc['buy_size']['buy_size'] - self.ohlc['sell_size']['sell_size']
-        print(f"Create {len(self.ohlc)} OHLC.")
+        self.bars = self.add_rolling_bars('2s', 6)
+        """直近6本の2秒足"""
 
     def think(self,
               trade_num: int,
@@ -34,7 +34,7 @@ class PriceFollow(Strategy):
 
         new_orders = []  # type: List[Order]
 
-        t = self.ohlc[self.ohlc.index < dt]
+        t = self.bars.frame()  # type: pd.DataFrame
         if len(t) < 2:
             return []
 
@@ -46,7 +46,8 @@ class PriceFollow(Strategy):
         recv_delay = float(t.tail(1)['delay'].values[0])
         # recv_delay = 0
 
-        lsdiff = t['lsdiff'].rolling(5, min_periods=5).sum().fillna(0)  # type: pd.Series
+        lsdiff = (t['buy_size']['buy_size'] - t['sell_size']['sell_size']) \
+            .rolling(5, min_periods=5).sum().fillna(0)  # type: pd.Series
         v1 = lsdiff.values[-1]
         v2 = lsdiff.values[-2]
         print(f"No. {trade_num}  time={dt}, ohlc={t.tail(1).index.values[0]}, v1={v1}, v2={v2}")
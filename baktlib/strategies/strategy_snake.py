@@ -6,9 +6,26 @@ from typing import List, Dict, Any
 import pandas as pd
 
 from baktlib.models import Order, Position
+from baktlib.bars import BarCache
+from baktlib.indicators import IndicatorStore
 from baktlib.strategy import Strategy
 
 
+def close_mean(ohlc: pd.DataFrame, w: int) -> pd.Series:
+    """期間ごとの平均価格"""
+    return ohlc['price']['close'].rolling(w, min_periods=1).mean()
+
+
+def close_stdev(ohlc: pd.DataFrame, w: int) -> pd.Series:
+    """価格の標準偏差"""
+    return ohlc['price']['close'].rolling(w, min_periods=1).std()
+
+
+def close_z(ohlc: pd.DataFrame, w: int) -> pd.Series:
+    """価格のZスコア = 偏差（価格 - 母平均） / 標準偏差"""
+    return (ohlc['price']['close'] - close_mean(ohlc, w)) / close_stdev(ohlc, w)
+
+
 class Snake(Strategy):
     """
     価格の期間あたりのZスコアを算出して、異常値を検出したら逆張りでエントリーします。
@@ -17,19 +34,21 @@ class Snake(Strategy):
     def __init__(self,
                  user_config: Dict[str, Any],
                  executions: pd.DataFrame,
-                 ohlc: pd.DataFrame):
+                 bar_cache: BarCache = None):
 
-        super().__init__(user_config, None)
+        super().__init__(user_config, None, bar_cache)
 
-        self.ohlc = ohlc
+        self.ohlc = self.bar_cache.get(self.user_config['ohlc_rule'])
         """OHLC"""
 
         self.w = int(self.user_config['window'])
-        close = self.ohlc['price']['close']
-        self.ohlc['mean'] = close.rolling(self.w, min_periods=1).mean()
-        deviation = close - self.ohlc['mean']
-        self.stdev = close.rolling(self.w, min_periods=1).std()
-        self.price_z = deviation / self.stdev
+
+        self.indicators = self.create_indicator_store(self.ohlc, self.user_config['ohlc_rule'])  # type: IndicatorStore
+        """インジケーター（期間ごとの平均価格、価格の標準偏差、価格のZスコア）"""
+
+        self.indicators.register('mean', close_mean, w=self.w)
+        self.indicators.register('stdev', close_stdev, w=self.w)
+        self.indicators.register('price_z', close_z, w=self.w)
 
     def think(self,
               trade_num: int,
@@ -44,17 +63,17 @@ class Snake(Strategy):
               best_bid_price=None) -> List[Order]:
 
         new_orders = []  # type: List[Order]
-        index = trade_num - 1
-        if index >= len(self.ohlc):
+        if self.indicators.advance(dt) < 0:
             return []
 
         #
         # エントリー注文
         #
 
-        z_prv = self.price_z[index - 1]
-        z_cur = self.price_z[index] #* (self.w / (self.w - 1))
-        m = self.ohlc['mean'][index]
+        z_prv = self.indicators.get('price_z', back=1)
+        z_cur = self.indicators.get('price_z') #* (self.w / (self.w - 1))
+        m = self.indicators.get('mean')
+        stdev = self.indicators.get('stdev')
         pos_lim_size = float(self.user_config['pos_limit_size'])
 
         #
@@ -65,13 +84,13 @@ class Snake(Strategy):
         if long_pos_size > 0:
 
             if z_cur < -3.5:
-                disposal_range = abs(self.stdev[index] * k)  # type: float
+                disposal_range = abs(stdev * k)  # type: float
             elif z_cur < -3:
-                disposal_range = abs(self.stdev[index] * k)  # type: float
+                disposal_range = abs(stdev * k)  # type: float
             elif z_cur < -2.5:
-                disposal_range = abs(self.stdev[index] * k)  # type: float
+                disposal_range = abs(stdev * k)  # type: float
             else:
-                disposal_range = abs(self.stdev[index] * 0)  # type: float
+                disposal_range = abs(stdev * 0)  # type: float
 
             new_orders.append(self.sell(t=dt, size=long_pos_size, price=m - disposal_range))
             # return new_orders
@@ -81,18 +100,18 @@ class Snake(Strategy):
             # if sell_orders:
             #     order_size -= float(sum([Decimal(str(o.size)) for o in sell_orders]))
             # if order_size > 0:
-            #     new_orders.append(self.sell(t=dt, size=order_size, price=self.ohlc['mean'][index] - disposal_range))
+            #     new_orders.append(self.sell(t=dt, size=order_size, price=m - disposal_range))
 
         elif short_pos_size > 0:
 
             if z_cur > 3.5:
-                disposal_range = abs(self.stdev[index] * k)  # type: float
+                disposal_range = abs(stdev * k)  # type: float
             elif z_cur > 3:
-                disposal_range = abs(self.stdev[index] * k)  # type: float
+                disposal_range = abs(stdev * k)  # type: float
             elif z_cur > 2.5:
-                disposal_range = abs(self.stdev[index] * k)  # type: float
+                disposal_range = abs(stdev * k)  # type: float
             else:
-                disposal_range = abs(self.stdev[index] * 0)  # type: float
+                disposal_range = abs(stdev * 0)  # type: float
 
             new_orders.append(self.buy(t=dt, size=short_pos_size, price=m + disposal_range))
             # return new_orders
@@ -101,7 +120,7 @@ class Snake(Strategy):
             # if buy_orders:
             #     order_size -= float(sum([Decimal(str(o.size)) for o in buy_orders]))
             # if order_size > 0:
-            #     new_orders.append(self.buy(t=dt, size=order_size, price=self.ohlc['mean'][index] + disposal_range))
+            #     new_orders.append(self.buy(t=dt, size=order_size, price=m + disposal_range))
 
         k = 1.5
         z_outside = 3
@@ -109,10 +128,10 @@ class Snake(Strategy):
 
         # 逆張りで買い
         if -z_outside < z_cur <= -z_inside and long_pos_size < pos_lim_size:
-            new_orders.append(self.buy(t=dt, size=self.order_size, price=m - abs(self.stdev[index] * (z_cur * k))))
+            new_orders.append(self.buy(t=dt, size=self.order_size, price=m - abs(stdev * (z_cur * k))))
 
         # 逆張りで売り
         if z_inside <= z_cur < z_outside and short_pos_size < pos_lim_size:
-            new_orders.append(self.sell(t=dt, size=self.order_size, price=m + abs(self.stdev[index] * (z_cur * k))))
+            new_orders.append(self.sell(t=dt, size=self.order_size, price=m + abs(stdev * (z_cur * k))))
 
         return new_orders
@@ -7,25 +7,47 @@ import pandas as pd
 import talib
 
 from baktlib.models import Order, Position
+from baktlib.bars import BarCache
+from baktlib.indicators import IndicatorStore
 from baktlib.strategy import Strategy
 
 
+def close_ema(ohlc: pd.DataFrame, timeperiod: int):
+    """終値の指数移動平均"""
+    return talib.EMA(ohlc['price']['close'].values, timeperiod=timeperiod)
+
+
+def close_macd(ohlc: pd.DataFrame, fastperiod: int, slowperiod: int, signalperiod: int):
+    """終値のMACD（MACD、シグナル、ヒストグラム）"""
+    return talib.MACD(ohlc['price']['close'].values,
+                      fastperiod=fastperiod, slowperiod=slowperiod, signalperiod=signalperiod)
+
+
 class TripleMACD(Strategy):
+    """
+    短期（6, 19, 9）と中期（12, 26, 9）のMACDのクロスでエントリー・決済します。
+
+    シグナルは、thinkの呼び出し時点までに確定した最後の時間足と、その1本前の時間足の値から判定し、
+    注文価格は確定した最後の時間足の終値とします。
+    以前は時間枠の番号（trade_num）で系列を参照していたため、形成中の時間足の値を参照し、
+    時間枠と時間足の長さが異なる場合は別の時刻の時間足を参照していました。
+    そのため、以前とはシグナルが出る時刻と注文価格が異なります。
+    """
 
     def __init__(self,
                  user_config: Dict[str, Any],
                  executions: pd.DataFrame,
-                 ohlc: pd.DataFrame):
-        super().__init__(user_config, executions)
+                 bar_cache: BarCache = None):
+        super().__init__(user_config, executions, bar_cache)
         self.order_delay_sec = float(self.user_config['order_delay_sec'])
         self.order_expire_sec = float(self.user_config['order_expire_sec'])
         self.order_size = float(self.user_config['order_size'])
         self.pos_limit_size = float(self.user_config['pos_limit_size'])
-        self.ohlc = ohlc
-        self.ema = talib.EMA(ohlc['close'], timeperiod=50)
-        self.fastMACD = talib.MACD(ohlc['close'], fastperiod=6, slowperiod=19, signalperiod=9)
-        self.middleMACD = talib.MACD(ohlc['close'], fastperiod=12, slowperiod=26, signalperiod=9)
-        pd.options.display.max_rows = 1000
+        self.ohlc = self.bar_cache.get(self.user_config['ohlc_rule'])
+        self.indicators = self.create_indicator_store(self.ohlc, self.user_config['ohlc_rule'])  # type: IndicatorStore
+        self.indicators.register('ema', close_ema, timeperiod=50)
+        self.indicators.register('fast_macd', close_macd, fastperiod=6, slowperiod=19, signalperiod=9)
+        self.indicators.register('middle_macd', close_macd, fastperiod=12, slowperiod=26, signalperiod=9)
 
     def think(self,
               trade_num: int,
@@ -39,36 +61,36 @@ class TripleMACD(Strategy):
               best_ask_price=None,
               best_bid_price=None) -> List[Order]:
 
-        t = self.ohlc[self.ohlc.index < dt]
-        if len(t) < 2:
+        if self.indicators.advance(dt) < 1:
             return []
 
-        ltp = t.tail(1)['close'].values[0]
-        fmacd = self.fastMACD[0]
-        fsignal = self.fastMACD[1]
-        mmacd = self.middleMACD[0]
-        msignal = self.middleMACD[1]
+        ltp = self.indicators.bar(('price', 'close'))
+        fmacd, fsignal, _ = self.indicators.get('fast_macd')
+        fmacd_prv, fsignal_prv, _ = self.indicators.get('fast_macd', back=1)
+        mmacd, msignal, _ = self.indicators.get('middle_macd')
+        mmacd_prv, msignal_prv, _ = self.indicators.get('middle_macd', back=1)
+        ema = self.indicators.get('ema')
         size = self.order_size
 
-        if not (fmacd[trade_num - 1] and fmacd[trade_num] and fsignal[trade_num] and fsignal[trade_num - 1]):
+        if not (fmacd_prv and fmacd and fsignal and fsignal_prv):
             return []
 
-        is_gc_fst = fmacd[trade_num] > fsignal[trade_num] and fmacd[trade_num - 1] <= fsignal[trade_num - 1]
-        is_dc_fst = fmacd[trade_num] < fsignal[trade_num] and fmacd[trade_num - 1] >= fsignal[trade_num - 1]
-        is_gc_mdl = mmacd[trade_num] > msignal[trade_num] and mmacd[trade_num - 1] <= msignal[trade_num - 1]
-        is_dc_mdl = mmacd[trade_num] < msignal[trade_num] and mmacd[trade_num - 1] >= msignal[trade_num - 1]
+        is_gc_fst = fmacd > fsignal and fmacd_prv <= fsignal_prv
+        is_dc_fst = fmacd < fsignal and fmacd_prv >= fsignal_prv
+        is_gc_mdl = mmacd > msignal and mmacd_prv <= msignal_prv
+        is_dc_mdl = mmacd < msignal and mmacd_prv >= msignal_prv
 
         new_orders = []  # type: List[Order]
         
-        x = fmacd[trade_num] - fsignal[trade_num]
-        print(f'x={x}, per={round(x / fsignal[trade_num], 3)}')
+        x = fmacd - fsignal
+        print(f'x={x}, per={round(x / fsignal, 3)}')
         
         # buy entry
-        if self.ema[trade_num] > 0 and (is_gc_fst or is_gc_mdl) and long_pos_size < self.pos_limit_size:
+        if ema > 0 and (is_gc_fst or is_gc_mdl) and long_pos_size < self.pos_limit_size:
             new_orders.append(self.buy(t=dt, size=size + short_pos_size, price=ltp))
             
         # sell entry
-        elif self.ema[trade_num] < 0 and (is_dc_fst or is_dc_mdl) and short_pos_size < self.pos_limit_size:
+        elif ema < 0 and (is_dc_fst or is_dc_mdl) and short_pos_size < self.pos_limit_size:
             new_orders.append(self.sell(t=dt, size=size + long_pos_size, price=ltp))
         
         # sell for close
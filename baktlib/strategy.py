@@ -2,21 +2,42 @@
 
 from datetime import datetime
 from logging import getLogger
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Tuple
 
 import pandas as pd
 
-from baktlib.constants import ORDER_TYPE_LIMIT, Side
+from baktlib.bars import BarCache, RollingBars
+from baktlib.book import OrderBook
+from baktlib.constants import ORDER_TYPE_LIMIT, ORDER_TYPE_MARKET, CLOCK_TIMEFRAME, CLOCK_EVENT, Side
+from baktlib.datautil import BoardIndex
+from baktlib.indicators import IndicatorStore
 from baktlib.models import Order
 
 
 class Strategy(object):
 
-    def __init__(self, user_config: Dict[str, Any], executions: pd.DataFrame):
+    def __init__(self, user_config: Dict[str, Any], executions: pd.DataFrame, bar_cache: BarCache = None):
         self.user_config = user_config  # type: Dict[str, Any]
         self.__order_id = 0
         self._logger = getLogger(__name__)
         self.executions = executions  # type: pd.DataFrame
+        """約定履歴（--mmap指定時はdatautil.ExecutionStore、--stream指定時はdatautil.ExecutionStream）"""
+
+        if bar_cache is None:
+            bar_cache = BarCache()
+            if executions is not None:
+                bar_cache.add_source('', executions)
+        self.bar_cache = bar_cache  # type: BarCache
+        """OHLCのキャッシュ（バックテスト実行時はエンジンと全てのストラテジーで共有されます）"""
+
+        self.boards = None  # type: BoardIndex
+        """板情報の索引（バックテスト実行時に設定されます。--stream指定時はdatautil.BoardStream）"""
+
+        self.book = None  # type: OrderBook
+        """L2の板情報を再生した板（--depth指定時にバックテスト実行時に設定され、thinkの呼び出し時点まで再生されます）"""
+
+        self.clock = CLOCK_TIMEFRAME  # type: str
+        """バックテストの時刻の進め方（バックテスト実行時に設定されます）"""
 
         self.order_delay_sec = float(self.user_config['order_delay_sec'])
         """注文遅延時間"""
@@ -27,11 +48,105 @@ class Strategy(object):
         self.order_size = float(self.user_config['order_size'])
         """注文サイズ"""
 
+        self.__rolling_bars = []  # type: List[RollingBars]
+        """約定履歴を受け取るたびに更新するOHLCのバッファ"""
+
+        self.__timers = []  # type: List[datetime]
+        """ストラテジーを起動する日時（clock = eventの場合のみ使用されます）"""
+
+        self.skip_empty = str(self.user_config.get('skip_empty', 'false')).lower() == 'true'  # type: bool
+        """約定のない時間枠でthinkを呼び出さない場合True（約定のない時間枠が続く期間はまとめて進めます）
+
+        設定ファイルの[user] skip_emptyで指定します（省略時はFalse）。
+        約定履歴が届いた場合のみ判断を変えるストラテジーでは、Trueにしても結果は変わりません。
+        """
+
+        self.__sleep = None  # type: Tuple[datetime, float, float]
+        """thinkの呼び出しを休止する条件（再開する日時、再開する価格の下限、再開する価格の上限）"""
+
     @property
     def next_order_id(self) -> int:
         self.__order_id += 1
         return self.__order_id
 
+    def add_rolling_bars(self, rule: str, size: int) -> RollingBars:
+        """直近の一定数の時間足を保持するOHLCのバッファを作成します。
+        作成したバッファは、バックテスト実行時に時間枠ごとの約定履歴で更新されます。
+        :param rule: 時間足
+        :param size: 保持する時間足の数
+        :return: OHLCのバッファ
+        """
+        bars = RollingBars(rule, size)
+        self.__rolling_bars.append(bars)
+        return bars
+
+    def create_indicator_store(self, ohlc: pd.DataFrame, rule: str) -> IndicatorStore:
+        """OHLCに対するインジケーターのストアを作成します。
+        計算したインジケーターは、約定履歴のキャッシュディレクトリがあればそこに保存されます。
+        --stream指定時は、約定履歴のチャンクを読み込むたびにOHLCを作成し直してインジケーターを再計算します。
+        :param ohlc: OHLC
+        :param rule: OHLCの時間足
+        :return: インジケーターのストア
+        """
+        return IndicatorStore(ohlc, rule, cache_dir=self.bar_cache.cache_dir(), builder=self.bar_cache.builder(rule))
+
+    def set_timer(self, t: datetime) -> None:
+        """指定日時にストラテジーを起動するタイマーを設定します。
+        clock = eventの場合のみ有効で、約定等のイベントがなくても指定日時にthinkが呼び出されます。
+        タイマーはclock = eventの場合のみエンジンが取り出すため、それ以外の場合は記録しません。
+        :param t: 起動する日時
+        """
+        if self.clock == CLOCK_EVENT:
+            self.__timers.append(t)
+
+    def pop_timers(self) -> List[datetime]:
+        """設定されたタイマーを取り出します（バックテスト実行時に、thinkの後にエンジンから呼び出されます）。
+        :return: 起動する日時のリスト
+        """
+        timers, self.__timers = self.__timers, []
+        return timers
+
+    def sleep(self, until: datetime = None, below: float = None, above: float = None) -> None:
+        """指定した日時になるか、最終約定価格が指定した価格に達するまで、thinkの呼び出しを休止します。
+        休止中も約定判定と注文の有効期限の判定は行われ、約定のない時間枠が続く期間はまとめて進めます。
+        clock = eventの場合は、再開する日時にタイマーを設定します。
+        :param until: 再開する日時
+        :param below: 最終約定価格がこの価格以下になったら再開する
+        :param above: 最終約定価格がこの価格以上になったら再開する
+        """
+        if until is None and below is None and above is None:
+            raise ValueError('Either until, below or above must be specified.')
+        self.__sleep = (until, below, above)
+        if until is not None:
+            self.set_timer(until)
+
+    @property
+    def sleeping_until(self) -> datetime:
+        """休止を再開する日時（休止していない場合、または価格のみを条件に休止している場合はNone）"""
+        return self.__sleep[0] if self.__sleep else None
+
+    def is_sleeping(self, now: datetime, ltp: float) -> bool:
+        """thinkの呼び出しを休止中かどうかを返します（再開の条件を満たした場合は休止を解除します）。
+        :param now: 現在日時
+        :param ltp: 最終約定価格
+        :return: 休止中の場合True
+        """
+        if self.__sleep is None:
+            return False
+        until, below, above = self.__sleep
+        if (until is not None and now >= until) or (ltp is not None and (
+                (below is not None and ltp <= below) or (above is not None and ltp >= above))):
+            self.__sleep = None
+            return False
+        return True
+
+    def on_executions(self, executions: pd.DataFrame) -> None:
+        """時間枠内の約定履歴を受け取ります（バックテスト実行時に、thinkの前に時間枠ごとに呼び出されます）。
+        :param executions: exec_dateをインデックスとする時間枠内の約定履歴
+        """
+        for bars in self.__rolling_bars:
+            bars.add_frame(executions)
+
     def think(self,
               trade_num: int,
               dt: datetime,
@@ -51,3 +166,13 @@ class Strategy(object):
         return Order(id=self.next_order_id, created_at=t, side=Side.SELL,
                      _type=ORDER_TYPE_LIMIT, size=size, price=price,
                      delay_sec=self.order_delay_sec, expire_sec=self.order_expire_sec)
+
+    def buy_market(self, t: datetime, size: float) -> Order:
+        """成行の買い注文を作成します（--depth指定時は、板に乗る時刻の売り気配を食って約定します）。"""
+        return Order(id=self.next_order_id, created_at=t, side=Side.BUY,
+                     _type=ORDER_TYPE_MARKET, size=size, delay_sec=self.order_delay_sec)
+
+    def sell_market(self, t: datetime, size: float) -> Order:
+        """成行の売り注文を作成します（--depth指定時は、板に乗る時刻の買い気配を食って約定します）。"""
+        return Order(id=self.next_order_id, created_at=t, side=Side.SELL,
+                     _type=ORDER_TYPE_MARKET, size=size, delay_sec=self.order_delay_sec)
@@ -0,0 +1,123 @@
+# coding: utf-8
+
+import itertools
+from typing import List, Dict, Any, Tuple, Union
+
+import numpy as np
+
+from baktlib.config import Config
+
+ParamSpec = Union[List[str], Tuple[float, float]]
+"""パラメーターの指定（値のリスト、または数値の範囲（下限, 上限）。範囲の両端が整数の場合は整数を抽出します）"""
+
+
+def parse_param(text: str) -> Tuple[str, ParamSpec]:
+    """パラメーターの指定を解析します。
+    "name=v1,v2,v3"は値のリスト、"name=lo:hi"は数値の範囲（ランダムサンプリング時のみ）として解析します。
+    :param text: パラメーターの指定
+    :return: パラメーター名と指定
+    """
+    if '=' not in text:
+        raise ValueError(f"Parameter must be 'name=v1,v2,...' or 'name=lo:hi'. [{text}]")
+    name, values = text.split('=', 1)
+    name = name.strip()
+    if ':' in values and ',' not in values:
+        lo, hi = [int(v) if v.strip().lstrip('-').isdigit() else float(v) for v in values.split(':', 1)]
+        return name, (lo, hi)
+    return name, [v.strip() for v in values.split(',')]
+
+
+def grid(params: Dict[str, ParamSpec]) -> List[Dict[str, str]]:
+    """全てのパラメーターの値の組み合わせを返します。
+    :param params: パラメーター名ごとの値のリスト
+    :return: パラメーターの組み合わせのリスト
+    """
+    for name, spec in params.items():
+        if isinstance(spec, tuple):
+            raise ValueError(f"Grid search requires a list of values. [{name}]")
+    names = list(params)
+    return [dict(zip(names, values)) for values in itertools.product(*[params[n] for n in names])]
+
+
+def random_sample(params: Dict[str, ParamSpec], n: int, seed: int = None) -> List[Dict[str, str]]:
+    """パラメーターの組み合わせを無作為にn件抽出します。
+    :param params: パラメーター名ごとの値のリストまたは数値の範囲
+    :param n: 抽出する件数
+    :param seed: 乱数のシード
+    :return: パラメーターの組み合わせのリスト
+    """
+    rs = np.random.RandomState(seed)
+    return _combine(params, {name: rs.uniform(size=n) for name in params}, n)
+
+
+def latin_hypercube(params: Dict[str, ParamSpec], n: int, seed: int = None) -> List[Dict[str, str]]:
+    """パラメーターの組み合わせをラテン超方格法でn件抽出します。
+    各パラメーターの範囲をn等分し、それぞれの区間から1件ずつ値を抽出します。
+    :param params: パラメーター名ごとの値のリストまたは数値の範囲
+    :param n: 抽出する件数
+    :param seed: 乱数のシード
+    :return: パラメーターの組み合わせのリスト
+    """
+    rs = np.random.RandomState(seed)
+    return _combine(params, {name: (rs.permutation(n) + rs.uniform(size=n)) / n for name in params}, n)
+
+
+def combinations(params: Dict[str, ParamSpec], sample: str = 'grid', n: int = 100,
+                 seed: int = None) -> List[Dict[str, str]]:
+    """指定した方法でパラメーターの組み合わせを作成します。
+    :param params: パラメーター名ごとの値のリストまたは数値の範囲
+    :param sample: 組み合わせの作成方法（grid, random, lhs）
+    :param n: 抽出する件数（random, lhsの場合）
+    :param seed: 乱数のシード
+    :return: パラメーターの組み合わせのリスト
+    """
+    if sample == 'grid':
+        return grid(params)
+    if sample == 'random':
+        return random_sample(params, n, seed=seed)
+    if sample == 'lhs':
+        return latin_hypercube(params, n, seed=seed)
+    raise ValueError(f"Unknown sampling method. [{sample}]")
+
+
+def _combine(params: Dict[str, ParamSpec], u: Dict[str, np.ndarray], n: int) -> List[Dict[str, str]]:
+    """[0, 1)の一様な値をパラメーターの値に変換して、組み合わせのリストを作成します。"""
+    return [{name: _pick(spec, u[name][i]) for name, spec in params.items()} for i in range(n)]
+
+
+def _pick(spec: ParamSpec, u: float) -> str:
+    """[0, 1)の値に対応するパラメーターの値を返します。"""
+    if isinstance(spec, tuple):
+        lo, hi = spec
+        if isinstance(lo, int) and isinstance(hi, int):
+            return str(int(lo + np.floor(u * (hi - lo + 1))))
+        return str(lo + u * (hi - lo))
+    return spec[min(int(u * len(spec)), len(spec) - 1)]
+
+
+def create_config(path: str, params: Dict[str, str]) -> Config:
+    """設定ファイルの[user]セクションをパラメーターで上書きした設定を作成します。
+    :param path: 設定ファイルのパス
+    :param params: パラメーターの組み合わせ
+    :return: 設定
+    """
+    conf = Config(path)
+    for k, v in params.items():
+        if k not in conf.user:
+            raise KeyError(f"Parameter is not in [user] section. [{k}]")
+        conf.user[k] = v
+    return conf
+
+
+def summarize(params: Dict[str, str], result: Dict[str, Any]) -> Dict[str, Any]:
+    """パラメーターとバックテスト結果のうち、スカラー値の項目を1行にまとめます。
+    :param params: パラメーターの組み合わせ
+    :param result: バックテスト結果
+    :return: 結果の行
+    """
+    row = dict(params)
+    for k, v in result.items():
+        if k in ('datetime', 'duration') or not np.isscalar(v):
+            continue
+        row[k] = v.item() if isinstance(v, np.generic) else v
+    return row
@@ -0,0 +1,117 @@
+# coding: utf-8
+
+from datetime import datetime, timedelta
+from typing import List, Dict, Any, Tuple
+
+import numpy as np
+
+from baktlib.datautil import to_ns
+
+SLICEABLE = ('total_pnl', 'max_drawdown')  # type: Tuple[str, ...]
+"""全期間のバックテスト結果の時間枠ごとの記録から、学習期間の値を切り出せる評価値"""
+
+MINIMIZE = ('max_drawdown',)  # type: Tuple[str, ...]
+"""値が小さいほど良い評価値（最大ドローダウンは正の値で記録します）"""
+
+
+class Window(object):
+    """ウォークフォワード分析の1区間（学習期間と、その直後の検証期間）"""
+
+    def __init__(self, no: int, train_from: datetime, train_to: datetime, test_from: datetime, test_to: datetime):
+        self.no = no  # type: int
+        """区間の番号"""
+
+        self.train_from = train_from  # type: datetime
+        """学習期間の開始日時"""
+
+        self.train_to = train_to  # type: datetime
+        """学習期間の終了日時"""
+
+        self.test_from = test_from  # type: datetime
+        """検証期間の開始日時"""
+
+        self.test_to = test_to  # type: datetime
+        """検証期間の終了日時"""
+
+    def __repr__(self) -> str:
+        return f"Window(no={self.no}, train=[{self.train_from}, {self.train_to}), " \
+               f"test=[{self.test_from}, {self.test_to}))"
+
+
+def windows(start: datetime, end: datetime, train: timedelta, test: timedelta,
+            step: timedelta = None) -> List[Window]:
+    """学習期間と検証期間を一定の間隔でずらしながら、ウォークフォワード分析の区間を作成します。
+    最後の検証期間はendで打ち切ります。
+    :param start: 最初の学習期間の開始日時
+    :param end: データの終了日時
+    :param train: 学習期間の長さ
+    :param test: 検証期間の長さ
+    :param step: 区間をずらす間隔（省略時は検証期間の長さ。検証期間が重ならず連続します）
+    :return: 区間のリスト
+    """
+    step = step or test
+    if step <= timedelta(0) or train <= timedelta(0) or test <= timedelta(0):
+        raise ValueError('Train, test and step must be positive.')
+    result = []  # type: List[Window]
+    train_from = start
+    while train_from + train < end:
+        train_to = train_from + train
+        result.append(Window(len(result), train_from, train_to, train_to, min(train_to + test, end)))
+        train_from += step
+    return result
+
+
+def best(rows: List[Dict[str, Any]], objective: str) -> Dict[str, Any]:
+    """評価値が最良の結果を返します（評価値が同じ場合は先に実行した組み合わせを優先します）。
+    MINIMIZEの評価値は最小、それ以外の評価値は最大の結果を最良とします。
+    :param rows: パラメーターの組み合わせごとの結果の行
+    :param objective: 評価値とする項目（例: total_pnl）
+    :return: 評価値が最良の行
+    """
+    if not rows:
+        raise ValueError('No results to choose from.')
+    values = np.array([r.get(objective, np.nan) for r in rows], dtype='f8')
+    if np.isnan(values).all():
+        return rows[0]
+    return rows[int(np.nanargmin(values) if objective in MINIMIZE else np.nanargmax(values))]
+
+
+def slice_objective(result: Dict[str, Any], start: datetime, end: datetime, objective: str) -> float:
+    """全期間のバックテスト結果の時間枠ごとの確定損益から、期間内の評価値を求めます。
+    期間の開始時点の確定損益を基準とするため、開始時点で保有中のポジションの損益は決済した期間に含めます。
+    :param result: 全期間のバックテスト結果（time, realized_gainを含む）
+    :param start: 期間の開始日時
+    :param end: 期間の終了日時
+    :param objective: 評価値とする項目（SLICEABLEのいずれか）
+    :return: 評価値
+    """
+    times = np.asarray(result['time'], dtype='M8[ns]').view('i8')
+    pnl = np.asarray(result['realized_gain'], dtype='f8')
+    head = int(np.searchsorted(times, to_ns(start), side='right'))
+    tail = int(np.searchsorted(times, to_ns(end), side='right'))
+    curve = np.concatenate(([pnl[head - 1] if head else 0.0], pnl[head:tail]))
+    if objective == 'total_pnl':
+        return round(float(curve[-1] - curve[0]), 8)
+    if objective == 'max_drawdown':
+        return round(float((np.maximum.accumulate(curve) - curve).max()), 8)
+    raise ValueError(f"Objective cannot be sliced from the history. [{objective}]")
+
+
+def stitch(results: List[Dict[str, Any]]) -> Tuple[np.ndarray, np.ndarray]:
+    """検証期間ごとのバックテスト結果をつなげて、一続きの損益曲線を作成します。
+    各検証期間の損益（確定損益 + 評価損益）に、それ以前の検証期間の最終損益を加算します。
+    :param results: 時刻順の検証期間ごとのバックテスト結果
+    :return: 時刻の配列と損益の配列
+    """
+    times, equity = [], []
+    offset = 0.0
+    for r in results:
+        e = np.asarray(r['realized_gain'], dtype='f8') + np.asarray(r['unrealized_gain'], dtype='f8')
+        if not len(e):
+            continue
+        times.append(np.asarray(r['time']))
+        equity.append(e + offset)
+        offset += e[-1]
+    if not times:
+        return np.array([], dtype='M8[ns]'), np.array([], dtype='f8')
+    return np.concatenate(times), np.concatenate(equity)
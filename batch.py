@@ -0,0 +1,136 @@
+#! /usr/bin/env python3
+# coding: utf-8
+
+import csv
+import logging.config
+import multiprocessing
+import os.path
+import time
+from argparse import ArgumentParser
+from datetime import datetime
+from logging import getLogger
+from typing import List, Dict, Any, Tuple
+
+import numpy as np
+import pandas as pd
+
+import bakt
+from baktlib import batch, config, engine, sweep
+
+logger = getLogger(__name__)
+
+worker = None  # type: Tuple[config.Config, bool, bool, bool]
+"""ワーカーで全ての日に使用する設定と、入力データの読み込み方法（init_workerで設定します）"""
+
+
+def init_worker(conf: str, no_cache: bool, mmap: bool, stream: bool) -> None:
+    """ワーカーで全ての日に使用する設定と、入力データの読み込み方法を設定します。
+    ワーカープロセスではPoolのinitializerとして呼び出します。
+    :param conf: 設定ファイルのパス
+    :param no_cache: データファイルのキャッシュを使用しない場合True
+    :param mmap: 約定履歴をメモリマップで読み込む場合True
+    :param stream: 約定履歴と板情報を分割して読み込みながら実行する場合True
+    """
+    global worker
+    worker = (config.Config(conf), no_cache, mmap, stream)
+
+
+def run_day(pair: batch.TapePair) -> Tuple[str, Dict[str, Any], np.ndarray, str]:
+    """1日分の約定履歴と板情報についてバックテストを実行します。
+    エラーが発生した場合は、他の日の実行を続けるため、ログに出力してエラーの内容を返します。
+    :param pair: 約定履歴と板情報の組
+    :return: 日付、結果の行、時間枠ごとの確定損益の推移、エラーの内容（成功した場合はNone。失敗した場合は結果がNone）
+    """
+    conf, no_cache, mmap, stream = worker
+    try:
+        tape = engine.load_tape(pair.executions, pair.boards, conf.user['ohlc_rule'], use_cache=not no_cache,
+                                mmap=mmap, stream=stream)
+        result = engine.BacktestEngine(conf, tape).run()
+    except Exception as e:
+        logger.exception(f"Failed to backtest {pair.day}. [{pair.executions}, {pair.boards}]")
+        return pair.day, None, None, f"{type(e).__name__}: {e}"
+    return pair.day, sweep.summarize({'day': pair.day}, result), np.asarray(result['realized_gain']), None
+
+
+def main() -> None:
+    conf = config.Config(args.conf)
+    pairs = batch.find_tapes(args.tapes)  # type: List[batch.TapePair]
+    if not pairs:
+        raise ValueError(f"No pairs of executions and boards found. {args.tapes}")
+    logger.info(f"Backtest {len(pairs)} days. [from={pairs[0].day}, to={pairs[-1].day}, processes={args.processes}]")
+
+    # 処理時間の長い大きなファイルから順に割り当てて、最後に残るワーカープロセスの偏りを減らす
+    scheduled = sorted(pairs, key=lambda p: p.size, reverse=True)
+    results = {}  # type: Dict[str, Tuple[Dict[str, Any], np.ndarray]]
+    errors = {}  # type: Dict[str, str]
+    initargs = (args.conf, args.no_cache, args.mmap, args.stream)
+    pool = multiprocessing.get_context('fork').Pool(args.processes, initializer=init_worker, initargs=initargs) \
+        if args.processes > 1 else None
+    if pool is None:
+        init_worker(*initargs)
+    try:
+        for i, (day, row, realized, error) in enumerate(pool.imap_unordered(run_day, scheduled) if pool
+                                                        else map(run_day, scheduled), start=1):
+            if error is None:
+                results[day] = row, realized
+                logger.info(f"Finished {i}/{len(pairs)}. [day={day}, total_pnl={row.get('total_pnl')}]")
+            else:
+                errors[day] = error
+                logger.warning(f"Failed {i}/{len(pairs)}. [day={day}, error={error}]")
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+    if not results:
+        raise ValueError(f"All days failed. {errors}")
+
+    # 日付順に並べ直して、成功した日の結果を全期間の結果に集計する（失敗した日はエラーの内容のみ出力する）
+    rows = [results[p.day][0] for p in pairs if p.day in results]
+    total = batch.aggregate(rows, [results[p.day][1] for p in pairs if p.day in results])
+    total['day'] = 'total'
+    total['num_of_failed_days'] = len(errors)
+    out = [results[p.day][0] if p.day in results else {'day': p.day, 'error': errors[p.day]} for p in pairs]
+
+    dst = args.output or os.path.join(conf.report_dst_dir, f"batch_{datetime.now().strftime('%Y%m%d%H%M%S')}.csv")
+    with open(dst, 'w', newline='') as f:
+        fieldnames = list(rows[0]) + [k for k in total if k not in rows[0]] + (['error'] if errors else [])
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer.writeheader()
+        writer.writerows(out)
+        writer.writerow(total)
+    logger.info(f"Total: {total}")
+    if errors:
+        logger.warning(f"Failed {len(errors)} of {len(pairs)} days. {errors}")
+    logger.info(f"Wrote batch results. [{dst}]")
+
+
+if __name__ == '__main__':
+    try:
+        st = time.time()
+        pd.options.display.width = 300
+        logging.config.fileConfig('./logging.conf', disable_existing_loggers=False)
+
+        parser = ArgumentParser()
+        parser.add_argument('-c', '--conf', required=True, action='store', dest='conf', help='')
+        parser.add_argument('tapes', nargs='+',
+                            help="Directories or glob patterns of daily executions and boards files. "
+                                 "Files are paired by the date in their names, and files named '*board*' are boards.")
+        parser.add_argument('-j', '--processes', type=int, default=os.cpu_count(), dest='processes',
+                            help='Number of worker processes.')
+        parser.add_argument('-o', '--output', action='store', dest='output', help='Result CSV file.')
+        parser.add_argument('--no-cache', action='store_true', dest='no_cache',
+                            help='Do not read or create the binary cache of the data files.')
+        mode = parser.add_mutually_exclusive_group()
+        mode.add_argument('--mmap', action='store_true', dest='mmap',
+                          help='Read executions from a memory-mapped store instead of loading the whole file.')
+        mode.add_argument('--stream', action='store_true', dest='stream',
+                          help='Read executions and boards in chunks while the backtest runs.')
+        args = parser.parse_args()
+
+        bakt.raise_err_if_not_exists(args.conf)
+
+        main()
+        print(f"Time: {time.time() - st}")
+
+    except Exception as e:
+        logger.exception(e)
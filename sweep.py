@@ -0,0 +1,116 @@
+#! /usr/bin/env python3
+# coding: utf-8
+
+import csv
+import logging.config
+import multiprocessing
+import os.path
+import time
+from argparse import ArgumentParser
+from datetime import datetime
+from logging import getLogger
+from typing import List, Dict, Any, Tuple
+
+import pandas as pd
+
+import bakt
+from baktlib import engine, sweep
+
+logger = getLogger(__name__)
+
+worker = None  # type: Tuple[str, engine.Tape]
+"""ワーカーで全てのバックテストに使用する設定ファイルのパスと入力データ（init_workerで設定します）"""
+
+
+def init_worker(conf: str, tape: engine.Tape) -> None:
+    """ワーカーで全てのバックテストに使用する設定ファイルのパスと入力データを設定します。
+    ワーカープロセスではPoolのinitializerとして呼び出します（入力データはfork時に親プロセスから引き継ぎます）。
+    :param conf: 設定ファイルのパス
+    :param tape: 入力データ
+    """
+    global worker
+    worker = (conf, tape)
+
+
+def run_one(params: Dict[str, str]) -> Dict[str, Any]:
+    """パラメーターの組み合わせ1件についてバックテストを実行します。
+    :param params: パラメーターの組み合わせ
+    :return: 結果の行
+    """
+    conf, tape = worker
+    return sweep.summarize(params, engine.BacktestEngine(sweep.create_config(conf, params), tape).run())
+
+
+def main() -> None:
+    params = dict(sweep.parse_param(p) for p in args.params)
+    combinations = sweep.combinations(params, args.sample, args.num, seed=args.seed)  # type: List[Dict[str, str]]
+    logger.info(f"Sweep {len(combinations)} combinations. [sample={args.sample}, processes={args.processes}]")
+
+    # 入力データは一度だけ読み込み、全ての時間足のOHLCを作成してからワーカープロセスに引き継ぐ
+    base = sweep.create_config(args.conf, {})
+    tape = engine.load_tape(args.file, args.boards, base.user['ohlc_rule'], use_cache=not args.no_cache,
+                            mmap=args.mmap)
+    for rule in sorted({c.get('ohlc_rule', base.user['ohlc_rule']) for c in combinations}):
+        tape.bar_cache.get(rule, source=args.file)
+
+    dst = args.output or os.path.join(base.report_dst_dir, f"sweep_{datetime.now().strftime('%Y%m%d%H%M%S')}.csv")
+    with open(dst, 'w', newline='') as f:
+        writer = None
+        if args.processes > 1:
+            pool = multiprocessing.get_context('fork').Pool(args.processes, initializer=init_worker,
+                                                            initargs=(args.conf, tape))
+            rows = pool.imap(run_one, combinations)
+        else:
+            pool = None
+            init_worker(args.conf, tape)
+            rows = map(run_one, combinations)
+        try:
+            for i, row in enumerate(rows, start=1):
+                if writer is None:
+                    writer = csv.DictWriter(f, fieldnames=list(row))
+                    writer.writeheader()
+                writer.writerow(row)
+                f.flush()
+                logger.info(f"Finished {i}/{len(combinations)}. {row}")
+        finally:
+            if pool:
+                pool.close()
+                pool.join()
+    logger.info(f"Wrote sweep results. [{dst}]")
+
+
+if __name__ == '__main__':
+    try:
+        st = time.time()
+        pd.options.display.width = 300
+        logging.config.fileConfig('./logging.conf', disable_existing_loggers=False)
+
+        parser = ArgumentParser()
+        parser.add_argument('-c', '--conf', required=True, action='store', dest='conf', help='')
+        parser.add_argument('-f', '--file', required=True, action='store', dest='file', help='')
+        parser.add_argument('-b', '--boards', required=True, action='store', dest='boards', help='')
+        parser.add_argument('-p', '--param', required=True, action='append', dest='params',
+                            help="[user] setting to sweep: 'name=v1,v2,...' or 'name=lo:hi' (random/lhs only).")
+        parser.add_argument('-s', '--sample', choices=['grid', 'random', 'lhs'], default='grid', dest='sample',
+                            help='How to choose the combinations of the parameters.')
+        parser.add_argument('-n', '--num', type=int, default=100, dest='num',
+                            help='Number of combinations for random/lhs sampling.')
+        parser.add_argument('--seed', type=int, default=None, dest='seed', help='Random seed for sampling.')
+        parser.add_argument('-j', '--processes', type=int, default=os.cpu_count(), dest='processes',
+                            help='Number of worker processes.')
+        parser.add_argument('-o', '--output', action='store', dest='output', help='Result CSV file.')
+        parser.add_argument('--no-cache', action='store_true', dest='no_cache',
+                            help='Do not read or create the binary cache of the data files.')
+        parser.add_argument('--mmap', action='store_true', dest='mmap',
+                            help='Read executions from a memory-mapped store instead of loading the whole file.')
+        args = parser.parse_args()
+
+        bakt.raise_err_if_not_exists(args.conf)
+        bakt.raise_err_if_not_exists(args.file)
+        bakt.raise_err_if_not_exists(args.boards)
+
+        main()
+        print(f"Time: {time.time() - st}")
+
+    except Exception as e:
+        logger.exception(e)
@@ -0,0 +1,114 @@
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from baktlib import bitflyer
+from baktlib.bars import BarBuilder, BarCache, RollingBars
+from baktlib.datautil import ExecutionStream
+
+
+class BarsTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.executions = pd.DataFrame({
+            'side': ['BUY', 'SELL', 'BUY', 'SELL', 'BUY', 'SELL'],
+            'price': [100.0, 99.0, 101.0, 98.0, 97.0, 99.0],
+            'size': [0.1, 0.2, 0.3, 0.4, 0.5, 0.6],
+            'buy_child_order_acceptance_id': ['JRF1', 'JRF1', 'JRF4', 'JRF5', 'JRF5', np.nan],
+            'sell_child_order_acceptance_id': ['JRF2', 'JRF3', 'JRF3', 'JRF6', 'JRF7', 'JRF8'],
+            'delay': [0.5, 0.25, np.nan, 0.1, 0.2, 0.3]},
+            index=pd.DatetimeIndex(['2019-02-04T03:00:00.017Z', '2019-02-04T03:00:00.500Z',
+                                    '2019-02-04T03:00:01.100Z', '2019-02-04T03:00:03.900Z',
+                                    '2019-02-04T03:00:03.950Z', '2019-02-04T03:00:04.000Z'], name='exec_date'))
+
+    def assertBarsEqual(self, expected: pd.DataFrame, actual: pd.DataFrame):
+        self.assertEqual(list(expected.columns), list(actual.columns))
+        self.assertTrue(expected.index.equals(actual.index))
+        for c in expected.columns:
+            self.assertEqual(expected[c].round(8).tolist(), actual[c].round(8).tolist())
+
+
+class BarBuilderTest(BarsTestCase):
+
+    def test_add_frame(self):
+        expected = bitflyer.conv_exec_to_ohlc(self.executions.copy(), '1s')
+        for bounds in [[0, 6], [0, 1, 2, 3, 4, 5, 6], [0, 4, 6], [0, 3, 3, 6]]:
+            builder = BarBuilder('1s')
+            for head, tail in zip(bounds[:-1], bounds[1:]):
+                builder.add_frame(self.executions.iloc[head:tail])
+            self.assertBarsEqual(expected, builder.to_frame())
+
+    def test_to_frame_keeps_pending(self):
+        builder = BarBuilder('2s')
+        builder.add_frame(self.executions.iloc[:4])
+        self.assertEqual(2, len(builder.to_frame()))
+        builder.add_frame(self.executions.iloc[4:])
+        self.assertBarsEqual(bitflyer.conv_exec_to_ohlc(self.executions.copy(), '2s'), builder.to_frame())
+
+
+class RollingBarsTest(BarsTestCase):
+
+    def test_frame(self):
+        bars = RollingBars('1s', 3)
+        self.assertTrue(bars.frame().empty)
+        for i in range(len(self.executions)):
+            bars.add_frame(self.executions.iloc[i:i + 1])
+            expected = bitflyer.conv_exec_to_ohlc(self.executions.iloc[:i + 1].copy(), '1s').tail(3)
+            self.assertBarsEqual(expected, bars.frame())
+        self.assertEqual(3, len(bars))
+
+
+class BarCacheTest(BarsTestCase):
+
+    def test_get(self):
+        cache = BarCache(chunk_size=2)
+        cache.add_source('executions', self.executions)
+        for rule in ['1s', '2s', '4s', '3s', '1s']:
+            self.assertBarsEqual(bitflyer.conv_exec_to_ohlc(self.executions.copy(), rule), cache.get(rule))
+
+    def test_get_returns_copy(self):
+        cache = BarCache()
+        cache.add_source('executions', self.executions)
+        ohlc = cache.get('1s')
+        ohlc['mean'] = 0
+        self.assertNotIn('mean', cache.get('1s').columns)
+
+    def test_put(self):
+        cache = BarCache()
+        ohlc = bitflyer.conv_exec_to_ohlc(self.executions.copy(), '1s')
+        cache.put('executions', '1s', ohlc)
+        self.assertBarsEqual(ohlc, cache.get('1s'))
+        self.assertRaises(KeyError, cache.get, '2s')
+
+    def test_add_stream(self):
+        tmp = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmp, 'executions.csv')
+            t = self.executions.reset_index()
+            t['id'] = range(1, len(t) + 1)
+            t['exec_date'] = t['exec_date'].dt.strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+            t.to_csv(path, index=False)
+            stream = ExecutionStream(path, chunk_size=2)
+            cache = BarCache()
+            cache.put('executions', '1s', bitflyer.conv_exec_to_ohlc(self.executions.copy(), '1s'))
+            cache.add_stream('executions', stream)
+
+            # 作成済みのOHLCを登録していない時間足も、チャンクを読み込むたびに作成する
+            self.assertIsNone(cache.builder('1s'))
+            self.assertEqual(1, len(cache.get('2s')))
+            cache.get('4s')
+            stream.take(datetime(2019, 2, 4, 3, 0, 5, tzinfo=timezone.utc))
+            self.assertRaises(KeyError, cache.get, '3s')
+            for rule in ['1s', '2s', '4s']:
+                self.assertBarsEqual(bitflyer.conv_exec_to_ohlc(self.executions.copy(), rule), cache.get(rule))
+        finally:
+            shutil.rmtree(tmp)
+
+
+if __name__ == "__main__":
+    unittest.main()
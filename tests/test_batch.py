@@ -0,0 +1,76 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from baktlib import batch
+
+
+class BatchTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        for name in ['executions_20190204.csv', 'boards_20190204.csv', 'executions_2019-02-05.tsv',
+                     'boards_2019-02-05.csv', 'executions_20190206.csv', 'README.md']:
+            with open(os.path.join(self.dir, name), 'w') as f:
+                f.write('x')
+        os.mkdir(os.path.join(self.dir, 'executions_20190204.csv.bakt'))
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_find_tapes(self):
+        pairs = batch.find_tapes([self.dir])
+
+        # 板情報のない日付とキャッシュのディレクトリは除外される
+        self.assertEqual(['2019-02-04', '2019-02-05'], [p.day for p in pairs])
+        self.assertEqual(os.path.join(self.dir, 'executions_20190204.csv'), pairs[0].executions)
+        self.assertEqual(os.path.join(self.dir, 'boards_20190204.csv'), pairs[0].boards)
+        self.assertEqual(2, pairs[0].size)
+
+        pairs = batch.find_tapes([os.path.join(self.dir, '*2019-02-05*')])
+        self.assertEqual(['2019-02-05'], [p.day for p in pairs])
+
+        # 板情報のCSVとバイナリファイルが両方ある場合は、バイナリファイルを使用する
+        binary = os.path.join(self.dir, 'boards_20190204.brd')
+        with open(binary, 'w') as f:
+            f.write('x')
+        pairs = batch.find_tapes([self.dir])
+        self.assertEqual(binary, pairs[0].boards)
+
+        # バイナリファイルがCSVより古い場合は、CSVを使用する
+        csv = os.path.join(self.dir, 'boards_20190204.csv')
+        os.utime(binary, (os.path.getmtime(csv) - 10, os.path.getmtime(csv) - 10))
+        pairs = batch.find_tapes([self.dir])
+        self.assertEqual(csv, pairs[0].boards)
+
+    def test_max_drawdown(self):
+        self.assertEqual(0.0, batch.max_drawdown(np.array([])))
+        self.assertEqual(3.0, batch.max_drawdown(np.array([0.0, 2.0, -1.0, 1.0])))
+        self.assertEqual(2.0, batch.max_drawdown(np.array([-2.0, -1.0])))
+
+    def test_aggregate(self):
+        rows = [{'day': '2019-02-04', 'num_of_orders': 2, 'size_of_orders': 0.3, 'size_of_exec': 0.1,
+                 'num_of_trades': 2, 'num_of_win': 1, 'num_of_lose': 1, 'profit': 3.0, 'loss': 1.0,
+                 'total_pnl': 2.0},
+                {'day': '2019-02-05', 'num_of_orders': 1, 'size_of_orders': 0.1, 'size_of_exec': 0.1,
+                 'num_of_trades': 2, 'num_of_win': 1, 'num_of_lose': 1, 'profit': 1.0, 'loss': 4.0,
+                 'total_pnl': -3.0}]
+        total = batch.aggregate(rows, [np.array([0.0, 3.0, 2.0]), np.array([]), np.array([1.0, -3.0])])
+
+        self.assertEqual(2, total['num_of_days'])
+        self.assertEqual(3, total['num_of_orders'])
+        self.assertEqual(-1.0, total['total_pnl'])
+        self.assertEqual(0.5, total['win_rate'])
+        self.assertEqual(0.8, total['pf'])
+        self.assertEqual(0.13333333, total['avg_order_size'])
+        self.assertEqual(0.5, total['exec_rate'])
+
+        # 前日までの確定損益を加算してつなげた推移（0, 3, 2, 3, -1）から求める
+        self.assertEqual(4.0, total['max_drawdown'])
+
+
+if __name__ == "__main__":
+    unittest.main()
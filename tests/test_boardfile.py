@@ -0,0 +1,76 @@
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+from baktlib import boardfile
+from baktlib.boardfile import BoardFile, write_board_file
+from baktlib.datautil import load_boards
+
+
+class BoardFileTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'boards_20190204.csv')
+        with open(self.path, 'w') as f:
+            f.write('time,mid_price,best_ask_price,best_ask_size,best_bid_price,best_bid_size,spread\n'
+                    '2019-02-04 03:00:00.100000,100,101,0.2,99,0.5,2\n'
+                    '2019-02-04 03:00:01.500000,101,102,0.1,99,0.4,3\n'
+                    '2019-02-04 03:00:01.900000,369499,369502,0.3,369497,0.6,5\n'
+                    '2019-02-04 03:00:00.900000,102,103,0.123,101,1.5,2\n'
+                    '2019-02-04 03:00:05.000000,103,104,12.3,102,0.6,2\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def assert_frame(self, expected, actual):
+        self.assertEqual(list(expected.columns), list(actual.columns))
+        for name in expected.columns:
+            if name.endswith('_size'):
+                np.testing.assert_allclose(expected[name].values, actual[name].values, rtol=1e-7)
+            else:
+                self.assertEqual(expected[name].tolist(), actual[name].tolist())
+
+    def test_write_read(self):
+        dst = write_board_file(self.path, block_size=2)
+        self.assertEqual(os.path.join(self.dir, 'boards_20190204' + boardfile.SUFFIX), dst)
+        self.assertTrue(boardfile.is_board_file(dst))
+
+        # 日時の順に並べ、CSVから読み込んだ場合と同じ板情報を復元する
+        expected = load_boards(self.path, use_cache=False).sort_values('time', kind='mergesort')
+        expected = expected.reset_index(drop=True)
+        f = BoardFile(dst)
+        self.assertEqual(5, len(f))
+        self.assert_frame(expected, f.frame())
+
+        # 基準値の途中からの範囲も復元できる
+        self.assert_frame(expected.iloc[1:4].reset_index(drop=True), f.frame(slice(1, 4)))
+        self.assertEqual(0, len(f.frame(slice(3, 3))))
+
+    def test_between(self):
+        f = BoardFile(write_board_file(self.path, block_size=2))
+        s = f.between(datetime(2019, 2, 4, 3, 0, 1), datetime(2019, 2, 4, 3, 0, 5))
+        self.assertEqual(slice(2, 4), s)
+        self.assertEqual([101, 369499], f.frame(s)['mid_price'].tolist())
+        self.assertEqual(slice(4, 5), f.between(start=datetime(2019, 2, 4, 3, 0, 2)))
+
+    def test_fractional_price(self):
+        # 小数の仲値は残差に切り捨てずにエラーにする（CSVの読み込みで弾かれない場合に備えて、板情報を直接与える）
+        boards = pd.read_csv(self.path)
+        boards.loc[2, 'mid_price'] = 369499.5
+        with mock.patch.object(boardfile, 'read_table', return_value=boards):
+            self.assertRaises(ValueError, write_board_file, self.path)
+        self.assertFalse(os.path.exists(os.path.join(self.dir, 'boards_20190204' + boardfile.SUFFIX)))
+
+    def test_not_board_file(self):
+        self.assertRaises(ValueError, BoardFile, self.path)
+
+
+if __name__ == "__main__":
+    unittest.main()
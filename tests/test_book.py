@@ -0,0 +1,175 @@
+import unittest
+from datetime import datetime, timezone
+
+import pandas as pd
+
+from baktlib.book import CUM_LEVELS, DepthIndex, OrderBook, QueueTracker
+from baktlib.constants import Side
+from baktlib.datautil import to_ns
+from baktlib.models import Order
+
+
+def ns(sec: float) -> int:
+    return to_ns(datetime(2019, 2, 4, 3, 0, 0, tzinfo=timezone.utc)) + int(sec * 10 ** 9)
+
+
+class OrderBookTest(unittest.TestCase):
+
+    def setUp(self):
+        self.depth = DepthIndex(pd.DataFrame({
+            'time': pd.to_datetime(['2019-02-04T03:00:00.000', '2019-02-04T03:00:00.000',
+                                    '2019-02-04T03:00:00.000', '2019-02-04T03:00:01.000',
+                                    '2019-02-04T03:00:01.000', '2019-02-04T03:00:01.500',
+                                    '2019-02-04T03:00:02.000', '2019-02-04T03:00:03.000',
+                                    '2019-02-04T03:00:03.000']),
+            'type': ['snapshot', 'snapshot', 'snapshot', 'diff', 'diff', 'diff', 'diff', 'snapshot', 'snapshot'],
+            'side': ['BUY', 'BUY', 'SELL', 'BUY', 'BUY', 'SELL', 'SELL', 'BUY', 'SELL'],
+            'price': [99.0, 98.0, 101.0, 99.0, 99.0, 101.0, 100.0, 97.0, 103.0],
+            'size': [1.0, 2.0, 3.0, 0.5, 0.7, 0.0, 0.4, 5.0, 6.0]}))
+
+    def test_advance(self):
+        book = OrderBook(self.depth)
+        self.assertIsNone(book.best_bid())
+
+        # 指定日時のメッセージは含まない
+        book.advance(ns(1))
+        self.assertEqual(99.0, book.best_bid())
+        self.assertEqual(101.0, book.best_ask())
+        self.assertEqual(1.0, book.size(Side.BUY, 99.0))
+        self.assertEqual(0.0, book.size(Side.SELL, 99.0))
+
+        # 同じ価格の更新は後勝ち、数量0は気配の削除
+        book.advance(ns(2.5))
+        self.assertEqual(0.7, book.size(Side.BUY, 99.0))
+        self.assertEqual(100.0, book.best_ask())
+        self.assertEqual(0.0, book.size(Side.SELL, 101.0))
+        self.assertEqual(([99.0, 98.0], [0.7, 2.0]), tuple(a.tolist() for a in book.levels(Side.BUY)))
+        self.assertEqual(([99.0], [0.7]), tuple(a.tolist() for a in book.levels(Side.BUY, 1)))
+
+        # 前回より前の日時は無視する
+        book.advance(ns(0.5))
+        self.assertEqual(0.7, book.size(Side.BUY, 99.0))
+
+        # スナップショットで板を作り直す
+        book.advance(ns(4))
+        self.assertEqual(([97.0], [5.0]), tuple(a.tolist() for a in book.levels(Side.BUY)))
+        self.assertEqual(([103.0], [6.0]), tuple(a.tolist() for a in book.levels(Side.SELL)))
+
+    def test_walk(self):
+        book = OrderBook(self.depth)
+        book.advance(ns(1))
+
+        # 最良気配から順に、注文サイズを満たす気配まで食う
+        self.assertEqual(([99.0], [0.4]), tuple(a.tolist() for a in book.walk(Side.SELL, 0.4)))
+        self.assertEqual(([99.0, 98.0], [1.0, 1.5]), tuple(a.tolist() for a in book.walk(Side.SELL, 2.5)))
+        self.assertEqual(([101.0], [3.0]), tuple(a.tolist() for a in book.walk(Side.BUY, 3.0)))
+
+        # 板の数量が足りない場合は、全ての気配を食う
+        self.assertEqual(([101.0], [3.0]), tuple(a.tolist() for a in book.walk(Side.BUY, 5.0)))
+
+        # 差分で増減した気配を反映して食う
+        book.advance(ns(2.5))
+        self.assertEqual(([100.0], [0.4]), tuple(a.tolist() for a in book.walk(Side.BUY, 1.0)))
+        self.assertEqual(([99.0, 98.0], [0.7, 0.3]), tuple(a.tolist() for a in book.walk(Side.SELL, 1.0)))
+
+    def test_walk_deep(self):
+        # 数量の累積を最初に作成する気配の数より深く食う場合も、全ての気配から求める
+        n = CUM_LEVELS * 2
+        book = OrderBook(DepthIndex(pd.DataFrame({
+            'time': pd.to_datetime(['2019-02-04T03:00:00.000'] * n),
+            'type': ['snapshot'] * n,
+            'side': ['SELL'] * n,
+            'price': [100.0 + i for i in range(n)],
+            'size': [1.0] * n})))
+        book.advance(ns(1))
+        self.assertEqual(([100.0], [0.5]), tuple(a.tolist() for a in book.walk(Side.BUY, 0.5)))
+        p, z = book.walk(Side.BUY, CUM_LEVELS + 0.5)
+        self.assertEqual(CUM_LEVELS + 1, len(p))
+        self.assertEqual(100.0 + CUM_LEVELS, p[-1])
+        self.assertEqual(0.5, z[-1])
+        self.assertEqual(n, len(book.walk(Side.BUY, n + 1.0)[0]))
+
+    def test_advance_at_once(self):
+        # 途中を飛ばして進めても、1件ずつ進めた場合と同じ板になる
+        book = OrderBook(self.depth)
+        book.advance(ns(2.5))
+        self.assertEqual(([99.0, 98.0], [0.7, 2.0]), tuple(a.tolist() for a in book.levels(Side.BUY)))
+        self.assertEqual(([100.0], [0.4]), tuple(a.tolist() for a in book.levels(Side.SELL)))
+
+
+class QueueTrackerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.depth = DepthIndex(pd.DataFrame({
+            'time': pd.to_datetime(['2019-02-04T03:00:00.000', '2019-02-04T03:00:00.000',
+                                    '2019-02-04T03:00:02.000']),
+            'type': ['snapshot', 'snapshot', 'diff'],
+            'side': ['BUY', 'SELL', 'BUY'],
+            'price': [100.0, 101.0, 100.0],
+            'size': [1.0, 1.0, 0.2]}))
+        self.book = OrderBook(self.depth)
+        self.book.advance(ns(1))
+        self.order = Order(1, datetime(2019, 2, 4, 3, 0, 0, tzinfo=timezone.utc), Side.BUY, 'LIMIT', 0.1, 100.0)
+
+    def test_fill_size(self):
+        queue = QueueTracker(self.book)
+        self.assertEqual(1.0, queue.ahead(self.order))
+
+        # 自分より前の数量を消化するまでは約定しない
+        self.assertEqual(0.0, queue.fill_size(self.order, 100.0, 0.6))
+        self.assertAlmostEqual(0.4, queue.ahead(self.order))
+        self.assertAlmostEqual(0.1, queue.fill_size(self.order, 100.0, 0.5))
+        self.assertEqual(0.0, queue.ahead(self.order))
+
+    def test_fill_size_canceled(self):
+        queue = QueueTracker(self.book)
+        self.assertEqual(0.0, queue.fill_size(self.order, 100.0, 0.3))
+
+        # 気配の数量が自分より前の数量を下回った分は取消とみなす
+        self.book.advance(ns(3))
+        self.assertEqual(0.2, queue.ahead(self.order))
+        self.assertAlmostEqual(0.3, queue.fill_size(self.order, 100.0, 0.5))
+
+    def test_fill_size_through(self):
+        # 注文の価格より有利な価格の約定は、その価格の気配が全て約定したとみなす
+        queue = QueueTracker(self.book)
+        self.assertEqual(0.5, queue.fill_size(self.order, 99.0, 0.5))
+        self.assertEqual(0.0, queue.ahead(self.order))
+
+        # 成行注文は待ち行列に並ばない
+        market = Order(2, datetime(2019, 2, 4, 3, 0, 0, tzinfo=timezone.utc), Side.BUY, 'MARKET', 0.1)
+        self.assertEqual(0.5, queue.fill_size(market, 100.0, 0.5))
+
+    def test_add(self):
+        depth = DepthIndex(pd.DataFrame({
+            'time': pd.to_datetime(['2019-02-04T03:00:00.000', '2019-02-04T03:00:00.700',
+                                    '2019-02-04T03:00:00.800', '2019-02-04T03:00:01.500']),
+            'type': ['snapshot', 'diff', 'diff', 'diff'],
+            'side': ['BUY', 'BUY', 'BUY', 'BUY'],
+            'price': [100.0, 100.0, 100.0, 100.0],
+            'size': [1.0, 0.3, 2.0, 0.0]}))
+        book = OrderBook(depth)
+        queue = QueueTracker(book)
+
+        # 板に乗った時刻の気配の数量から追跡し、その後に気配の数量が増えても自分より前の数量は増えない
+        queue.add(self.order, ns(0.5))
+        queue.advance(ns(1))
+        self.assertEqual(0.3, queue.ahead(self.order))
+        self.assertEqual(2.0, book.size(Side.BUY, 100.0))
+
+        # 追跡を終了した注文は、気配の数量の変化を受け取らない
+        queue.discard(self.order)
+        queue.advance(ns(2))
+        self.assertEqual(0.0, queue.ahead(self.order))
+
+        # 板に乗る前にキャンセルされた注文は追跡しない
+        canceled = Order(2, datetime(2019, 2, 4, 3, 0, 0, tzinfo=timezone.utc), Side.BUY, 'LIMIT', 0.1, 100.0)
+        queue = QueueTracker(OrderBook(depth))
+        queue.add(canceled, ns(0.5))
+        canceled.cancel()
+        queue.advance(ns(1))
+        self.assertEqual(2.0, queue.ahead(canceled))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,32 @@
+import unittest
+
+from baktlib.calc import add, sub, sum_size, to_units, from_units, div_round
+
+
+class CalcTest(unittest.TestCase):
+
+    def test_units(self):
+        self.assertEqual(110000000, to_units(1.1))
+        self.assertEqual(1, to_units(0.00000001))
+        self.assertEqual(0.3, from_units(to_units(0.1) + to_units(0.2)))
+
+    def test_add_sub(self):
+        self.assertEqual(0.3, add(0.1, 0.2))
+        self.assertEqual(0.1, sub(0.3, 0.2))
+        self.assertEqual(0.0, sub(0.12345678, 0.12345678))
+
+    def test_sum_size(self):
+        self.assertEqual(0.6, sum_size([0.1, 0.2, 0.3]))
+        self.assertEqual(0.0, sum_size([]))
+
+    def test_div_round(self):
+        self.assertEqual(round(0.5), div_round(50000000, 100000000))
+        self.assertEqual(round(1.5), div_round(150000000, 100000000))
+        self.assertEqual(round(-0.5), div_round(-50000000, 100000000))
+        self.assertEqual(round(-1.5), div_round(-150000000, 100000000))
+        self.assertEqual(round(0.51), div_round(51000000, 100000000))
+        self.assertEqual(round(-0.51), div_round(-51000000, 100000000))
+
+
+if __name__ == "__main__":
+    unittest.main()
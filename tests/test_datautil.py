@@ -0,0 +1,255 @@
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from baktlib import bitflyer
+from baktlib.datautil import BoardIndex, BoardStream, TimeWindow, ExecutionStore, ExecutionStream, index_to_ns, \
+    load_executions, parse_fixed_times, parse_times, CACHE_SUFFIX
+
+
+class ParseTimesTest(unittest.TestCase):
+
+    def test_parse_fixed_times(self):
+        values = np.array(['2019-02-04T03:00:00.017Z', '2019-02-04T03:00:00Z', '2019-02-04 03:00:01.5',
+                           '2020-02-29T23:59:59.123456789', '2019-02-29T00:00:00', '2019/02/04 03:00:00',
+                           '2019-02-04T03:00:60', '2019-02-04T03:00:00.', '2019-02-04T03:00:00.1234567890'],
+                          dtype=object)
+        ns, ok, utc = parse_fixed_times(values)
+
+        # 日付の範囲外、区切り文字の違い、小数部の桁数の不正は形式に一致しない行とする
+        self.assertEqual([True, True, True, True, False, False, False, False, False], ok.tolist())
+        self.assertEqual([True, True, False, False, False, False, False, False, False], utc.tolist())
+        self.assertEqual(index_to_ns(pd.DatetimeIndex(pd.to_datetime(values[ok]))).tolist(), ns[ok].tolist())
+
+    def test_parse_times(self):
+        values = np.array(['2019-02-04T03:00:00.017Z', '2019-02-04T03:59:59.9Z', '2019-02-05T00:00:00Z'],
+                          dtype=object)
+        self.assertTrue(pd.DatetimeIndex(pd.to_datetime(values)).equals(parse_times(values)))
+
+        # 形式に一致しない行はpd.to_datetimeで変換する
+        values = np.array(['2019-02-04 03:00:00.5', '2019/02/04 03:00:01', np.nan], dtype=object)
+        expected = pd.DatetimeIndex(pd.to_datetime(values))
+        self.assertIsNone(parse_times(values).tz)
+        self.assertTrue(expected.equals(parse_times(values)))
+        self.assertTrue(expected.equals(parse_times(expected.values)))
+
+
+class TimeWindowTest(unittest.TestCase):
+
+    def setUp(self):
+        self.index = pd.DatetimeIndex(['2019-02-04T03:00:00.017Z',
+                                       '2019-02-04T03:00:04.999Z',
+                                       '2019-02-04T03:00:05.000Z',
+                                       '2019-02-04T03:00:22.500Z'])
+
+    def test_next(self):
+        start = datetime(2019, 2, 4, 3, 0, 0, tzinfo=timezone.utc)
+        w = TimeWindow(index_to_ns(self.index), start, timeframe_sec=5, num=5)
+
+        self.assertEqual(slice(0, 2), w.next())
+        self.assertEqual(slice(2, 3), w.next())
+        self.assertEqual(slice(3, 3), w.next())
+        self.assertEqual(slice(3, 3), w.next())
+        self.assertEqual(slice(3, 4), w.next())
+        self.assertRaises(IndexError, w.next)
+
+    def test_empty_run(self):
+        start = datetime(2019, 2, 4, 3, 0, 0, tzinfo=timezone.utc)
+        w = TimeWindow(index_to_ns(self.index), start, timeframe_sec=5, num=6)
+
+        self.assertEqual(0, w.empty_run())
+        w.next()
+        w.next()
+
+        # 約定を含まない時間枠は切り出さずに進められる
+        self.assertEqual(2, w.empty_run())
+        self.assertRaises(ValueError, w.skip, 3)
+        w.skip(2)
+        self.assertEqual(0, w.empty_run())
+        self.assertEqual(slice(3, 4), w.next())
+        self.assertEqual(1, w.empty_run())
+
+    def test_next_start_after_head(self):
+        start = datetime(2019, 2, 4, 3, 0, 5, tzinfo=timezone.utc)
+        w = TimeWindow(index_to_ns(self.index), start, timeframe_sec=10, num=2)
+
+        self.assertEqual(slice(2, 3), w.next())
+        self.assertEqual(slice(3, 4), w.next())
+
+
+class BoardIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.boards = BoardIndex(pd.DataFrame({'time': ['2019-02-04 03:00:01.500000',
+                                                        '2019-02-04 03:00:00.100000',
+                                                        '2019-02-04 03:00:01.900000'],
+                                               'mid_price': [101, 100, 102],
+                                               'best_ask_price': [102, 101, 103],
+                                               'best_ask_size': [0.1, 0.2, 0.3],
+                                               'best_bid_price': [100, 99, 101],
+                                               'best_bid_size': [0.4, 0.5, 0.6],
+                                               'spread': [2, 2, 2]}))
+
+    def test_at(self):
+        t = datetime(2019, 2, 4, 3, 0, 0, tzinfo=timezone.utc)
+        self.assertEqual(100, self.boards.mid_price[self.boards.at(t)])
+        self.assertEqual(101, self.boards.mid_price[self.boards.at(t.replace(second=1))])
+        self.assertEqual(-1, self.boards.at(t.replace(second=2)))
+
+    def test_asof(self):
+        t = datetime(2019, 2, 4, 3, 0, 1, 600000, tzinfo=timezone.utc)
+        self.assertEqual(101, self.boards.mid_price[self.boards.asof(t)])
+        self.assertEqual(-1, self.boards.asof(t.replace(second=0, microsecond=0)))
+
+
+class LoadExecutionsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'executions.csv')
+        self.__write(['1,BUY,100.0,0.1,2019-02-04T03:00:00.017Z,JRF1,JRF2,0.5',
+                      '2,SELL,99.0,0.2,2019-02-04T03:00:01.5Z,JRF3,,0.25'])
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def __write(self, rows):
+        with open(self.path, 'w') as f:
+            f.write('id,side,price,size,exec_date,buy_child_order_acceptance_id,sell_child_order_acceptance_id,delay\n')
+            f.write('\n'.join(rows) + '\n')
+
+    def test_cache(self):
+        expected = load_executions(self.path, use_cache=False)
+        t = load_executions(self.path)
+        self.assertTrue(os.path.exists(os.path.join(self.path + CACHE_SUFFIX, 'meta.json')))
+
+        cached = load_executions(self.path)
+        self.assertEqual(list(expected.columns), list(cached.columns))
+
+        # キャッシュの有無によらず、同じ型の列を返す
+        self.assertEqual(expected.dtypes.tolist(), t.dtypes.tolist())
+        self.assertEqual(expected.dtypes.tolist(), cached.dtypes.tolist())
+        self.assertTrue(expected['exec_date'].equals(cached['exec_date']))
+        self.assertEqual([1, 2], cached['id'].tolist())
+        self.assertEqual(['BUY', 'SELL'], cached['side'].tolist())
+        self.assertEqual(t['buy_child_order_acceptance_id'].tolist(), cached['buy_child_order_acceptance_id'].tolist())
+        self.assertTrue(pd.isna(cached.at[1, 'sell_child_order_acceptance_id']))
+        self.assertEqual([0.1, 0.2], cached['size'].tolist())
+
+    def test_cache_invalidated(self):
+        load_executions(self.path)
+        self.__write(['3,SELL,98.0,0.3,2019-02-04T03:00:02Z,JRF4,JRF5,0.1'])
+
+        t = load_executions(self.path)
+        self.assertEqual([3], t['id'].tolist())
+
+
+class ExecutionStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'executions.csv')
+        with open(self.path, 'w') as f:
+            f.write('id,side,price,size,exec_date,buy_child_order_acceptance_id,sell_child_order_acceptance_id,delay\n'
+                    '1,BUY,100.0,0.1,2019-02-04T03:00:00.017Z,JRF1,JRF2,0.5\n'
+                    '2,SELL,99.0,0.2,2019-02-04T03:00:00.5Z,JRF1,JRF3,0.25\n'
+                    '3,BUY,101.0,0.3,2019-02-04T03:00:01.1Z,JRF4,JRF3,\n'
+                    '4,SELL,98.0,0.4,2019-02-04T03:00:03.9Z,JRF5,,0.1\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_frame(self):
+        store = ExecutionStore.open(self.path, chunk_size=3)
+        self.assertEqual(4, len(store))
+
+        t = store.frame(slice(1, 3))
+        self.assertEqual([2, 3], t['id'].tolist())
+        self.assertEqual(['SELL', 'BUY'], t['side'].tolist())
+        self.assertEqual([99.0, 101.0], t['price'].tolist())
+        self.assertEqual(pd.Timestamp('2019-02-04T03:00:00.5Z'), t.index[0])
+
+    def test_ohlc(self):
+        store = ExecutionStore.open(self.path)
+        expected = bitflyer.conv_exec_to_ohlc(load_executions(self.path, use_cache=False).set_index('exec_date'), '1s')
+        for chunk_size in [1, 2, 10]:
+            ohlc = store.ohlc('1s', chunk_size=chunk_size)
+            self.assertEqual(list(expected.columns), list(ohlc.columns))
+            self.assertTrue(expected.index.equals(ohlc.index))
+            for c in expected.columns:
+                self.assertEqual(expected[c].round(8).tolist(), ohlc[c].round(8).tolist())
+
+
+class ExecutionStreamTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'executions.csv')
+        with open(self.path, 'w') as f:
+            f.write('id,side,price,size,exec_date,buy_child_order_acceptance_id,sell_child_order_acceptance_id,delay\n'
+                    '1,BUY,100.0,0.1,2019-02-04T03:00:00.017Z,JRF1,JRF2,0.5\n'
+                    '2,SELL,99.0,0.2,2019-02-04T03:00:00.5Z,JRF1,JRF3,0.25\n'
+                    '3,BUY,101.0,0.3,2019-02-04T03:00:01.1Z,JRF4,JRF3,0.1\n'
+                    '4,SELL,98.0,0.4,2019-02-04T03:00:03.9Z,JRF5,JRF6,0.1\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_take(self):
+        t = datetime(2019, 2, 4, 3, 0, 0, tzinfo=timezone.utc)
+        stream = ExecutionStream(self.path, chunk_size=1)
+        self.assertEqual(pd.Timestamp('2019-02-04T03:00:00.017Z'), stream.first_time())
+
+        self.assertEqual([1, 2], stream.take(t.replace(second=1))['id'].tolist())
+        self.assertEqual([3], stream.take(t.replace(second=2))['id'].tolist())
+        self.assertEqual([], stream.take(t.replace(second=3))['id'].tolist())
+        self.assertFalse(stream.ends_before(t.replace(second=3)))
+        self.assertTrue(stream.ends_before(t.replace(second=4)))
+        self.assertEqual(['SELL'], stream.take(t.replace(second=4))['side'].tolist())
+
+    def test_subscribe(self):
+        t = datetime(2019, 2, 4, 3, 0, 0, tzinfo=timezone.utc)
+        stream = ExecutionStream(self.path, chunk_size=2)
+        chunks = []
+        stream.subscribe(lambda c: chunks.append(c['id'].tolist()))
+
+        # 登録時点で読み込み済みのチャンクを受け取り、以降は読み込むたびに受け取る
+        self.assertEqual([[1, 2]], chunks)
+        stream.take(t.replace(second=1))
+        self.assertEqual([[1, 2], [3, 4]], chunks)
+        self.assertEqual(4, stream.length)
+        with self.assertRaises(ValueError):
+            stream.subscribe(lambda c: None)
+
+
+class BoardStreamTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'boards.csv')
+        with open(self.path, 'w') as f:
+            f.write('time,mid_price,best_ask_price,best_ask_size,best_bid_price,best_bid_size,spread\n'
+                    '2019-02-04 03:00:00.100000,100,101,0.2,99,0.5,2\n'
+                    '2019-02-04 03:00:01.500000,101,102,0.1,100,0.4,2\n'
+                    '2019-02-04 03:00:01.900000,102,103,0.3,101,0.6,2\n'
+                    '2019-02-04 03:00:05.000000,103,104,0.3,102,0.6,2\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_at_asof(self):
+        t = datetime(2019, 2, 4, 3, 0, 0, tzinfo=timezone.utc)
+        boards = BoardStream(self.path, chunk_size=1)
+        for expected, search, sec in [(100, boards.at, 0), (101, boards.at, 1), (102, boards.asof, 3),
+                                      (None, boards.at, 3), (103, boards.at, 5)]:
+            i = search(t.replace(second=sec))
+            self.assertEqual(expected, boards.mid_price[i] if i >= 0 else None)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,304 @@
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+
+from baktlib import datautil
+from baktlib.config import Config
+from baktlib.engine import BacktestEngine, Tape, load_tape
+from baktlib.strategy import Strategy
+
+
+class BuyAndSell(Strategy):
+
+    def __init__(self, user_config, executions, bar_cache=None):
+        super().__init__(user_config, executions, bar_cache)
+
+    def think(self, trade_num, dt, orders, positions, long_pos_size, short_pos_size, ltp, **kwargs):
+        if trade_num == 1:
+            return [self.buy(t=dt, size=0.1, price=100.0)]
+        if trade_num == 3 and long_pos_size > 0:
+            return [self.sell(t=dt, size=long_pos_size, price=101.0)]
+        return []
+
+
+class BuyAndSellMarket(Strategy):
+
+    def __init__(self, user_config, executions, bar_cache=None):
+        super().__init__(user_config, executions, bar_cache)
+
+    def think(self, trade_num, dt, orders, positions, long_pos_size, short_pos_size, ltp, **kwargs):
+        if trade_num == 1:
+            return [self.buy_market(t=dt, size=0.1)]
+        if trade_num == 3 and long_pos_size > 0:
+            return [self.sell_market(t=dt, size=long_pos_size)]
+        return []
+
+
+class BuyAndSellOnTimer(Strategy):
+
+    def __init__(self, user_config, executions, bar_cache=None):
+        super().__init__(user_config, executions, bar_cache)
+        self.sell_at = None
+
+    def think(self, trade_num, dt, orders, positions, long_pos_size, short_pos_size, ltp, **kwargs):
+        if trade_num == 1:
+            self.sell_at = dt + timedelta(seconds=1.9)
+            self.set_timer(self.sell_at)
+            return [self.buy(t=dt, size=0.1, price=100.0)]
+        if dt == self.sell_at and long_pos_size > 0:
+            return [self.sell(t=dt, size=long_pos_size, price=101.0)]
+        return []
+
+
+class Quoter(Strategy):
+    """起動されるたびに注文を作成する"""
+
+    def __init__(self, user_config, executions, bar_cache=None):
+        super().__init__(user_config, executions, bar_cache)
+
+    def think(self, trade_num, dt, orders, positions, long_pos_size, short_pos_size, ltp, **kwargs):
+        return [self.buy(t=dt, size=0.1, price=90.0)]
+
+
+class Recorder(Strategy):
+    """thinkが呼び出された日時を記録する"""
+
+    calls = []
+
+    def __init__(self, user_config, executions, bar_cache=None):
+        super().__init__(user_config, executions, bar_cache)
+        Recorder.calls = []
+
+    def think(self, trade_num, dt, orders, positions, long_pos_size, short_pos_size, ltp, **kwargs):
+        Recorder.calls.append(dt.strftime('%S'))
+        if trade_num == 1 and 'sleep_until' in self.user_config:
+            self.sleep(until=dt.replace(second=int(self.user_config['sleep_until'])))
+        if trade_num == 1 and 'sleep_above' in self.user_config:
+            self.sleep(above=float(self.user_config['sleep_above']))
+        return []
+
+
+class FollowBars(Strategy):
+    """約定履歴で時間足が更新された場合のみ、直近の時間足の方向に指値注文を出す"""
+
+    def __init__(self, user_config, executions, bar_cache=None):
+        super().__init__(user_config, executions, bar_cache)
+        self.bars = self.add_rolling_bars('1s', 2)
+        self.last = None
+
+    def think(self, trade_num, dt, orders, positions, long_pos_size, short_pos_size, ltp, **kwargs):
+        bars = self.bars.frame()
+        if bars.empty or bars.iloc[-1].tolist() == self.last:
+            return []
+        self.last = bars.iloc[-1].tolist()
+        if orders:
+            return []
+        price = bars['price']
+        if long_pos_size == 0 and price['close'].iloc[-1] >= price['open'].iloc[-1]:
+            return [self.buy(t=dt, size=0.1, price=price['close'].iloc[-1])]
+        if long_pos_size > 0:
+            return [self.sell(t=dt, size=long_pos_size, price=price['close'].iloc[-1])]
+        return []
+
+
+class BacktestEngineTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        path = os.path.join(self.dir, 'test.conf')
+        with open(path, 'w') as f:
+            f.write('[default]\nexchange = bitflyer\ntimeframe_sec = 1\nnum_of_trade = 10\n'
+                    'report_dst_dir = logs\nstrategy = strategy_snake.Snake\n'
+                    '[user]\norder_expire_sec = 10\norder_delay_sec = 0\norder_size = 0.1\nohlc_rule = 1s\n')
+        self.conf = Config(path)
+        self.executions = pd.DataFrame({
+            'id': [1, 2, 3, 4],
+            'side': ['BUY', 'SELL', 'BUY', 'SELL'],
+            'price': [100.0, 99.0, 102.0, 100.0],
+            'size': [0.1, 0.2, 0.3, 0.4],
+            'exec_date': pd.to_datetime(['2019-02-04T03:00:00.100Z', '2019-02-04T03:00:01.200Z',
+                                         '2019-02-04T03:00:03.500Z', '2019-02-04T03:00:04.500Z']),
+            'buy_child_order_acceptance_id': ['JRF1', 'JRF2', 'JRF3', 'JRF4'],
+            'sell_child_order_acceptance_id': ['JRF5', 'JRF6', 'JRF7', 'JRF8'],
+            'delay': [0.1, 0.1, 0.1, 0.1]})
+        self.boards = pd.DataFrame({
+            'time': ['2019-02-04T03:00:01.000', '2019-02-04T03:00:03.000'],
+            'mid_price': [100.0, 101.0], 'spread': [2.0, 2.0],
+            'best_ask_price': [101.0, 102.0], 'best_ask_size': [0.1, 0.1],
+            'best_bid_price': [99.0, 100.0], 'best_bid_size': [0.1, 0.1]})
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_load_tape_without_store(self):
+        file = os.path.join(self.dir, 'executions.csv')
+        boards = os.path.join(self.dir, 'boards.csv')
+        executions = self.executions.copy()
+        executions['exec_date'] = executions['exec_date'].dt.strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+        executions.to_csv(file, index=False)
+        self.boards.astype({'mid_price': int, 'spread': int, 'best_ask_price': int, 'best_bid_price': int}) \
+            .to_csv(boards, index=False)
+
+        # ストアを作成できない場合は、約定履歴をメモリに読み込んで続行する
+        with open(file + datautil.STORE_SUFFIX, 'w') as f:
+            f.write('x')
+        tape = load_tape(file, boards, '1s', use_cache=False, mmap=True)
+        self.assertEqual(4, tape.data_length)
+        self.assertEqual(Tape.from_frames(self.executions, self.boards).data_from, tape.data_from)
+
+    def test_run(self):
+        tape = Tape.from_frames(self.executions, self.boards)
+        engine = BacktestEngine(self.conf, tape, strategy_cls=BuyAndSell)
+        result = engine.run()
+
+        self.assertEqual(5, result['num_of_timeframes'])
+        self.assertEqual(2, result['num_of_orders'])
+        self.assertEqual(2, result['num_of_completed_orders'])
+        self.assertEqual(1, result['num_of_trades'])
+        self.assertEqual(0, engine.pos_mgr.len())
+        self.assertEqual(1, len(engine.orders_each_trade[0]))
+
+    def test_run_twice(self):
+        # 同じ入力データを共有しても、エンジンごとの状態は独立している
+        tape = Tape.from_frames(self.executions, self.boards)
+        first = BacktestEngine(self.conf, tape, strategy_cls=BuyAndSell).run()
+        second = BacktestEngine(self.conf, tape, strategy_cls=BuyAndSell).run()
+        for k in ['num_of_orders', 'num_of_exec', 'total_pnl', 'num_of_trades']:
+            self.assertEqual(first[k], second[k])
+        self.assertTrue(np.array_equal(first['last_prices'], second['last_prices']))
+
+    def test_run_between(self):
+        tape = Tape.from_frames(self.executions, self.boards)
+        engine = BacktestEngine(self.conf, tape, strategy_cls=BuyAndSell,
+                                start=datetime(2019, 2, 4, 3, 0, 2, tzinfo=timezone.utc),
+                                end=datetime(2019, 2, 4, 3, 0, 4, 500000, tzinfo=timezone.utc))
+        result = engine.run()
+
+        # 開始日時より前の最後の約定価格を引き継ぎ、終了日時までに終わる時間枠のみ実行する
+        self.assertEqual([99.0, 102.0], result['last_prices'].tolist())
+        self.assertEqual(1, result['num_of_orders'])
+
+    def test_run_idle(self):
+        tape = Tape.from_frames(self.executions, self.boards)
+        expected = BacktestEngine(self.conf, tape, strategy_cls=Recorder).run()
+        self.assertEqual(['01', '02', '03', '04'], Recorder.calls)
+
+        # 約定のない時間枠ではthinkを呼び出さず、記録は1件ずつ処理した場合と同じになる
+        for k, v, calls in [('skip_empty', 'true', ['01', '02', '04']),
+                            ('sleep_until', '3', ['01', '03', '04']),
+                            ('sleep_above', '101.5', ['01', '04'])]:
+            self.conf.user[k] = v
+            result = BacktestEngine(self.conf, tape, strategy_cls=Recorder).run()
+            del self.conf.user[k]
+            self.assertEqual(calls, Recorder.calls)
+            for name in ['time', 'last_prices', 'market_buy_size', 'market_sell_size', 'order_delay_sec']:
+                self.assertEqual(expected[name].tolist(), result[name].tolist())
+            self.assertEqual(expected['num_of_timeframes'], result['num_of_timeframes'])
+
+    def test_run_skip_empty(self):
+        # 約定履歴が届いた場合のみ判断を変えるストラテジーは、約定のない時間枠を飛ばしても結果が変わらない
+        executions = self.executions.append(self.executions.assign(
+            id=self.executions['id'] + 4, price=[101.0, 100.0, 103.0, 99.0],
+            exec_date=self.executions['exec_date'] + pd.Timedelta(seconds=6)), ignore_index=True)
+        tape = Tape.from_frames(executions, self.boards)
+        expected = BacktestEngine(self.conf, tape, strategy_cls=FollowBars).run()
+        self.conf.user['skip_empty'] = 'true'
+        result = BacktestEngine(self.conf, tape, strategy_cls=FollowBars).run()
+        del self.conf.user['skip_empty']
+
+        self.assertGreater(expected['num_of_trades'], 0)
+        for k in ['num_of_timeframes', 'num_of_orders', 'num_of_exec', 'num_of_trades', 'total_pnl']:
+            self.assertEqual(expected[k], result[k])
+        for k in ['time', 'realized_gain', 'unrealized_gain', 'buy_pos_size', 'sell_pos_size']:
+            self.assertEqual(expected[k].tolist(), result[k].tolist())
+
+    def test_run_queue(self):
+        executions = self.executions.append(self.executions.iloc[-1:], ignore_index=True)
+        executions.loc[1, 'price'] = 100.0
+        executions.loc[3, 'side'] = 'SELL'
+        executions.loc[4, 'exec_date'] = pd.Timestamp('2019-02-04T03:00:05.500Z')
+        depth = pd.DataFrame({
+            'time': pd.to_datetime(['2019-02-04T03:00:00.000', '2019-02-04T03:00:00.000']),
+            'type': ['snapshot', 'snapshot'], 'side': ['BUY', 'SELL'],
+            'price': [100.0, 101.0], 'size': [0.15, 1.0]})
+
+        # L2の板情報がなければ、同じ価格の約定で全て約定する
+        engine = BacktestEngine(self.conf, Tape.from_frames(executions, self.boards), strategy_cls=BuyAndSell)
+        engine.run()
+        buy = engine.orders_each_trade[0][0]
+        self.assertEqual([(1, 0.1)], [(e.created_at.second, e.size) for e in buy.executions])
+
+        # 自分より前に並んでいる0.15を消化した分だけ約定する
+        engine = BacktestEngine(self.conf, Tape.from_frames(executions, self.boards, depth=depth),
+                                strategy_cls=BuyAndSell)
+        engine.run()
+        buy = engine.orders_each_trade[0][0]
+        self.assertEqual([(1, 0.05), (4, 0.05)], [(e.created_at.second, e.size) for e in buy.executions])
+
+    def test_run_market(self):
+        depth = pd.DataFrame({
+            'time': pd.to_datetime(['2019-02-04T03:00:00.000'] * 4),
+            'type': ['snapshot'] * 4, 'side': ['BUY', 'BUY', 'SELL', 'SELL'],
+            'price': [100.0, 99.0, 101.0, 102.0], 'size': [0.15, 1.0, 0.05, 1.0]})
+
+        # L2の板情報がなければ、次の反対sideの約定履歴で約定する
+        engine = BacktestEngine(self.conf, Tape.from_frames(self.executions, self.boards),
+                                strategy_cls=BuyAndSellMarket)
+        engine.run()
+        buy, sell = engine.orders_each_trade[0][0], engine.orders_each_trade[2][0]
+        self.assertEqual([(1, 99.0, 0.1)], [(e.created_at.second, e.price, e.size) for e in buy.executions])
+        self.assertEqual([(3, 102.0, 0.1)], [(e.created_at.second, e.price, e.size) for e in sell.executions])
+
+        # 板に乗った時刻の板を、最良気配から順に食って約定する
+        engine = BacktestEngine(self.conf, Tape.from_frames(self.executions, self.boards, depth=depth),
+                                strategy_cls=BuyAndSellMarket)
+        engine.run()
+        buy, sell = engine.orders_each_trade[0][0], engine.orders_each_trade[2][0]
+        self.assertEqual([(1, 101.0, 0.05), (1, 102.0, 0.05)],
+                         [(e.created_at.second, e.price, e.size) for e in buy.executions])
+        self.assertEqual([(3, 100.0, 0.05), (3, 100.0, 0.05)],
+                         [(e.created_at.second, e.price, e.size) for e in sell.executions])
+        self.assertEqual(0, engine.pos_mgr.len())
+
+    def test_run_events(self):
+        path = os.path.join(self.dir, 'event.conf')
+        with open(path, 'w') as f:
+            f.write('[default]\nexchange = bitflyer\ntimeframe_sec = 1\nnum_of_trade = 10\nclock = event\n'
+                    'report_dst_dir = logs\nstrategy = strategy_snake.Snake\n'
+                    '[user]\norder_expire_sec = 10\norder_delay_sec = 1.0\norder_size = 0.1\nohlc_rule = 1s\n')
+        tape = Tape.from_frames(self.executions, self.boards)
+        engine = BacktestEngine(Config(path), tape, strategy_cls=BuyAndSellOnTimer)
+        result = engine.run()
+
+        # 約定、注文が板に乗る時刻（作成の1秒後）、タイマーの時刻にのみストラテジーが起動される
+        # 有効期限は終了日時より後のため、イベントにならない
+        self.assertEqual(['03:00:00.100', '03:00:01.100', '03:00:01.200', '03:00:02.000', '03:00:03.000',
+                          '03:00:03.500', '03:00:04.500'],
+                         [str(t)[11:23] for t in result['time']])
+
+        # 買い注文は作成の1.1秒後の約定、売り注文は板に乗った後の約定で約定する
+        self.assertEqual(2, result['num_of_completed_orders'])
+        self.assertEqual(1, result['num_of_trades'])
+
+    def test_run_events_no_delay(self):
+        path = os.path.join(self.dir, 'event.conf')
+        with open(path, 'w') as f:
+            f.write('[default]\nexchange = bitflyer\ntimeframe_sec = 1\nnum_of_trade = 10\nclock = event\n'
+                    'report_dst_dir = logs\nstrategy = strategy_snake.Snake\n'
+                    '[user]\norder_expire_sec = 0\norder_delay_sec = 0\norder_size = 0.1\nohlc_rule = 1s\n')
+        tape = Tape.from_frames(self.executions, self.boards)
+        result = BacktestEngine(Config(path), tape, strategy_cls=Quoter).run()
+
+        # 遅延のない注文は作成した時刻に板に乗るため、約定の時刻にのみストラテジーが起動される
+        self.assertEqual(['03:00:00.100', '03:00:01.200', '03:00:03.500', '03:00:04.500'],
+                         [str(t)[11:23] for t in result['time']])
+        self.assertEqual(4, result['num_of_orders'])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,112 @@
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from baktlib.bars import BarBuilder
+from baktlib.indicators import IndicatorStore
+
+
+def close_sum(ohlc: pd.DataFrame, w: int) -> pd.Series:
+    return ohlc['price']['close'].rolling(w, min_periods=1).sum()
+
+
+def close_range(ohlc: pd.DataFrame):
+    return ohlc['price']['close'] - 1, ohlc['price']['close'] + 1
+
+
+class IndicatorStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.t = datetime(2019, 2, 4, 3, 0, 0, tzinfo=timezone.utc)
+        index = pd.date_range('2019-02-04T03:00:00Z', periods=4, freq='1s', name='exec_date')
+        self.ohlc = pd.DataFrame({('price', 'close'): [100.0, 101.0, 103.0, 106.0]}, index=index)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def __at(self, sec: float) -> datetime:
+        return self.t + pd.Timedelta(seconds=sec)
+
+    def test_advance(self):
+        store = IndicatorStore(self.ohlc, '1s')
+        store.register('sum', close_sum, w=2)
+        self.assertEqual(-1, store.advance(self.__at(0.5)))
+        self.assertTrue(np.isnan(store.get('sum')))
+
+        # 終端ちょうどの日時で時間足が確定する
+        self.assertEqual(0, store.advance(self.__at(1)))
+        self.assertEqual(100.0, store.get('sum'))
+        self.assertEqual(1, store.advance(self.__at(2.9)))
+        self.assertEqual(201.0, store.get('sum'))
+        self.assertEqual(100.0, store.get('sum', back=1))
+        self.assertTrue(np.isnan(store.get('sum', back=2)))
+        self.assertEqual(101.0, store.bar(('price', 'close')))
+        self.assertEqual([100.0, 201.0], store.history('sum').tolist())
+
+        # 最後の時間足より先には進まない
+        self.assertEqual(3, store.advance(self.__at(60)))
+        self.assertEqual(209.0, store.get('sum'))
+
+    def test_advance_builder(self):
+        builder = BarBuilder('1s')
+        executions = pd.DataFrame({'side': ['BUY', 'SELL', 'BUY'], 'price': [100.0, 101.0, 103.0],
+                                   'size': [0.1, 0.1, 0.1], 'delay': [np.nan] * 3,
+                                   'buy_child_order_acceptance_id': ['a', 'b', 'c'],
+                                   'sell_child_order_acceptance_id': ['d', 'e', 'f']},
+                                  index=pd.DatetimeIndex(['2019-02-04T03:00:00.5Z', '2019-02-04T03:00:01.5Z',
+                                                          '2019-02-04T03:00:02.5Z'], name='exec_date'))
+        builder.add_frame(executions.iloc[:2])
+        store = IndicatorStore(builder.to_frame(), '1s', cache_dir=self.dir, builder=builder)
+        store.register('sum', close_sum, w=2)
+        self.assertEqual(0, store.advance(self.__at(1)))
+        self.assertEqual(1, store.advance(self.__at(2)))
+        self.assertEqual(201.0, store.get('sum'))
+
+        # 約定履歴が追加されると、OHLCを作成し直してインジケーターを再計算する
+        builder.add_frame(executions.iloc[2:])
+        self.assertEqual(2, store.advance(self.__at(3)))
+        self.assertEqual(204.0, store.get('sum'))
+        self.assertEqual(103.0, store.bar(('price', 'close')))
+        self.assertFalse(os.path.isdir(os.path.join(self.dir, 'indicators')))
+
+    def test_register_tuple(self):
+        store = IndicatorStore(self.ohlc, '1s')
+        store.register('range', close_range)
+        store.advance(self.__at(2))
+        low, high = store.get('range')
+        self.assertEqual((100.0, 102.0), (low, high))
+        self.assertEqual(2, len(store.get('range', back=5)))
+
+    def test_register_length_mismatch(self):
+        store = IndicatorStore(self.ohlc, '1s')
+        with self.assertRaises(ValueError):
+            store.register('bad', lambda ohlc: [1.0])
+
+    def test_cache(self):
+        IndicatorStore(self.ohlc, '1s', cache_dir=self.dir).register('sum', close_sum, w=2)
+        self.assertEqual(1, len(os.listdir(os.path.join(self.dir, 'indicators'))))
+
+        # 同じ名前・パラメーター・OHLCであれば計算せずに読み込む
+        store = IndicatorStore(self.ohlc, '1s', cache_dir=self.dir)
+        store.register('sum', None, w=2)
+        store.advance(self.__at(4))
+        self.assertEqual(209.0, store.get('sum'))
+
+        # パラメーターやOHLCが異なる場合は計算し直す
+        store.register('sum', close_sum, w=3)
+        self.assertEqual(310.0, store.get('sum'))
+        ohlc = self.ohlc.copy()
+        ohlc.iloc[0, 0] = 99.0
+        store = IndicatorStore(ohlc, '1s', cache_dir=self.dir)
+        store.register('sum', close_sum, w=2)
+        self.assertEqual(3, len(os.listdir(os.path.join(self.dir, 'indicators'))))
+
+
+if __name__ == "__main__":
+    unittest.main()
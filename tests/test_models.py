@@ -1,7 +1,8 @@
 import unittest
 from datetime import datetime, timedelta
 
-from baktlib.models import Position
+from baktlib.constants import Side
+from baktlib.models import Order, Position
 
 
 class PositionTest(unittest.TestCase):
@@ -186,6 +187,40 @@ class PositionTest(unittest.TestCase):
                                open_fee=0, open_order_id=open_order_id, closed_at=closed_at,
                                open_amount=0, close_price=price + 75, close_fee=0, pnl=1)
 
+    def test_close_separate_fractional_price(self):
+        id = 1
+        opened_at = datetime.now()
+        amount = 0.02
+        price = 1000.5
+        open_order_id = 99
+        side = 'SELL'
+
+        p = Position(id=id, opened_at=opened_at, side=side, open_price=price,
+                     amount=amount, fee_rate=0, open_order_id=open_order_id)
+
+        closed_at = opened_at + timedelta(minutes=1)
+        p.close(exec_date=closed_at, exec_price=900.25, exec_size=0.01)
+
+        self.__assert_position(p=p, id=id, opened_at=opened_at, amount=amount, price=price,
+                               open_fee=0, open_order_id=open_order_id, closed_at=closed_at,
+                               open_amount=0.01, close_price=900, close_fee=0, pnl=1)
+
+
+class OrderTest(unittest.TestCase):
+
+    def test_contract_units(self):
+        o = Order(1, datetime.now(), Side.BUY, 'LIMIT', 0.3, 100)
+        o.contract(datetime.now(), 100, 0.1)
+        o.contract(datetime.now(), 100, 0.2)
+
+        # サイズは固定小数点表現で保持し、0.1 + 0.2のような誤差なく全約定になる
+        self.assertEqual(30000000, o.size_units)
+        self.assertEqual(0, o.open_size_units)
+        self.assertEqual(0.0, o.open_size)
+        self.assertEqual('COMPLETED', o.status)
+        self.assertEqual([10000000, 20000000], [e.size_units for e in o.executions])
+        self.assertEqual([0.1, 0.2], [e.size for e in o.executions])
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,200 @@
+import unittest
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+
+from baktlib.constants import Side, OrderStatus, OrderType
+from baktlib.models import Order, Position
+from baktlib.service import OrderManager, PositionManager, HistoryManager, TradeManager
+
+
+class OrderManagerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.t = datetime(2019, 2, 4, 3, 0, 0, tzinfo=timezone.utc)
+        self.mgr = OrderManager()
+
+    def __order(self, id: int, side: Side = Side.BUY, created_at: datetime = None,
+                delay_sec: float = 0.0, expire_sec: int = 0) -> Order:
+        return Order(id=id, created_at=created_at or self.t, side=side, _type='LIMIT', size=0.1,
+                     price=100, delay_sec=delay_sec, expire_sec=expire_sec)
+
+    def test_get_by_status(self):
+        orders = [self.__order(i, side=Side.BUY if i % 2 else Side.SELL) for i in range(1, 6)]
+        self.mgr.add_orders(orders)
+
+        orders[3].cancel()
+        orders[1].contract(self.t, 100, 0.1)
+        orders[0].cancel()
+
+        self.assertEqual([orders[2], orders[4]], self.mgr.get(status=OrderStatus.ACTIVE))
+        self.assertEqual([orders[0], orders[3]], self.mgr.get(status=OrderStatus.CANCELED))
+        self.assertEqual([orders[1]], self.mgr.get(status=OrderStatus.COMPLETED))
+        self.assertEqual([orders[2], orders[4]], self.mgr.get(side=Side.BUY, status=OrderStatus.ACTIVE))
+        self.assertEqual([orders[1], orders[3]], self.mgr.get(side=Side.SELL))
+        self.assertEqual(5, self.mgr.len(_type=OrderType.LIMIT))
+        self.assertEqual(2, self.mgr.len(status=OrderStatus.CANCELED))
+
+    def test_cancel(self):
+        o1 = self.__order(1, expire_sec=5)
+        o2 = self.__order(2, expire_sec=10)
+        o3 = self.__order(3, expire_sec=0)
+        o4 = self.__order(4, expire_sec=3, delay_sec=8)
+        self.mgr.add_orders([o1, o2, o3, o4])
+
+        self.mgr.cancel(self.t + timedelta(seconds=5))
+        self.assertEqual([o1, o2, o3, o4], self.mgr.get(status=OrderStatus.ACTIVE))
+
+        self.mgr.cancel(self.t + timedelta(seconds=6))
+        self.assertEqual([o2, o3, o4], self.mgr.get(status=OrderStatus.ACTIVE))
+
+        self.mgr.cancel(self.t + timedelta(seconds=8))
+        self.assertEqual([o2, o3], self.mgr.get(status=OrderStatus.ACTIVE))
+
+        self.mgr.cancel(self.t + timedelta(days=1))
+        self.assertEqual([o3], self.mgr.get(status=OrderStatus.ACTIVE))
+
+    def test_listener(self):
+        # 約定、キャンセル、期限切れのいずれでも、有効でなくなった注文を通知する
+        inactive = []
+        self.mgr.listener = inactive.append
+        orders = [self.__order(i, expire_sec=5) for i in range(1, 5)]
+        self.mgr.add_orders(orders)
+
+        orders[1].contract(self.t, 100, 0.05)
+        orders[0].cancel()
+        orders[1].contract(self.t, 100, 0.05)
+        self.mgr.cancel(self.t + timedelta(seconds=6))
+        self.assertEqual([orders[0], orders[1], orders[2], orders[3]], inactive)
+
+    def test_get_active_orders(self):
+        o1 = self.__order(1, delay_sec=3)
+        o2 = self.__order(2, delay_sec=1)
+        o3 = self.__order(3, delay_sec=0)
+        self.mgr.add_orders([o1, o2, o3])
+
+        self.assertEqual([o3], self.mgr.get_active_orders(self.t))
+        self.assertEqual([o2, o3], self.mgr.get_active_orders(self.t + timedelta(seconds=1)))
+
+        o2.contract(self.t, 100, 0.1)
+        self.assertEqual([o1, o3], self.mgr.get_active_orders(self.t + timedelta(seconds=3)))
+        self.assertEqual([o3], self.mgr.get_active_orders(self.t + timedelta(seconds=2)))
+
+
+class PositionManagerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.t = datetime(2019, 2, 4, 3, 0, 0, tzinfo=timezone.utc)
+        self.mgr = PositionManager()
+
+    def __order(self, id: int, side: Side, size: float, price: float) -> Order:
+        return Order(id=id, created_at=self.t, side=side, _type='LIMIT', size=size, price=price)
+
+    def test_contract(self):
+        for i, price in enumerate([100, 102, 104], start=1):
+            self.mgr.add_position(self.t, self.__order(i, Side.BUY, 0.1, price), 0.1, 0.0)
+
+        self.assertEqual(0.3, self.mgr.sum_size(side=Side.BUY))
+        self.assertEqual(0.0, self.mgr.sum_size(side=Side.SELL))
+        self.assertEqual(round(0.1 * 4 + 0.1 * 2 + 0.1 * 0), self.mgr.sum_unrealized_pnl(104))
+
+        # 古いポジションから順に、3件目の途中まで決済する
+        o = self.__order(4, Side.SELL, 0.25, 110)
+        closed_size, closed = self.mgr.contract(o, self.t, 110, 0.25)
+
+        self.assertEqual(0.25, closed_size)
+        self.assertEqual([1, 2], [p.id for p in closed])
+        self.assertEqual([3], [p.id for p in self.mgr.get()])
+        self.assertEqual(0.05, self.mgr.get_open_size())
+        self.assertEqual(3, len(o.executions))
+        self.assertEqual(0, o.open_size)
+        self.assertEqual(round(0.05 * (120 - 104)), self.mgr.sum_unrealized_pnl(120))
+
+    def test_sum_unrealized_pnl(self):
+        self.mgr.add_position(self.t, self.__order(1, Side.BUY, 0.15, 100), 0.15, 0.0)
+        self.mgr.add_position(self.t, self.__order(2, Side.SELL, 0.05, 110), 0.05, 0.0)
+
+        # 価格が整数の場合は整数演算で偶数丸めする（0.15 * 10 - 0.05 * 0 = 1.5 -> 2）
+        self.assertEqual(2, self.mgr.sum_unrealized_pnl(110))
+        self.assertEqual(1, self.mgr.sum_unrealized_pnl(105))
+
+        # 価格が整数でないポジションがある場合も同じ結果になる
+        self.mgr.add_position(self.t, self.__order(3, Side.BUY, 0.1, 100.5), 0.1, 0.0)
+        self.assertEqual(round(0.15 * 10 + 0.1 * 9.5), self.mgr.sum_unrealized_pnl(110))
+        self.assertEqual(round(0.15 * 10.5 + 0.1 * 10 - 0.05 * 0.5), self.mgr.sum_unrealized_pnl(110.5))
+
+    def test_contract_over_positions(self):
+        self.mgr.add_position(self.t, self.__order(1, Side.SELL, 0.1, 100), 0.1, 0.0)
+
+        o = self.__order(2, Side.BUY, 0.3, 100)
+        closed_size, closed = self.mgr.contract(o, self.t, 90, 0.3)
+
+        self.assertEqual(0.1, closed_size)
+        self.assertEqual(1, closed[0].pnl)
+        self.assertEqual(0, self.mgr.len())
+        self.assertEqual(0.2, o.open_size)
+
+
+class TradeManagerTest(unittest.TestCase):
+
+    def test_stats(self):
+        mgr = TradeManager()
+        for id, order_id, pnl in [(1, 10, 5), (2, 10, -7), (3, 11, 3), (4, 12, -4), (5, 13, 0), (6, 14, 6)]:
+            p = Position(id=id, opened_at=datetime.now(), side='BUY', open_price=100, amount=0.1,
+                         fee_rate=0, open_order_id=order_id)
+            p.pnl = pnl
+            mgr.add_trade(p)
+
+        stats = mgr.stats()
+        self.assertEqual(3.0, mgr.sum_pnl())
+        self.assertEqual(5, stats['num_of_trades'])
+        self.assertEqual(2, stats['num_of_win'])
+        self.assertEqual(2, stats['num_of_lose'])
+        self.assertEqual(1, stats['num_of_even'])
+        self.assertEqual(14.0, stats['profit'])
+        self.assertEqual(11.0, stats['loss'])
+        self.assertEqual(8.0, stats['max_drawdown'])
+
+
+class HistoryManagerTest(unittest.TestCase):
+
+    def test_add_history(self):
+        t = datetime(2019, 2, 4, 3, 0, 0, tzinfo=timezone.utc)
+        mgr = HistoryManager(2)
+        for i in range(3):
+            mgr.add_history(time=t + timedelta(seconds=i), buy_pos_size=0.1 * i, sell_pos_size=0.0,
+                            buy_volume=0.1, sell_volume=-0.2, ltp=100 + i, realized_pnl=i, unrealized_pnl=-i,
+                            exec_recv_delay=None, order_delay=0.5, market_volume=0.1)
+
+        h = mgr.get()
+        self.assertEqual(3, len(mgr))
+        self.assertEqual([100, 101, 102], h['last_prices'].tolist())
+        self.assertEqual([0, -1, -2], h['unrealized_gain'].tolist())
+        self.assertEqual(pd.Timestamp(t).value, h['time'][0].astype('i8'))
+        self.assertTrue(all(v != v for v in h['exec_recv_delay_sec']))
+        self.assertEqual(0.3, h['volume'])
+
+    def test_fill_history(self):
+        t = datetime(2019, 2, 4, 3, 0, 0, tzinfo=timezone.utc)
+        filled = HistoryManager(1)
+        added = HistoryManager(1)
+        filled.add_history(time=t, buy_pos_size=0.1, sell_pos_size=0.0, buy_volume=0.1, sell_volume=-0.2, ltp=100,
+                           realized_pnl=1, unrealized_pnl=-1, exec_recv_delay=0.1, order_delay=0.5, market_volume=0.3)
+        times = pd.Timestamp(t).value + np.arange(1, 4, dtype='i8') * 10 ** 9
+        filled.fill_history(times.astype('M8[ns]'), buy_pos_size=0.1, sell_pos_size=0.0, ltp=100, realized_pnl=1,
+                            unrealized_pnl=-1)
+
+        # 出来高0、注文なしで1件ずつ記録した場合と同じになる
+        added.add_history(time=t, buy_pos_size=0.1, sell_pos_size=0.0, buy_volume=0.1, sell_volume=-0.2, ltp=100,
+                          realized_pnl=1, unrealized_pnl=-1, exec_recv_delay=0.1, order_delay=0.5, market_volume=0.3)
+        for i in range(1, 4):
+            added.add_history(time=t + timedelta(seconds=i), buy_pos_size=0.1, sell_pos_size=0.0, buy_volume=0.0,
+                              sell_volume=0.0 * -1, ltp=100, realized_pnl=1, unrealized_pnl=-1,
+                              exec_recv_delay=np.nan, order_delay=0.0, market_volume=0.0)
+        self.assertEqual(4, len(filled))
+        self.assertEqual(added.get_array().tobytes(), filled.get_array().tobytes())
+
+
+if __name__ == "__main__":
+    unittest.main()
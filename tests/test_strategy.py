@@ -0,0 +1,88 @@
+import contextlib
+import io
+import unittest
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from baktlib.constants import CLOCK_EVENT, Side
+from baktlib.strategy import Strategy
+
+try:
+    import talib
+    from baktlib.strategies.strategy_triplemacd import TripleMACD
+except ImportError:
+    talib = None
+
+
+class StrategyTest(unittest.TestCase):
+
+    def setUp(self):
+        self.t = datetime(2019, 2, 4, 3, 0, 0, tzinfo=timezone.utc)
+        self.stg = Strategy({'order_delay_sec': '0', 'order_expire_sec': '10', 'order_size': '0.1'}, None)
+
+    def test_sleep(self):
+        # 時間枠ごとに実行する場合は、タイマーを記録しない
+        self.stg.sleep(until=self.t.replace(second=3))
+        self.assertEqual([], self.stg.pop_timers())
+        self.assertTrue(self.stg.is_sleeping(self.t.replace(second=2), 100.0))
+        self.assertFalse(self.stg.is_sleeping(self.t.replace(second=3), 100.0))
+
+        self.stg.clock = CLOCK_EVENT
+        self.stg.sleep(until=self.t.replace(second=5))
+        self.assertEqual([self.t.replace(second=5)], self.stg.pop_timers())
+        self.assertEqual([], self.stg.pop_timers())
+
+
+    def test_skip_empty(self):
+        # 約定のない時間枠の省略は、設定ファイルで指定した場合のみ有効になる
+        self.assertFalse(self.stg.skip_empty)
+        user = {'order_delay_sec': '0', 'order_expire_sec': '10', 'order_size': '0.1', 'skip_empty': 'True'}
+        self.assertTrue(Strategy(user, None).skip_empty)
+
+
+
+@unittest.skipUnless(talib, 'TA-Lib is not installed')
+class TripleMACDTest(unittest.TestCase):
+
+    def setUp(self):
+        t = pd.date_range('2019-02-04T03:00:00Z', periods=300, freq='1s', name='exec_date')
+        self.executions = pd.DataFrame({
+            'id': np.arange(300), 'side': ['BUY'] * 300,
+            'price': 10000.0 + np.round(100 * np.sin(np.arange(300) / 15.0)), 'size': [0.1] * 300,
+            'buy_child_order_acceptance_id': ['a'] * 300, 'sell_child_order_acceptance_id': ['b'] * 300,
+            'delay': [np.nan] * 300}, index=t + pd.Timedelta(milliseconds=500))
+        self.user = {'order_delay_sec': '0', 'order_expire_sec': '10', 'order_size': '0.1', 'pos_limit_size': '0.1',
+                     'ohlc_rule': '1s'}
+
+    def __signals(self, long_pos_size: float):
+        stg = TripleMACD(self.user, self.executions)
+        signals = []
+        with contextlib.redirect_stdout(io.StringIO()):
+            for dt in pd.date_range('2019-02-04T03:00:01Z', periods=300, freq='1s'):
+                for o in stg.think(0, dt.to_pydatetime(), [], [], long_pos_size, 0.0, None):
+                    signals.append((dt, o.side, o.price))
+        return signals
+
+    def test_signals(self):
+        close = self.executions['price'].values
+        fast, fast_signal, _ = talib.MACD(close, fastperiod=6, slowperiod=19, signalperiod=9)
+        middle, middle_signal, _ = talib.MACD(close, fastperiod=12, slowperiod=26, signalperiod=9)
+        ema = talib.EMA(close, timeperiod=50)
+        gc = (fast[1:] > fast_signal[1:]) & (fast[:-1] <= fast_signal[:-1]) | \
+             (middle[1:] > middle_signal[1:]) & (middle[:-1] <= middle_signal[:-1])
+        dc = (fast[1:] < fast_signal[1:]) & (fast[:-1] >= fast_signal[:-1]) | \
+             (middle[1:] < middle_signal[1:]) & (middle[:-1] >= middle_signal[:-1])
+
+        # シグナルは時間足が確定した時刻（時間足の終端）に、その時間足の終値で出る
+        end = pd.date_range('2019-02-04T03:00:01Z', periods=300, freq='1s')
+        buys = [(end[i], Side.BUY, close[i]) for i in np.flatnonzero(gc) + 1 if ema[i] > 0]
+        sells = [(end[i], Side.SELL, close[i]) for i in np.flatnonzero(dc) + 1]
+        self.assertTrue(buys and sells)
+        self.assertEqual(buys, self.__signals(0.0))
+        self.assertEqual(sells, self.__signals(0.1))
+
+
+if __name__ == "__main__":
+    unittest.main()
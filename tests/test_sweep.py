@@ -0,0 +1,52 @@
+import unittest
+
+import numpy as np
+
+from baktlib import sweep
+
+
+class SweepTest(unittest.TestCase):
+
+    def test_parse_param(self):
+        self.assertEqual(('window', ['10', '20']), sweep.parse_param('window=10, 20'))
+        self.assertEqual(('order_delay_sec', (0.5, 2)), sweep.parse_param('order_delay_sec=0.5:2'))
+        self.assertEqual(('window', (10, 20)), sweep.parse_param('window=10:20'))
+        self.assertIsInstance(sweep.parse_param('window=10:20')[1][0], int)
+        self.assertEqual(('ohlc_rule', ['1s']), sweep.parse_param('ohlc_rule=1s'))
+        with self.assertRaises(ValueError):
+            sweep.parse_param('window')
+
+    def test_grid(self):
+        combinations = sweep.grid({'window': ['10', '20'], 'order_size': ['0.1', '0.2', '0.3']})
+        self.assertEqual(6, len(combinations))
+        self.assertEqual({'window': '10', 'order_size': '0.1'}, combinations[0])
+        self.assertEqual({'window': '20', 'order_size': '0.3'}, combinations[-1])
+        with self.assertRaises(ValueError):
+            sweep.grid({'window': (10, 20)})
+
+    def test_latin_hypercube(self):
+        combinations = sweep.latin_hypercube({'window': (0, 9), 'order_delay_sec': (0.0, 1.0),
+                                              'ohlc_rule': ['1s', '5s']}, 10, seed=1)
+        self.assertEqual(10, len(combinations))
+
+        # 範囲を等分した区間から1件ずつ抽出される
+        self.assertEqual([str(i) for i in range(10)], sorted((c['window'] for c in combinations), key=int))
+        delays = np.array([float(c['order_delay_sec']) for c in combinations])
+        self.assertEqual(list(range(10)), sorted(np.floor(delays * 10).astype(int).tolist()))
+        self.assertEqual(5, sum(c['ohlc_rule'] == '1s' for c in combinations))
+
+    def test_random_sample(self):
+        params = {'window': (10, 20), 'order_size': ['0.1', '0.2']}
+        combinations = sweep.random_sample(params, 20, seed=1)
+        self.assertEqual(combinations, sweep.random_sample(params, 20, seed=1))
+        self.assertTrue(all(10 <= int(c['window']) <= 20 for c in combinations))
+        self.assertTrue(all(c['order_size'] in ('0.1', '0.2') for c in combinations))
+
+    def test_summarize(self):
+        row = sweep.summarize({'window': '10'}, {'duration': 1.5, 'total_pnl': np.float64(3.0), 'exchange': 'bitflyer',
+                                                 'last_prices': np.array([1.0, 2.0])})
+        self.assertEqual({'window': '10', 'total_pnl': 3.0, 'exchange': 'bitflyer'}, row)
+
+
+if __name__ == "__main__":
+    unittest.main()
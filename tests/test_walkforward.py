@@ -0,0 +1,69 @@
+import unittest
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from baktlib import walkforward
+
+
+class WalkForwardTest(unittest.TestCase):
+
+    def setUp(self):
+        self.t = datetime(2019, 2, 4, 3, 0, 0, tzinfo=timezone.utc)
+
+    def test_windows(self):
+        ws = walkforward.windows(self.t, self.t + timedelta(hours=2, minutes=30),
+                                 timedelta(hours=1), timedelta(minutes=30))
+        self.assertEqual(3, len(ws))
+        self.assertEqual([self.t + timedelta(minutes=30 * i) for i in range(3)], [w.train_from for w in ws])
+        self.assertEqual([w.train_to for w in ws], [w.test_from for w in ws])
+        self.assertEqual(self.t + timedelta(hours=2, minutes=30), ws[-1].test_to)
+
+        # 最後の検証期間はデータの終了日時で打ち切る
+        ws = walkforward.windows(self.t, self.t + timedelta(minutes=80), timedelta(hours=1), timedelta(minutes=30),
+                                 step=timedelta(minutes=15))
+        self.assertEqual(2, len(ws))
+        self.assertEqual(self.t + timedelta(minutes=80), ws[1].test_to)
+
+        self.assertEqual([], walkforward.windows(self.t, self.t + timedelta(minutes=30), timedelta(hours=1),
+                                                 timedelta(minutes=30)))
+
+    def test_best(self):
+        rows = [{'window': '10', 'total_pnl': 1.0}, {'window': '20', 'total_pnl': 3.0},
+                {'window': '30', 'total_pnl': 3.0}, {'window': '40', 'total_pnl': np.nan}]
+        self.assertEqual('20', walkforward.best(rows, 'total_pnl')['window'])
+        with self.assertRaises(ValueError):
+            walkforward.best([], 'total_pnl')
+
+        # 最大ドローダウンは小さいほど良い
+        rows = [{'window': '10', 'max_drawdown': 1.0}, {'window': '20', 'max_drawdown': 5.0},
+                {'window': '30', 'max_drawdown': 1.0}, {'window': '40', 'max_drawdown': np.nan}]
+        self.assertEqual('10', walkforward.best(rows, 'max_drawdown')['window'])
+
+    def test_slice_objective(self):
+        result = {'time': np.array(['2019-02-04T03:00:01', '2019-02-04T03:00:02', '2019-02-04T03:00:03',
+                                    '2019-02-04T03:00:04'], dtype='M8[ns]'),
+                  'realized_gain': np.array([1.0, 4.0, 2.0, 3.0])}
+        at = [self.t + timedelta(seconds=i) for i in range(5)]
+
+        # 開始時点の確定損益を基準として、終了時点までの記録を切り出す
+        self.assertEqual(2.0, walkforward.slice_objective(result, at[0], at[3], 'total_pnl'))
+        self.assertEqual(-2.0, walkforward.slice_objective(result, at[2], at[3], 'total_pnl'))
+        self.assertEqual(2.0, walkforward.slice_objective(result, at[1], at[4], 'max_drawdown'))
+        self.assertEqual(0.0, walkforward.slice_objective(result, at[0], at[2], 'max_drawdown'))
+        with self.assertRaises(ValueError):
+            walkforward.slice_objective(result, at[0], at[4], 'win_rate')
+
+    def test_stitch(self):
+        t = np.array(['2019-02-04T03:00:00', '2019-02-04T03:00:01'], dtype='M8[ns]')
+        results = [{'time': t, 'realized_gain': np.array([0.0, 2.0]), 'unrealized_gain': np.array([1, 1])},
+                   {'time': t[:0], 'realized_gain': np.array([]), 'unrealized_gain': np.array([])},
+                   {'time': t + np.timedelta64(2, 's'), 'realized_gain': np.array([0.0, -1.0]),
+                    'unrealized_gain': np.array([0, 2])}]
+        times, equity = walkforward.stitch(results)
+        self.assertEqual(4, len(times))
+        self.assertEqual([1.0, 3.0, 3.0, 4.0], equity.tolist())
+
+
+if __name__ == "__main__":
+    unittest.main()
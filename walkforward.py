@@ -0,0 +1,179 @@
+#! /usr/bin/env python3
+# coding: utf-8
+
+import csv
+import logging.config
+import multiprocessing
+import os.path
+import time
+from argparse import ArgumentParser
+from datetime import datetime
+from logging import getLogger
+from typing import List, Dict, Any, Tuple, Callable, Iterator
+
+import pandas as pd
+
+import bakt
+from baktlib import engine, sweep, walkforward
+
+logger = getLogger(__name__)
+
+worker = None  # type: Tuple[str, engine.Tape, List[walkforward.Window]]
+"""ワーカーで全てのバックテストに使用する設定ファイルのパス、入力データ、区間（init_workerで設定します）"""
+
+
+def init_worker(conf: str, tape: engine.Tape, windows: List[walkforward.Window]) -> None:
+    """ワーカーで全てのバックテストに使用する設定ファイルのパス、入力データ、区間を設定します。
+    ワーカープロセスではPoolのinitializerとして呼び出します（入力データはfork時に親プロセスから引き継ぎます）。
+    :param conf: 設定ファイルのパス
+    :param tape: 入力データ
+    :param windows: ウォークフォワード分析の区間
+    """
+    global worker
+    worker = (conf, tape, windows)
+
+
+def run_window(task: Tuple[str, int, Dict[str, str]]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """パラメーターの組み合わせ1件について、1つの区間の学習期間または検証期間のバックテストを実行します。
+    期間の種類がallの場合は、最初の学習期間の開始から最後の学習期間の終了までを一度に実行します。
+    :param task: 期間の種類（all/train/test）、区間の番号、パラメーターの組み合わせ
+    :return: 結果の行と、全期間または検証期間の場合は時間枠ごとの記録
+    """
+    phase, no, params = task
+    conf, tape, windows = worker
+    if phase == 'all':
+        start, end = windows[0].train_from, windows[-1].train_to
+    elif phase == 'train':
+        start, end = windows[no].train_from, windows[no].train_to
+    else:
+        start, end = windows[no].test_from, windows[no].test_to
+    result = engine.BacktestEngine(sweep.create_config(conf, params), tape, start=start, end=end).run()
+    history = {k: result[k] for k in ('time', 'realized_gain', 'unrealized_gain')} if phase != 'train' else None
+    return sweep.summarize(params, result), history
+
+
+def imap(pool, func: Callable, tasks: List[Any]) -> Iterator[Any]:
+    """プロセスプールがあればワーカープロセスで、なければこのプロセスで順に実行します。"""
+    return pool.imap(func, tasks) if pool else map(func, tasks)
+
+
+def main() -> None:
+    params = dict(sweep.parse_param(p) for p in args.params)
+    combinations = sweep.combinations(params, args.sample, args.num, seed=args.seed)  # type: List[Dict[str, str]]
+
+    # 入力データは一度だけ読み込み、全ての時間足のOHLCを作成してからワーカープロセスに引き継ぐ
+    # インジケーターは全区間で同じOHLCから計算するため、パラメーターごとに一度だけ計算してキャッシュから共有される
+    base = sweep.create_config(args.conf, {})
+    tape = engine.load_tape(args.file, args.boards, base.user['ohlc_rule'], use_cache=not args.no_cache,
+                            mmap=args.mmap)
+    for rule in sorted({c.get('ohlc_rule', base.user['ohlc_rule']) for c in combinations}):
+        tape.bar_cache.get(rule, source=args.file)
+
+    windows = walkforward.windows(tape.data_from.floor('s').to_pydatetime(),
+                                  tape.last_exec_date.to_pydatetime(),
+                                  pd.Timedelta(args.train).to_pytimedelta(),
+                                  pd.Timedelta(args.test).to_pytimedelta(),
+                                  pd.Timedelta(args.step).to_pytimedelta() if args.step else None)
+    if not windows:
+        raise ValueError('The data is shorter than the train period.')
+    logger.info(f"Walk-forward {len(windows)} windows x {len(combinations)} combinations. "
+                f"[sample={args.sample}, processes={args.processes}]")
+
+    pool = multiprocessing.get_context('fork').Pool(args.processes, initializer=init_worker,
+                                                    initargs=(args.conf, tape, windows)) \
+        if args.processes > 1 else None
+    if pool is None:
+        init_worker(args.conf, tape, windows)
+    try:
+        # 学習期間の評価値を求めて、区間ごとに評価値が最良のパラメーターを選ぶ
+        trained = {w.no: [] for w in windows}  # type: Dict[int, List[Dict[str, Any]]]
+        if args.objective in walkforward.SLICEABLE:
+            # パラメーターごとに全ての学習期間を一度に実行し、時間枠ごとの記録から区間ごとの評価値を切り出す
+            for c, (_, history) in zip(combinations, imap(pool, run_window, [('all', 0, c) for c in combinations])):
+                for w in windows:
+                    row = dict(c)
+                    row[args.objective] = walkforward.slice_objective(history, w.train_from, w.train_to,
+                                                                      args.objective)
+                    trained[w.no].append(row)
+        else:
+            # 時間枠ごとの記録から求められない評価値は、区間ごとに学習期間を実行して求める
+            tasks = [('train', w.no, c) for w in windows for c in combinations]
+            for (_, no, _), (row, _) in zip(tasks, imap(pool, run_window, tasks)):
+                trained[no].append(row)
+        chosen = {no: walkforward.best(rows, args.objective) for no, rows in trained.items()}
+
+        # 選んだパラメーターで検証期間を実行する
+        tasks = [('test', w.no, {k: chosen[w.no][k] for k in params}) for w in windows]
+        tested = list(imap(pool, run_window, tasks))
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+
+    dst = args.output or os.path.join(base.report_dst_dir, f"walkforward_{datetime.now().strftime('%Y%m%d%H%M%S')}")
+    with open(dst + '_windows.csv', 'w', newline='') as f:
+        writer = None
+        for w, (_, _, p), (row, _) in zip(windows, tasks, tested):
+            out = {'window_no': w.no, 'train_from': w.train_from, 'train_to': w.train_to,
+                   'test_from': w.test_from, 'test_to': w.test_to}
+            out.update(p)
+            out[f"train_{args.objective}"] = chosen[w.no].get(args.objective)
+            out.update({f"test_{k}": v for k, v in row.items() if k not in p})
+            if writer is None:
+                writer = csv.DictWriter(f, fieldnames=list(out))
+                writer.writeheader()
+            writer.writerow(out)
+            logger.info(f"Window {w.no}: params={p}, train_{args.objective}={chosen[w.no].get(args.objective)}, "
+                        f"test_{args.objective}={row.get(args.objective)}")
+
+    # 検証期間の損益曲線をつなげて出力する
+    times, equity = walkforward.stitch([h for _, h in tested])
+    pd.DataFrame({'time': times, 'equity': equity}).to_csv(dst + '_equity.csv', index=False)
+    logger.info(f"Wrote walk-forward results. [{dst}_windows.csv, {dst}_equity.csv]")
+
+
+if __name__ == '__main__':
+    try:
+        st = time.time()
+        pd.options.display.width = 300
+        logging.config.fileConfig('./logging.conf', disable_existing_loggers=False)
+
+        parser = ArgumentParser()
+        parser.add_argument('-c', '--conf', required=True, action='store', dest='conf', help='')
+        parser.add_argument('-f', '--file', required=True, action='store', dest='file', help='')
+        parser.add_argument('-b', '--boards', required=True, action='store', dest='boards', help='')
+        parser.add_argument('-p', '--param', required=True, action='append', dest='params',
+                            help="[user] setting to optimize: 'name=v1,v2,...' or 'name=lo:hi' (random/lhs only).")
+        parser.add_argument('--train', required=True, action='store', dest='train',
+                            help="Length of each in-sample period (e.g. '6h').")
+        parser.add_argument('--test', required=True, action='store', dest='test',
+                            help="Length of each out-of-sample period (e.g. '1h').")
+        parser.add_argument('--step', action='store', dest='step',
+                            help='Shift between windows (defaults to the test length).')
+        parser.add_argument('--objective', default='total_pnl', dest='objective',
+                            help='Result item to optimize in each in-sample period '
+                                 '(max_drawdown is minimized, the others are maximized).')
+        parser.add_argument('-s', '--sample', choices=['grid', 'random', 'lhs'], default='grid', dest='sample',
+                            help='How to choose the combinations of the parameters.')
+        parser.add_argument('-n', '--num', type=int, default=100, dest='num',
+                            help='Number of combinations for random/lhs sampling.')
+        parser.add_argument('--seed', type=int, default=None, dest='seed', help='Random seed for sampling.')
+        parser.add_argument('-j', '--processes', type=int, default=os.cpu_count(), dest='processes',
+                            help='Number of worker processes.')
+        parser.add_argument('-o', '--output', action='store', dest='output',
+                            help='Prefix of the result CSV files.')
+        parser.add_argument('--no-cache', action='store_true', dest='no_cache',
+                            help='Do not read or create the binary cache of the data files.')
+        parser.add_argument('--mmap', action='store_true', dest='mmap',
+                            help='Read executions from a memory-mapped store instead of loading the whole file.')
+        args = parser.parse_args()
+
+        bakt.raise_err_if_not_exists(args.conf)
+        bakt.raise_err_if_not_exists(args.file)
+        bakt.raise_err_if_not_exists(args.boards)
+
+        main()
+        print(f"Time: {time.time() - st}")
+
+    except Exception as e:
+        logger.exception(e)